@@ -0,0 +1,396 @@
+"""
+Decimal Fix Core
+================
+
+The normalize_decimal fix shared by the fix scripts. patch_file reads the bot
+once, locates normalize_decimal and the decimal import in a single parse,
+splices in the fixed function and writes the result atomically; the scripts
+only add their own backups and messages around it.
+
+The import patching works from the AST, so an import is only counted when it
+is real code, not when the name turns up in a comment or a string. Scripts
+that splice in a function of their own plan the import with import_edit and
+apply it with apply_edit, over the same parse.
+
+replace_definitions swaps whole top-level functions and classes in the bot
+for fixed templates; the direct_fix scripts build on it.
+split_donor and bound_names do the same for definitions taken from donor
+modules, carrying the statements they rely on; the update scripts use them.
+"""
+
+import functools
+import os
+import re
+from time import strftime
+
+ROUND_HALF_UP_IMPORT = 'from decimal import Decimal, ROUND_HALF_UP'
+
+# The fixed function; {precision} is filled in with the default precision and
+# {quantizer} with one of the quantizer lines below
+NORMALIZE_DECIMAL_TEMPLATE = '''def normalize_decimal(value, force_precision={precision}):
+    """Helper function to normalize decimal values with forced precision"""
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    
+    # Create a quantizer with the exact number of decimal places
+{quantizer}
+    return value.quantize(quantizer, rounding=ROUND_HALF_UP)'''
+
+_FORMATTED_QUANTIZER = "    quantizer = Decimal('1e-{}'.format(force_precision))"
+
+# A top-level normalize_decimal gets its default quantizer as a module-level
+# constant, emitted just above it, instead of formatting one on every call
+_CONSTANT_QUANTIZER = '''    if force_precision == {precision}:
+        quantizer = {name}
+    else:
+        quantizer = Decimal('1e-{{}}'.format(force_precision))'''
+
+# Fallback for files that do not parse: the def line plus every following line
+# indented deeper than it, blank lines inside included
+_FUNCTION_RE = re.compile(
+    r'^([ \t]*)def\s+normalize_decimal\s*\([^)]*\)[^\n]*(?:\n(?:[ \t]*\n)*\1[ \t]+[^\n]*)*',
+    re.MULTILINE
+)
+
+
+def _char_offset(line, byte_offset):
+    """AST column offsets count UTF-8 bytes; convert one to a str index into line"""
+    return len(line.encode('utf-8')[:byte_offset].decode('utf-8'))
+
+
+def quantizer_constant_name(precision=8):
+    """Name of the module-level Decimal('1e-precision') a top-level fixed function uses"""
+    return f'_QUANTIZE_1E{int(precision)}'
+
+
+@functools.lru_cache(maxsize=16)
+def normalize_decimal_source(precision=8, indent=0, constant=False):
+    """
+    The fixed normalize_decimal for a default precision, indented by indent spaces.
+    
+    With constant, the default precision quantizes with the module-level
+    constant named by quantizer_constant_name, which the caller must define.
+    """
+    if indent:
+        prefix = ' ' * indent
+        return '\n'.join(prefix + line if line else ''
+                         for line in normalize_decimal_source(precision, 0, constant).split('\n'))
+    precision = int(precision)
+    if constant:
+        quantizer = _CONSTANT_QUANTIZER.format(precision=precision, name=quantizer_constant_name(precision))
+    else:
+        quantizer = _FORMATTED_QUANTIZER
+    source = NORMALIZE_DECIMAL_TEMPLATE.format(precision=precision, quantizer=quantizer)
+    # Checked once per variant; an AST splice of it needs no further parsing
+    compile(source, '<normalize_decimal>', 'exec', dont_inherit=True)
+    return source
+
+
+def _fixed_definition(precision, indent, define_constant):
+    """The fixed function, preceded by its quantizer constant when define_constant is set"""
+    source = normalize_decimal_source(precision, indent, indent == 0)
+    if indent == 0 and define_constant:
+        name = quantizer_constant_name(precision)
+        source = f"{name} = Decimal('1e-{int(precision)}')\n\n\n" + source
+    return source
+
+
+def import_edit(tree, lines):
+    """
+    Plan the line edit that imports ROUND_HALF_UP from decimal.
+    
+    Returns None when tree already imports ROUND_HALF_UP (or * from decimal),
+    else (index, text, insert): text replaces lines[index], or goes in before
+    it when insert is true.
+    """
+    import ast
+    
+    from_import = module_import = None
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.module == 'decimal' and node.level == 0:
+            if any(alias.name in ('ROUND_HALF_UP', '*') for alias in node.names):
+                return None
+            if from_import is None:
+                from_import = node
+        elif isinstance(node, ast.Import) and module_import is None:
+            if any(alias.name == 'decimal' for alias in node.names):
+                module_import = node
+
+    if from_import is not None:
+        # Insert right after the last imported name, inside any parentheses
+        last = from_import.names[-1]
+        line = lines[last.end_lineno - 1]
+        col = _char_offset(line, last.end_col_offset)
+        return last.end_lineno - 1, line[:col] + ', ROUND_HALF_UP' + line[col:], False
+
+    if module_import is not None:
+        anchor, new_line = module_import, 'from decimal import ROUND_HALF_UP'
+        indent = lines[anchor.lineno - 1][:_char_offset(lines[anchor.lineno - 1], anchor.col_offset)]
+    else:
+        imports = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+        if imports:
+            anchor = imports[-1]
+        elif tree.body and isinstance(tree.body[0], ast.Expr) and isinstance(tree.body[0].value, ast.Constant) \
+                and isinstance(tree.body[0].value.value, str):
+            anchor = tree.body[0]  # Module docstring
+        else:
+            return 0, ROUND_HALF_UP_IMPORT + '\n\n', True
+        new_line, indent = ROUND_HALF_UP_IMPORT, ''
+
+    if not lines[anchor.end_lineno - 1].endswith('\n'):
+        lines[anchor.end_lineno - 1] += '\n'
+    return anchor.end_lineno, indent + new_line + '\n', True
+
+
+def apply_edit(lines, edit):
+    """Apply an import_edit result to lines in place"""
+    index, text, insert = edit
+    if insert:
+        lines.insert(index, text)
+    else:
+        lines[index] = text
+
+
+def patch_decimal_import(src):
+    """
+    Make sure ROUND_HALF_UP is imported from decimal.
+    
+    Returns src unchanged when it already imports ROUND_HALF_UP (or * from
+    decimal). Otherwise the name is appended to the first 'from decimal import'
+    statement, or a 'from decimal import ROUND_HALF_UP' line follows the first
+    'import decimal', or a full import line is added after the last top-level
+    import. Raises SyntaxError if src does not parse.
+    """
+    import ast  # Only paid for when a fix script actually patches a file
+    
+    tree = ast.parse(src)
+    lines = src.splitlines(keepends=True)
+    edit = import_edit(tree, lines)
+    if edit is None:
+        return src
+    apply_edit(lines, edit)
+    return ''.join(lines)
+
+
+def replace_definitions(content, replacements):
+    """
+    Swap top-level functions/classes for the templates in replacements (name -> source).
+    
+    content is the raw UTF-8 bytes of the file, so nothing is decoded or
+    re-encoded on the way through. The file is parsed once and each
+    definition's line span, decorators included, is spliced out; everything
+    else, comments included, is left as it was. Returns the new content and
+    the names that were replaced. Raises SyntaxError if content does not parse.
+    """
+    import ast
+    
+    tree = ast.parse(content)
+    spans = [(min([node.lineno] + [d.lineno for d in node.decorator_list]), node.end_lineno, node.name)
+             for node in tree.body
+             if isinstance(node, (ast.FunctionDef, ast.ClassDef)) and node.name in replacements]
+    lines = content.split(b'\n')
+    # Splice from the bottom up so earlier line numbers stay valid
+    for start, end, name in sorted(spans, reverse=True):
+        lines[start - 1:end] = replacements[name].strip().encode('utf-8').split(b'\n')
+    return b'\n'.join(lines), [name for _, _, name in spans]
+
+
+def _node_source(source, node):
+    """Exact source of a top-level statement, decorators included"""
+    import ast
+    
+    decorators = ''.join(f"@{ast.get_source_segment(source, d)}\n"
+                         for d in getattr(node, 'decorator_list', ()))
+    return decorators + ast.get_source_segment(source, node)
+
+
+def bound_names(node):
+    """Names a top-level statement binds: imports, assignment targets, def/class names"""
+    import ast
+    
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        return {(alias.asname or alias.name).split('.')[0] for alias in node.names}
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return {node.name}
+    targets = getattr(node, 'targets', None) or [getattr(node, 'target', None)]
+    return {name.id for target in targets if target is not None
+            for name in ast.walk(target) if isinstance(name, ast.Name)}
+
+
+def split_donor(source, names, existing=frozenset(), donor_modules=frozenset()):
+    """
+    Exact source of the top-level functions/classes in names, plus every
+    other top-level statement of the donor (imports, constants, the shared
+    Context, helper functions) those definitions rely on.
+    
+    Statements whose names are all in existing, usually because an earlier
+    run already put them there, are left out, as are imports from the
+    modules in donor_modules, whose definitions are spliced in alongside.
+    Returns a dict of name -> source and the list of support statements.
+    """
+    import ast
+    
+    definitions, support = {}, []
+    for node in ast.parse(source).body:
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)) and node.name in names:
+            definitions[node.name] = _node_source(source, node)
+        elif bound_names(node) and bound_names(node) <= existing:
+            continue
+        elif isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            support.append('\n' + _node_source(source, node) + '\n')  # Set off by blank lines
+        elif not (isinstance(node, ast.ImportFrom) and node.module in donor_modules):
+            support.append(_node_source(source, node))
+    return definitions, support
+
+
+def _read_source(path):
+    """Read and decode path; returns (text, encoding)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    try:
+        return data.decode('utf-8'), 'utf-8'
+    except UnicodeDecodeError:
+        # Every byte decodes as latin-1 and encodes back to itself
+        return data.decode('latin-1'), 'latin-1'
+
+
+def _patch_parts(src, precision, label):
+    """
+    The pieces of src with normalize_decimal replaced and ROUND_HALF_UP imported.
+    
+    Returns None, after printing why, when the function cannot be found or the
+    fallback splice does not parse. label names src in messages.
+    """
+    import ast
+    
+    try:
+        tree = ast.parse(src)
+    except SyntaxError as e:
+        print(f"Warning: Could not parse {label} ({e}), searching by indentation instead")
+        tree = None
+    
+    if tree is not None:
+        node = next((n for n in ast.walk(tree)
+                     if isinstance(n, ast.FunctionDef) and n.name == 'normalize_decimal'), None)
+        if node is None:
+            print("Could not find normalize_decimal function")
+            return None
+        print(f"Found normalize_decimal function at line {node.lineno}")
+        
+        lines = src.splitlines(keepends=True)
+        edit = import_edit(tree, lines)
+        
+        # Decorators belong to the function being replaced
+        start = min([node.lineno] + [d.lineno for d in node.decorator_list]) - 1
+        end = node.end_lineno
+        newline = '\n' if lines[end - 1].endswith('\n') else ''
+        # The quantizer constant survives earlier runs; only emit it once
+        name = quantizer_constant_name(precision)
+        define_constant = not any(isinstance(n, ast.Assign) and
+                                  any(isinstance(t, ast.Name) and t.id == name for t in n.targets)
+                                  for n in tree.body)
+        lines[start:end] = [_fixed_definition(precision, node.col_offset, define_constant) + newline]
+        
+        # An edit above the splice keeps its line index; one below it is rare
+        # enough to simply patch the spliced text again. Otherwise the head,
+        # function and tail are kept as they are, never joined into a second
+        # copy of the file.
+        if edit is None or edit[0] <= start:
+            if edit is not None:
+                apply_edit(lines, edit)
+                if edit[2]:
+                    start += 1  # The inserted line moved the function down
+            return [''.join(lines[:start]), lines[start], ''.join(lines[start + 1:])]
+        return [patch_decimal_import(''.join(lines))]
+    
+    name_pos = src.find('normalize_decimal')
+    match = None
+    if name_pos >= 0:
+        match = _FUNCTION_RE.search(src, src.rfind('\n', 0, name_pos) + 1)
+    if match is None:
+        print("Could not find normalize_decimal function")
+        return None
+    print(f"Found normalize_decimal function at line {src.count(chr(10), 0, match.start()) + 1}")
+    
+    define_constant = f'{quantizer_constant_name(precision)} =' not in src
+    new_src = (src[:match.start()] + _fixed_definition(precision, len(match.group(1)), define_constant)
+               + src[match.end():])
+    try:
+        return [patch_decimal_import(new_src)]
+    except SyntaxError as e:
+        print(f"Syntax error in modified content: {e}")
+        print(f"Line {e.lineno}, column {e.offset}: {e.text}")
+        return None
+
+
+def patch_source(src, *, precision=8):
+    """patch_file for source text: the patched text, or None if it could not be patched"""
+    parts = _patch_parts(src, precision, 'the source')
+    return None if parts is None else ''.join(parts)
+
+
+def patch_file(path, *, precision=8):
+    """
+    Replace normalize_decimal in path with the fixed version and import ROUND_HALF_UP.
+    
+    One parse gives both the function's exact line span and the place for the
+    import. A file that does not parse (usually because of a broken
+    normalize_decimal) falls back to an indentation-based search, and the
+    result must then parse. The file is only replaced, atomically, once the
+    fix has succeeded. Returns True on success.
+    """
+    path = os.fspath(path)
+    try:
+        src, encoding = _read_source(path)
+    except OSError as e:
+        print(f"Error reading {path}: {e}")
+        return False
+    
+    parts = _patch_parts(src, precision, path)
+    if parts is None:
+        return False
+    
+    try:
+        write_atomic(path, [part.encode(encoding) for part in parts])
+    except OSError as e:
+        print(f"Error saving changes: {e}")
+        return False
+    print(f"Changes saved to {path}")
+    return True
+
+
+def backup_timestamp():
+    """Timestamp for backup names; the pid keeps runs within the same second apart"""
+    return f"{strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+
+
+def write_atomic(path, data):
+    """
+    Replace path with data (bytes, or a list of bytes pieces) in one rename.
+    
+    Pieces are written in order without being joined first. The bytes go to a
+    temporary file next to path, which then takes path's place through
+    os.replace, so an interrupted write never leaves a truncated file behind.
+    The original's permission bits are kept.
+    """
+    import tempfile
+    
+    path = os.fspath(path)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                tmp.write(data)
+            else:
+                tmp.writelines(data)
+        try:
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,24 @@
+"""
+Optional Numba support
+======================
+
+Re-exports numba's ``njit`` and ``prange`` when numba is installed. Without
+numba, ``njit`` becomes a no-op decorator and ``prange`` falls back to
+``range``, so the kernels still import and run, only slower.
+"""
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """Fallback for numba.njit: return the function undecorated"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorator(func):
+            return func
+        return decorator
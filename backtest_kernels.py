@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Backtest Kernels
+================
+
+Compiled inner loops for the Backtester and TradingBot backtests. The kernels
+only see plain float64, int64 and int8/uint8 NumPy arrays so Numba can compile
+them in nopython mode; building the arrays from DataFrames and turning the
+outputs back into results is left to the callers.
+"""
+
+import numpy as np
+from _njit import njit, prange
+
+# Columns of the per-coin statistics row returned by the kernels
+STAT_FINAL_BALANCE = 0
+STAT_MAX_DRAWDOWN = 1
+STAT_NUM_TRADES = 2
+NUM_STATS = 3
+
+# Exit reason codes stored in the trade_reason column
+EXIT_SIGNAL = 0
+EXIT_STOP_LOSS = 1
+EXIT_TAKE_PROFIT = 2
+EXIT_END_OF_DATA = 3
+EXIT_REASONS = ('signal', 'stop_loss', 'take_profit', 'end_of_data')
+
+# Per-trade buffers, in the order the kernels take them
+TRADE_COLUMNS = ('entry_idx', 'exit_idx', 'size', 'pnl', 'fees', 'reason')
+
+# Slots of the account state array _simulate_pair reads and updates in place
+ACCT_BALANCE = 0
+ACCT_DAILY_PNL = 1
+ACCT_MAX_BALANCE = 2
+ACCT_MAX_DRAWDOWN = 3
+ACCT_POS_OPEN = 4
+ACCT_POS_ENTRY_PRICE = 5
+ACCT_POS_SIZE = 6
+ACCT_POS_STOP = 7
+ACCT_POS_TAKE_PROFIT = 8
+ACCT_POS_TRAILING_STOP = 9
+ACCT_POS_ATR = 10
+NUM_ACCT = 11
+
+
+def trade_capacity(n_bars):
+    """Upper bound on round trips: every trade spans at least two bars"""
+    return n_bars // 2 + 1
+
+
+def allocate_trades(capacity, n_coins=None):
+    """Preallocate struct-of-arrays trade buffers, optionally one row per coin"""
+    shape = capacity if n_coins is None else (n_coins, capacity)
+    return {
+        'entry_idx': np.empty(shape, dtype=np.int64),
+        'exit_idx': np.empty(shape, dtype=np.int64),
+        'size': np.empty(shape, dtype=np.float64),
+        'pnl': np.empty(shape, dtype=np.float64),
+        'fees': np.empty(shape, dtype=np.float64),
+        'reason': np.empty(shape, dtype=np.int8),
+    }
+
+
+@njit(cache=True)
+def _backtest_core(close, atr, entry, exit_, day, n_bars, start, initial_balance,
+                   fee_rate, position_frac, min_trade, sl_mult, tp_mult, trail_mult,
+                   max_daily_loss, max_daily_trades,
+                   trade_entry, trade_exit, trade_size, trade_pnl, trade_fees, trade_reason):
+    """
+    Simulate long-only trading on a single coin.
+    
+    day holds the integer day number of each candle; the daily PnL and trade
+    count reset whenever it changes, and new entries are blocked for the rest
+    of a day once either daily limit is hit.
+    
+    Each closed trade is written by index into the preallocated trade_* arrays;
+    returns the statistics row (final balance, max drawdown, trade count).
+    """
+    stats = np.zeros(NUM_STATS)
+    balance = initial_balance
+    max_balance = initial_balance
+    max_drawdown = 0.0
+    n_trades = 0
+    daily_pnl = 0.0
+    daily_trades = 0
+
+    in_position = False
+    entry_idx = 0
+    quantity = 0.0
+    entry_cost = 0.0
+    entry_fee = 0.0
+    stop = 0.0
+    take_profit = 0.0
+    trail_activation = 0.0
+
+    for i in range(start, n_bars):
+        if i > start and day[i] != day[i - 1]:
+            daily_pnl = 0.0
+            daily_trades = 0
+
+        price = close[i]
+        current_atr = atr[i]
+        if np.isnan(price) or np.isnan(current_atr):
+            continue
+
+        if not in_position:
+            if entry[i]:
+                if daily_pnl <= -balance * max_daily_loss or daily_trades >= max_daily_trades:
+                    continue
+                size = max(balance * position_frac, min_trade)
+                if size > balance:
+                    continue
+                entry_fee = size * fee_rate
+                quantity = (size - entry_fee) / price
+                entry_cost = size
+                balance -= size
+                stop = price - current_atr * sl_mult
+                take_profit = price + current_atr * tp_mult
+                trail_activation = price + current_atr * trail_mult
+                entry_idx = i
+                in_position = True
+            continue
+
+        # Ratchet the trailing stop once price clears the activation level; written
+        # as selects so the per-bar checks compile without data-dependent jumps
+        trailed = price - current_atr * trail_mult
+        stop = max(stop, trailed if price >= trail_activation else stop)
+
+        # Stop loss wins over take profit, which wins over the exit signal
+        hit_stop = int(price <= stop)
+        hit_target = int(price >= take_profit) * (1 - hit_stop)
+        if (hit_stop | hit_target | exit_[i]) == 0:
+            continue
+        reason = (EXIT_SIGNAL + hit_stop * (EXIT_STOP_LOSS - EXIT_SIGNAL)
+                  + hit_target * (EXIT_TAKE_PROFIT - EXIT_SIGNAL))
+
+        gross_value = quantity * price
+        exit_fee = gross_value * fee_rate
+        net_value = gross_value - exit_fee
+        balance += net_value
+        trade_entry[n_trades] = entry_idx
+        trade_exit[n_trades] = i
+        trade_size[n_trades] = entry_cost
+        trade_pnl[n_trades] = net_value - entry_cost
+        trade_fees[n_trades] = entry_fee + exit_fee
+        trade_reason[n_trades] = reason
+        n_trades += 1
+        daily_pnl += net_value - entry_cost
+        daily_trades += 1
+        in_position = False
+
+        if balance > max_balance:
+            max_balance = balance
+        drawdown = (max_balance - balance) / max_balance
+        if drawdown > max_drawdown:
+            max_drawdown = drawdown
+
+    # Mark any position still open at the last bar to market
+    if in_position:
+        gross_value = quantity * close[n_bars - 1]
+        exit_fee = gross_value * fee_rate
+        net_value = gross_value - exit_fee
+        balance += net_value
+        trade_entry[n_trades] = entry_idx
+        trade_exit[n_trades] = n_bars - 1
+        trade_size[n_trades] = entry_cost
+        trade_pnl[n_trades] = net_value - entry_cost
+        trade_fees[n_trades] = entry_fee + exit_fee
+        trade_reason[n_trades] = EXIT_END_OF_DATA
+        n_trades += 1
+
+    stats[STAT_FINAL_BALANCE] = balance
+    stats[STAT_MAX_DRAWDOWN] = max_drawdown
+    stats[STAT_NUM_TRADES] = n_trades
+    return stats
+
+
+@njit(parallel=True, cache=True)
+def _batch_backtest(close_m, atr_m, entry_m, exit_m, day_m, n_bars, start, initial_balance,
+                    fee_rate, position_frac, min_trade, sl_mult, tp_mult, trail_mult,
+                    max_daily_loss, max_daily_trades, trade_entry_m, trade_exit_m,
+                    trade_size_m, trade_pnl_m, trade_fees_m, trade_reason_m):
+    """Run _backtest_core for every row of the (n_coins, T) NaN-padded input matrices"""
+    n_coins = close_m.shape[0]
+    out = np.empty((n_coins, NUM_STATS))
+    for k in prange(n_coins):
+        out[k] = _backtest_core(close_m[k], atr_m[k], entry_m[k], exit_m[k], day_m[k],
+                                n_bars[k], start, initial_balance, fee_rate, position_frac,
+                                min_trade, sl_mult, tp_mult, trail_mult,
+                                max_daily_loss, max_daily_trades,
+                                trade_entry_m[k], trade_exit_m[k], trade_size_m[k],
+                                trade_pnl_m[k], trade_fees_m[k], trade_reason_m[k])
+    return out
+
+
+@njit(cache=True)
+def _simulate_pair(close, atr, sig, account, fee_rate, position_frac, min_trade,
+                   max_daily_loss, sl_mult, tp_mult, trail_mult,
+                   trade_entry, trade_exit, trade_size, trade_pnl, trade_fees, trade_reason):
+    """
+    Float64 replay of TradingBot.execute_trade over one pair's signal series.
+    
+    Follows the same rules bar for bar: bars without a signal are skipped, the
+    daily loss limit blocks both entries and exits, and the trailing stop
+    ratchets from the entry ATR once price is above the initial stop.
+    
+    account holds the balance, daily PnL, drawdown tracking and any position
+    left open (see the ACCT_* slots) and is updated in place so several pairs
+    can share one balance. Closed trades are written into the trade_* arrays;
+    returns the number of trades.
+    """
+    balance = account[ACCT_BALANCE]
+    daily_pnl = account[ACCT_DAILY_PNL]
+    max_balance = account[ACCT_MAX_BALANCE]
+    max_drawdown = account[ACCT_MAX_DRAWDOWN]
+    in_position = account[ACCT_POS_OPEN] != 0.0
+    entry_idx = -1
+    entry_price = account[ACCT_POS_ENTRY_PRICE]
+    size = account[ACCT_POS_SIZE]
+    stop = account[ACCT_POS_STOP]
+    take_profit = account[ACCT_POS_TAKE_PROFIT]
+    trailing_stop = account[ACCT_POS_TRAILING_STOP]
+    position_atr = account[ACCT_POS_ATR]
+    entry_fee = size * fee_rate
+    quantity = (size - entry_fee) / entry_price if in_position else 0.0
+    n_trades = 0
+
+    for i in range(close.shape[0]):
+        signal = sig[i]
+        if signal == 0:
+            continue
+        price = close[i]
+
+        if daily_pnl <= -balance * max_daily_loss:
+            continue
+
+        if signal == 1 and not in_position:
+            # RiskManager.compute_position_size
+            vol_adj = max(1.0 - atr[i] * 5.0, 0.2)
+            size = max(balance * position_frac * vol_adj, min_trade)
+            entry_fee = size * fee_rate
+            quantity = (size - entry_fee) / price
+            entry_price = price
+            position_atr = atr[i]
+            stop = price - position_atr * sl_mult
+            take_profit = price + position_atr * tp_mult
+            trailing_stop = stop
+            balance -= size
+            entry_idx = i
+            in_position = True
+            continue
+
+        if not in_position:
+            continue
+
+        trailed = price - position_atr * trail_mult
+        stop = max(stop, trailed if price >= trailing_stop else stop)
+
+        hit_stop = int(price <= stop)
+        hit_target = int(price >= take_profit) * (1 - hit_stop)
+        if (hit_stop | hit_target | int(signal == -1)) == 0:
+            continue
+        reason = (EXIT_SIGNAL + hit_stop * (EXIT_STOP_LOSS - EXIT_SIGNAL)
+                  + hit_target * (EXIT_TAKE_PROFIT - EXIT_SIGNAL))
+
+        gross_value = quantity * price
+        exit_fee = gross_value * fee_rate
+        net_value = gross_value - exit_fee
+        realized_pnl = net_value - size
+        balance += net_value
+        daily_pnl += realized_pnl
+        trade_entry[n_trades] = entry_idx
+        trade_exit[n_trades] = i
+        trade_size[n_trades] = size
+        trade_pnl[n_trades] = realized_pnl
+        trade_fees[n_trades] = entry_fee + exit_fee
+        trade_reason[n_trades] = reason
+        n_trades += 1
+        in_position = False
+
+        max_balance = max(max_balance, balance)
+        max_drawdown = max(max_drawdown, (max_balance - balance) / max_balance)
+
+    account[ACCT_BALANCE] = balance
+    account[ACCT_DAILY_PNL] = daily_pnl
+    account[ACCT_MAX_BALANCE] = max_balance
+    account[ACCT_MAX_DRAWDOWN] = max_drawdown
+    account[ACCT_POS_OPEN] = 1.0 if in_position else 0.0
+    account[ACCT_POS_ENTRY_PRICE] = entry_price
+    account[ACCT_POS_SIZE] = size
+    account[ACCT_POS_STOP] = stop
+    account[ACCT_POS_TAKE_PROFIT] = take_profit
+    account[ACCT_POS_TRAILING_STOP] = trailing_stop
+    account[ACCT_POS_ATR] = position_atr
+    return n_trades
+
+
+@njit(cache=True)
+def rolling_poc(codes, volume, n_codes, window):
+    """
+    Point of control of the trailing window ending at each bar.
+    
+    codes number the price buckets in ascending price order. For bar i the
+    volumes of bars i - window + 1 .. i are summed per bucket, with the same
+    compensated summation as a pandas groupby sum, and the bucket with the
+    largest total wins; ties go to the lowest bucket, as with idxmax.
+    Returns the winning code per bar.
+    """
+    n = codes.shape[0]
+    sums = np.zeros(n_codes)
+    compensation = np.zeros(n_codes)
+    poc = np.empty(n, dtype=np.int64)
+    for i in range(n):
+        start = max(0, i - window + 1)
+        for j in range(start, i + 1):
+            code = codes[j]
+            y = volume[j] - compensation[code]
+            t = sums[code] + y
+            compensation[code] = t - sums[code] - y
+            sums[code] = t
+        best = codes[start]
+        for j in range(start + 1, i + 1):
+            code = codes[j]
+            if sums[code] > sums[best] or (sums[code] == sums[best] and code < best):
+                best = code
+        poc[i] = best
+        for j in range(start, i + 1):
+            sums[codes[j]] = 0.0
+            compensation[codes[j]] = 0.0
+    return poc
+
+# Prefer the ahead-of-time build from build_backtest_kernels.py: it has no JIT
+# warmup on first call. The batch kernel keeps using the JIT version, since
+# numba can only inline dispatchers into the parallel loop.
+try:
+    from backtest_kernels_aot import backtest_core
+except ImportError:
+    backtest_core = _backtest_core
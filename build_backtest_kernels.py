@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Build Backtest Kernels
+======================
+
+Compiles the single-coin backtest kernel ahead of time into the
+``backtest_kernels_aot`` extension module using numba.pycc. With the
+extension next to backtest_kernels.py, the Backtester calls the compiled
+function directly and skips the JIT typing and compilation on first use.
+
+The export is type-locked to the arrays the Backtester builds (float64
+prices, uint8 signal masks, int64 day numbers); rebuild after changing
+_backtest_core.
+
+Usage: python build_backtest_kernels.py
+"""
+
+import os
+import sys
+
+from numba.pycc import CC
+
+from backtest_kernels import _backtest_core
+
+AOT_MODULE = 'backtest_kernels_aot'
+
+# close, atr, entry, exit_, day, n_bars, start, initial_balance, fee_rate,
+# position_frac, min_trade, sl_mult, tp_mult, trail_mult, max_daily_loss,
+# max_daily_trades, trade_entry, trade_exit, trade_size, trade_pnl, trade_fees,
+# trade_reason
+CORE_SIGNATURE = (
+    'f8[:](f8[:], f8[:], u1[:], u1[:], i8[:], i8, i8, f8, f8, '
+    'f8, f8, f8, f8, f8, f8, '
+    'i8, i8[:], i8[:], f8[:], f8[:], f8[:], i1[:])'
+)
+
+
+def main():
+    """Compile the kernel into an extension module beside this script"""
+    cc = CC(AOT_MODULE)
+    cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+    cc.verbose = True
+    cc.export('backtest_core', CORE_SIGNATURE)(_backtest_core.py_func)
+    cc.compile()
+    print(f"Built {AOT_MODULE} in {cc.output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
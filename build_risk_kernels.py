@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Build Risk Kernels
+==================
+
+Compiles the Position and RiskManager float64 kernels ahead of time into the
+``risk_kernels_aot`` extension module using numba.pycc. With the extension
+next to risk_kernels.py, the exit amounts, position size, stop levels,
+volatility clamp and trailing stops are called compiled from the first tick
+instead of being JIT-compiled when the bot starts.
+
+The exports are type-locked to float64 scalars and one-dimensional float64
+arrays; rebuild after changing the kernels in risk_kernels.py.
+
+Usage: python build_risk_kernels.py
+"""
+
+import os
+import sys
+
+from numba.pycc import CC
+
+import risk_kernels
+
+AOT_MODULE = 'risk_kernels_aot'
+
+# Export name -> signature of the risk_kernels function behind it
+SIGNATURES = {
+    # entry, atr, is_long, stop_mult, tp_mult
+    'stop_levels': 'UniTuple(f8, 2)(f8, f8, b1, f8, f8)',
+    # current_volatility, baseline_volatility, min_adjustment, max_adjustment
+    'volatility_scale': 'f8(f8, f8, f8, f8)',
+    # quantity, price, fee_rate, entry_cost, entry_fee
+    'exit_amounts': 'UniTuple(f8, 5)(f8, f8, f8, f8, f8)',
+    # quantity, close_ratio, price, fee_rate
+    'partial_exit_amounts': 'UniTuple(f8, 3)(f8, f8, f8, f8)',
+    # balance, risk_per_trade, volatility_adjustment, entry, stop, fee_impact,
+    # max_position
+    'position_size': 'f8(f8, f8, f8, f8, f8, f8, f8)',
+    # entry, atr, trailing_stop, trailing_activation, price, atr_mult
+    'trailing_stops': 'b1[:](f8[:], f8[:], f8[:], f8[:], f8[:], f8)',
+}
+
+
+def main():
+    """Compile the kernels into an extension module beside this script"""
+    cc = CC(AOT_MODULE)
+    cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+    cc.verbose = True
+    for name, signature in SIGNATURES.items():
+        cc.export(name, signature)(getattr(risk_kernels, f'_{name}').py_func)
+    cc.compile()
+    print(f"Built {AOT_MODULE} in {cc.output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,8 +16,10 @@ Requirements:
 
 import os
 import time
+import copy
 import math
 import logging
+import threading
 import requests
 import ccxt
 import talib
@@ -25,12 +27,19 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 from dotenv import load_dotenv
-from collections import Counter
 import sys
-from decimal import Decimal, ROUND_HALF_UP, getcontext, ROUND_DOWN, localcontext
+from decimal import Decimal, ROUND_HALF_UP, getcontext, ROUND_DOWN
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import traceback
 from typing import Optional, Dict, List, Any
+from backtest_kernels import (
+    backtest_core, _batch_backtest, _simulate_pair, allocate_trades, rolling_poc, trade_capacity,
+    STAT_FINAL_BALANCE, STAT_MAX_DRAWDOWN, STAT_NUM_TRADES, EXIT_REASONS, TRADE_COLUMNS,
+    ACCT_BALANCE, ACCT_DAILY_PNL, ACCT_MAX_BALANCE, ACCT_MAX_DRAWDOWN, ACCT_POS_OPEN,
+    ACCT_POS_ENTRY_PRICE, ACCT_POS_SIZE, ACCT_POS_STOP, ACCT_POS_TAKE_PROFIT,
+    ACCT_POS_TRAILING_STOP, ACCT_POS_ATR, NUM_ACCT,
+)
 # Load environment variables
 load_dotenv()
 
@@ -83,14 +92,21 @@ getcontext().prec = 8
 getcontext().rounding = ROUND_DOWN
 
 
+_QUANTIZER = Decimal('0.00000001')
+
+
 def normalize_decimal(value):
     """Convert a value to a Decimal with 8 decimal places."""
-    if not isinstance(value, Decimal):
+    if isinstance(value, float):
+        # Same shortest digits as str(), minus numpy's scalar formatting for float64
+        value = Decimal(float.__repr__(value))
+    elif not isinstance(value, Decimal):
         value = Decimal(str(value))
+    elif value.as_tuple().exponent == -8:
+        return value  # Already normalized
     
     # Use quantize with ROUND_HALF_UP for proper rounding
-    result = value.quantize(Decimal('0.00000001'), rounding=ROUND_HALF_UP)
-    return result
+    return value.quantize(_QUANTIZER, rounding=ROUND_HALF_UP)
 # =========================
 # Market Data Handler Module
 # =========================
@@ -204,6 +220,21 @@ class MarketDataHandler:
             logging.error(f"Error fetching OHLCV for {coin_id}: {str(e)}\n{traceback.format_exc()}")
             return pd.DataFrame()  # Return empty DataFrame instead of None
 
+    def fetch_altcoin_data_since(self, coin_id, since, timeframe='15m'):
+        """
+        Fetch the OHLCV candles of coin_id opened at or after the `since`
+        millisecond timestamp, as an (n, 6) float64 array of
+        [timestamp, open, high, low, close, volume] rows.
+        """
+        try:
+            candles = self.exchange.fetch_ohlcv(coin_id, timeframe, since=int(since), limit=500)
+        except Exception as e:
+            logging.error(f"Error fetching new candles for {coin_id}: {str(e)}")
+            return None
+        if not candles:
+            return np.empty((0, 6))
+        return np.asarray(candles, dtype=np.float64)
+
     def get_current_price(self, symbol):
         """
         Get the current price for a symbol with caching and error handling
@@ -246,6 +277,47 @@ class MarketDataHandler:
         except Exception as e:
             logging.error(f"Unexpected error fetching price for {symbol}: {str(e)}")
             return None
+
+    def get_current_prices(self, symbols):
+        """
+        Get current prices for several symbols with a single ticker request.
+        
+        Fresh cached prices are reused; symbols without a price are left out
+        of the returned dict.
+        """
+        current_time = time.time()
+        prices = {}
+        missing = []
+        for symbol in symbols:
+            cached = self.price_cache.get(symbol)
+            if cached and current_time - cached[1] < self.cache_expiry:
+                prices[symbol] = cached[0]
+            else:
+                missing.append(symbol)
+        if not missing:
+            return prices
+        
+        try:
+            tickers = self.exchange.fetch_tickers(missing)
+        except ccxt.NetworkError as e:
+            logging.error(f"Network error fetching prices for {missing}: {str(e)}")
+            # Fall back to cached prices where available
+            for symbol in missing:
+                if symbol in self.price_cache:
+                    prices[symbol] = self.price_cache[symbol][0]
+            return prices
+        except Exception as e:
+            logging.error(f"Error fetching prices for {missing}: {str(e)}")
+            return prices
+        
+        for symbol in missing:
+            ticker = tickers.get(symbol)
+            if not ticker or ticker.get('last') is None:
+                logging.error(f"Invalid ticker data for {symbol}")
+                continue
+            prices[symbol] = ticker['last']
+            self.price_cache[symbol] = (ticker['last'], current_time)
+        return prices
 # =========================
 # QQE Indicator
 # =========================
@@ -315,6 +387,109 @@ class VolumeProfile:
             logging.error(f"Error calculating volume profile: {str(e)}")
             return None
 # =========================
+# Streaming Indicator State
+# =========================
+class IndicatorState:
+    """Incremental EMA/RSI/ATR/volume-MA state, updated in O(1) per new candle"""
+    def __init__(self, ema_fast=9, ema_slow=21, rsi_period=14, atr_period=14, volume_ma_period=20,
+                 rsi_ma_period=5):
+        self.alpha_fast = 2.0 / (ema_fast + 1)
+        self.alpha_slow = 2.0 / (ema_slow + 1)
+        self.alpha_rsi_ma = 2.0 / (rsi_ma_period + 1)
+        self.rsi_period = rsi_period
+        self.atr_period = atr_period
+        self.rsi_ma_period = rsi_ma_period
+        
+        self.ema_fast = np.nan
+        self.ema_slow = np.nan
+        self.atr = np.nan
+        self.avg_gain = np.nan
+        self.avg_loss = np.nan
+        self.rsi_ma = np.nan  # QQE smoothing: EMA of the RSI
+        self.prev_close = np.nan
+        
+        # Ring buffer with running sum for the volume SMA
+        self._volumes = np.zeros(volume_ma_period)
+        self._volume_pos = 0
+        self._volume_sum = 0.0
+    
+    def warmup(self, df):
+        """Seed the recurrences from a history frame already passed through compute_indicators"""
+        latest = df.iloc[-1]
+        self.ema_fast = float(latest['ema_fast'])
+        self.ema_slow = float(latest['ema_slow'])
+        self.atr = float(latest['atr'])
+        self.prev_close = float(latest['close'])
+        
+        # talib does not expose Wilder's running averages, so rebuild them once
+        close = df['close'].to_numpy(np.float64)
+        delta = np.diff(close)
+        gains = np.clip(delta, 0, None)
+        losses = np.clip(-delta, 0, None)
+        n = self.rsi_period
+        self.avg_gain = gains[:n].mean()
+        self.avg_loss = losses[:n].mean()
+        for gain, loss in zip(gains[n:], losses[n:]):
+            self.avg_gain = (self.avg_gain * (n - 1) + gain) / n
+            self.avg_loss = (self.avg_loss * (n - 1) + loss) / n
+        self.rsi_ma = float(talib.EMA(talib.RSI(close, n), self.rsi_ma_period)[-1])
+        
+        window = len(self._volumes)
+        recent = df['volume'].to_numpy(np.float64)[-window:]
+        self._volumes[:len(recent)] = recent
+        self._volume_pos = len(recent) % window
+        self._volume_sum = float(recent.sum())
+    
+    def update(self, high, low, close, volume):
+        """Advance every indicator by one candle"""
+        prev_close = self.prev_close
+        
+        # Wilder ATR: atr_t = (atr_{t-1} * (n - 1) + tr_t) / n
+        true_range = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        self.atr = (self.atr * (self.atr_period - 1) + true_range) / self.atr_period
+        
+        self.ema_fast += self.alpha_fast * (close - self.ema_fast)
+        self.ema_slow += self.alpha_slow * (close - self.ema_slow)
+        
+        n = self.rsi_period
+        delta = close - prev_close
+        self.avg_gain = (self.avg_gain * (n - 1) + max(delta, 0.0)) / n
+        self.avg_loss = (self.avg_loss * (n - 1) + max(-delta, 0.0)) / n
+        self.rsi_ma += self.alpha_rsi_ma * (self.rsi - self.rsi_ma)
+        
+        self._volume_sum += volume - self._volumes[self._volume_pos]
+        self._volumes[self._volume_pos] = volume
+        self._volume_pos = (self._volume_pos + 1) % len(self._volumes)
+        
+        self.prev_close = close
+    
+    def copy(self):
+        """Independent copy, e.g. to evaluate a candle that is still forming"""
+        state = copy.copy(self)
+        state._volumes = self._volumes.copy()
+        return state
+    
+    @property
+    def rsi(self):
+        if self.avg_loss == 0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + self.avg_gain / self.avg_loss)
+    
+    @property
+    def volume_ma(self):
+        return self._volume_sum / len(self._volumes)
+    
+    def snapshot(self):
+        """Current indicator values, keyed like the compute_indicators columns"""
+        return {
+            'ema_fast': self.ema_fast,
+            'ema_slow': self.ema_slow,
+            'atr': self.atr,
+            'volume_ma': self.volume_ma,
+            'rsi': self.rsi
+        }
+
+# =========================
 # Signal Generator Module
 # =========================
 class SignalGenerator:
@@ -339,11 +514,16 @@ class SignalGenerator:
         self.vp_period = 14  # 14-day volume profile
         self.value_area_sd = 1.2  # Standard deviations for value area
         self.volume_profile = VolumeProfile()
+        self.value_area_window = 96  # Candles the live check sees: TradingBot.candle_window
         
         # Signal deduplication
         self.last_signal_time = None
         self.cooldown_seconds = 30 * 60  # 30 minutes cooldown
         
+        # Streaming indicator state for live updates
+        self.indicator_state = IndicatorState(self.ema_fast, self.ema_slow, self.rsi_period)
+        self._pair_states = {}  # pair -> (IndicatorState, timestamp of last folded candle)
+        
     def check_correlation(self, sol_prices, btc_prices):
         """Check correlation between SOL and BTC"""
         try:
@@ -446,6 +626,88 @@ class SignalGenerator:
             logging.error(f"Error generating signal: {str(e)}")
             return 'hold'
     
+    def compute_signal_masks(self, df):
+        """
+        Vectorized entry/exit conditions for every candle as uint8 masks.
+        
+        Mirrors the conditions of generate_signal, combined with bitwise AND/OR
+        so the whole frame is evaluated without per-bar branches. As there, a
+        candle outside the value area or too correlated with BTC holds both
+        entries and exits; each candle is judged on the trailing windows live
+        trading would see. Only the wall-clock cooldown stays on the scalar path.
+        """
+        df = self.compute_indicators(df)
+        if df is None:
+            return None, None
+        qqe_values = self.qqe.calculate(df['close'])
+        if qqe_values is None:
+            return None, None
+        
+        close = df['close'].to_numpy(np.float64)
+        trend_up = np.asarray(close > df['ema_slow'].to_numpy(np.float64), dtype=np.uint8)
+        
+        # Oscillator and volume inputs only feed threshold tests, so compare them
+        # as float32; prices stay float64
+        rsi_ma = np.asarray(qqe_values['rsi_ma'], dtype=np.float32)
+        qqe_bullish = np.asarray(rsi_ma > 48, dtype=np.uint8)
+        qqe_bearish = np.asarray(rsi_ma < 52, dtype=np.uint8)
+        volume = df['volume'].to_numpy(np.float32)
+        volume_ma = df['volume_ma'].to_numpy(np.float32)
+        volume_active = np.asarray(volume > volume_ma * np.float32(1.15), dtype=np.uint8)
+        
+        allowed = self.value_area_mask(df, self.value_area_window) & self.correlation_mask(df)
+        entry = trend_up & qqe_bullish & volume_active & allowed
+        exit_ = (qqe_bearish | (volume_active ^ 1)) & allowed  # Exit on weak volume
+        return entry, exit_
+
+    def value_area_mask(self, df, window):
+        """
+        check_volume_profile for every candle as a uint8 mask, each candle
+        judged on the window candles ending at it (fewer at the start).
+        """
+        profile = self.volume_profile
+        close = df['close'].to_numpy(np.float64)
+        volume = df['volume'].to_numpy(np.float64)
+        if len(close) == 0:
+            return np.empty(0, dtype=np.uint8)
+        
+        # Same buckets as VolumeProfile.calculate_profile, numbered in price order
+        step = close * profile.bucket_size
+        buckets, codes = np.unique(np.round(close / step) * step, return_inverse=True)
+        poc = buckets[rolling_poc(codes.astype(np.int64), volume, len(buckets), window)]
+        
+        # Sample standard deviation of each window, with the two-pass formula
+        # Series.std uses
+        def window_std(values):
+            count = values.shape[-1]
+            mean = values.sum(axis=-1) / count
+            return np.sqrt(((np.expand_dims(mean, -1) - values) ** 2).sum(axis=-1) / (count - 1))
+        
+        std = np.full(len(close), np.nan)  # A single candle has none
+        for i in range(1, min(window - 1, len(close))):
+            std[i] = window_std(close[:i + 1])
+        if len(close) >= window:
+            std[window - 1:] = window_std(np.lib.stride_tricks.sliding_window_view(close, window))
+        
+        spread = std * profile.value_area_sd
+        inside = (close >= poc - spread) & (close <= poc + spread)
+        return inside.astype(np.uint8)
+
+    def correlation_mask(self, df):
+        """
+        check_correlation for every candle as a uint8 mask, over the
+        corr_window closes ending at it. All set when df has no btc_close.
+        """
+        allowed = np.ones(len(df), dtype=np.uint8)
+        if 'btc_close' not in df.columns:
+            return allowed
+        returns = np.log(df[['close', 'btc_close']]).diff()
+        correlation = returns['close'].rolling(self.corr_window - 1).corr(returns['btc_close'])
+        # Too few closes allow trading; an undefined correlation does not
+        start = self.corr_window - 1
+        allowed[start:] = np.abs(correlation.to_numpy()[start:]) < self.corr_threshold
+        return allowed
+
     def check_volume_profile(self, df):
         """Check if price is within valid volume profile area"""
         try:
@@ -482,6 +744,70 @@ class SignalGenerator:
             logging.error(f"Error computing indicators: {str(e)}")
             return None
 
+    def warmup_state(self, df):
+        """Compute indicators over history once and seed the streaming state from it"""
+        df = self.compute_indicators(df)
+        if df is None:
+            return None
+        self.indicator_state.warmup(df)
+        return df
+
+    def update_state(self, open_, high, low, close, volume):
+        """Fold one new candle into the streaming indicators and return their values"""
+        self.indicator_state.update(float(high), float(low), float(close), float(volume))
+        return self.indicator_state.snapshot()
+
+    def generate_signal_incremental(self, pair, df):
+        """
+        Signal for the newest candle of df, from per-pair streaming indicators.
+        
+        The first call for a pair (or one after a gap longer than df) warms the
+        state up from df. Later calls only fold in the candles closed since the
+        previous call; the last, still-forming candle is evaluated on a copy of
+        the state so it can keep changing. Mirrors the conditions of
+        generate_signal, with the value-area check only run when a signal would
+        fire. Returns (signal, indicator values), values None while warming up.
+        """
+        if df is None or len(df) <= self.ema_slow:
+            return 'hold', None
+        
+        closed = df.iloc[:-1]
+        timestamps = closed['timestamp'].to_numpy(np.float64)
+        state, last_ts = self._pair_states.get(pair, (None, None))
+        if state is None or last_ts < timestamps[0]:
+            state = IndicatorState(self.ema_fast, self.ema_slow, self.rsi_period,
+                                   rsi_ma_period=self.qqe.sf)
+            history = self.compute_indicators(closed.copy())
+            if history is None:
+                return 'hold', None
+            state.warmup(history)
+            if np.isnan(state.snapshot()['volume_ma']) or np.isnan(state.rsi_ma):
+                return 'hold', None
+        else:
+            for row in closed[timestamps > last_ts].itertuples():
+                state.update(row.high, row.low, row.close, row.volume)
+        self._pair_states[pair] = (state, timestamps[-1])
+        
+        latest = df.iloc[-1]
+        current = state.copy()
+        current.update(float(latest['high']), float(latest['low']),
+                       float(latest['close']), float(latest['volume']))
+        values = current.snapshot()
+        values['rsi_ma'] = current.rsi_ma
+        
+        current_price = float(latest['close'])
+        volume_active = latest['volume'] > values['volume_ma'] * 1.15
+        if not self.in_position:
+            if current_price > values['ema_slow'] and values['rsi_ma'] > 48 and volume_active:
+                if self.check_volume_profile(df) and self.validate_signal('buy', current_price):
+                    logging.info("Buy signal generated: All conditions met")
+                    return 'buy', values
+        elif values['rsi_ma'] < 52 or not volume_active:  # Exit on weak volume
+            if self.check_volume_profile(df) and self.validate_signal('sell', current_price):
+                logging.info("Sell signal generated: Exit conditions met")
+                return 'sell', values
+        return 'hold', values
+
     def validate_signal(self, signal_type, current_price):
         """Validate signal to prevent duplicates and respect cooldown periods"""
         current_time = time.time()  # Get current time here
@@ -511,6 +837,7 @@ class RiskManager:
         self.atr_sl_mult = normalize_decimal('1.5')  # ATR multiplier for stop loss
         self.atr_tp_mult = normalize_decimal('3.0')  # ATR multiplier for take profit
         self.min_trade_amount = normalize_decimal('10.0')  # Minimum trade size in USDT
+        self.fee_rate = normalize_decimal('0.001')  # 0.1% trading fee
         
         # Daily tracking
         self.daily_pnl = normalize_decimal('0')
@@ -634,10 +961,12 @@ class TradeExecutor:
                 order = self.exchange.create_market_order(symbol, side, amount)
             else:
                 order = None
-            logging.info(f"Placed {side} {order_type} order for {symbol}: {order}")
+            # The order dict's repr is large; skip the call entirely below INFO
+            if logging.getLogger().isEnabledFor(logging.INFO):
+                logging.info("Placed %s %s order for %s: %s", side, order_type, symbol, order)
             return order
         except Exception as e:
-            logging.error(f"Error placing order for {symbol}: {e}")
+            logging.error("Error placing order for %s: %s", symbol, e)
             return None
 
     def place_limit_order(self, symbol, side, amount, price, offset=0.0003):
@@ -655,10 +984,10 @@ class TradeExecutor:
                 limit_price
             )
             
-            logging.info(f"Placed {side} limit order for {symbol} at {limit_price}: {order}")
+            logging.info("Placed %s limit order for %s at %s: %s", side, symbol, limit_price, order)
             return order
         except Exception as e:
-            logging.error(f"Error placing limit order: {str(e)}")
+            logging.error("Error placing limit order: %s", e)
             return None
 # =========================
 # Backtesting Module
@@ -670,7 +999,79 @@ class Backtester:
         self.risk_manager = risk_manager
         self.fee_rate = 0.001  # 0.1% trading fee
 
-    def run_backtest(self, coin_id, initial_balance=70, days_back=30):
+    def _prepare_arrays(self, df):
+        """Compute signal masks for a candle DataFrame and extract the kernel input arrays"""
+        entry, exit_ = self.signal_generator.compute_signal_masks(df)
+        close = df['close'].to_numpy(np.float64)
+        atr = df['atr'].to_numpy(np.float64)
+        # Day number of each candle, so daily resets are an integer compare per bar
+        day = df.index.values.astype('datetime64[D]').astype(np.int64)
+        return close, atr, entry, exit_, day
+
+    def _kernel_params(self, initial_balance):
+        """Scalar kernel arguments shared by single-coin and batch runs"""
+        rm = self.risk_manager
+        return (
+            self.signal_generator.ema_slow,
+            float(initial_balance),
+            float(self.fee_rate),
+            float(rm.max_position_size),
+            float(rm.min_trade_amount),
+            float(rm.atr_sl_mult),
+            float(rm.atr_tp_mult),
+            float(rm.atr_trail_mult),
+            float(rm.max_daily_loss),
+            int(rm.max_trades),
+        )
+
+    def _build_results(self, coin_id, initial_balance, stats, trades, include_trades=False):
+        """
+        Turn a kernel statistics row and its trade arrays into the backtest results dict.
+        
+        Per-trade figures are NumPy reductions over the struct-of-arrays trade
+        buffers; the arrays themselves are only attached when include_trades is set.
+        """
+        final_balance = float(stats[STAT_FINAL_BALANCE])
+        num_trades = int(stats[STAT_NUM_TRADES])
+        trades = {name: column[:num_trades] for name, column in trades.items()}
+        pnl = trades['pnl']
+        total_pnl = final_balance - initial_balance
+        reason_counts = np.bincount(trades['reason'], minlength=len(EXIT_REASONS))
+        results = {
+            'coin_id': coin_id,
+            'initial_balance': initial_balance,
+            'final_balance': final_balance,
+            'total_pnl': total_pnl,
+            'total_pnl_pct': (total_pnl / initial_balance) * 100,
+            'max_drawdown': float(stats[STAT_MAX_DRAWDOWN]),
+            'num_trades': num_trades,
+            'win_rate': float((pnl > 0).mean()) * 100 if num_trades else 0.0,
+            'total_fees': float(trades['fees'].sum()),
+            'avg_trade_pnl': float(pnl.mean()) if num_trades else 0.0,
+            'exit_reasons': {reason: int(count)
+                             for reason, count in zip(EXIT_REASONS, reason_counts) if count},
+        }
+        if include_trades:
+            results['trades'] = trades
+        return results
+
+    def _log_results(self, results):
+        """Log the summary of a finished backtest"""
+        logging.info("\n=== Backtest Results: %s ===", results['coin_id'])
+        logging.info("Initial Balance: $%.2f", results['initial_balance'])
+        logging.info("Final Balance: $%.2f", results['final_balance'])
+        logging.info("Total Profit/Loss: $%.2f (%.2f%%)", results['total_pnl'], results['total_pnl_pct'])
+        logging.info("Maximum Drawdown: %.2f%%", results['max_drawdown'] * 100)
+        logging.info("Number of Trades: %d", results['num_trades'])
+        logging.info("Win Rate: %.2f%%", results['win_rate'])
+        logging.info("Total Fees Paid: $%.2f", results['total_fees'])
+        logging.info("Average Trade P/L: $%.2f", results['avg_trade_pnl'])
+        
+        logging.info("\nExit Reasons Distribution:")
+        for reason, count in results['exit_reasons'].items():
+            logging.info("%s: %d trades", reason, count)
+
+    def run_backtest(self, coin_id, initial_balance=70, days_back=30, include_trades=False):
         """
         Run a backtest for a given coin using historical data.
         
@@ -678,90 +1079,111 @@ class Backtester:
             coin_id (str): Trading pair to backtest
             initial_balance (float): Starting balance in USDT
             days_back (int): Number of days to backtest
+            include_trades (bool): Attach the per-trade arrays to the results
         """
-        logging.info(f"\nStarting backtest for {coin_id}")
-        logging.info(f"Initial balance: ${initial_balance:.2f}")
-        logging.info(f"Backtest period: {days_back} days")
+        logging.info("\nStarting backtest for %s", coin_id)
+        logging.info("Initial balance: $%.2f", initial_balance)
+        logging.info("Backtest period: %d days", days_back)
         
         # Fetch historical data
         df = self.data_handler.fetch_altcoin_data(coin_id, days_back=days_back)
         if df is None or df.empty:
-            logging.error(f"No data available for backtesting {coin_id}.")
+            logging.error("No data available for backtesting %s.", coin_id)
             return None
             
-        logging.info(f"Loaded {len(df)} candles from {df.index[0]} to {df.index[-1]}")
-        
-        # Compute indicators
-        df = self.signal_generator.compute_indicators(df)
-        logging.info("Computed technical indicators")
-        
-        # Initialize tracking variables
-        balance = initial_balance
-        position = 0
-        entry_price = 0
-        trades = []
-        max_balance = initial_balance
-        max_drawdown = 0
-        daily_pnl = 0
-        last_trade_day = None
-        
-        # Log initial conditions
-        logging.info(f"Starting balance: ${balance:.2f}")
-        logging.info("Beginning trade simulation...")
-        
-        # Start backtesting after sufficient data is available
-        for i in range(self.signal_generator.ema_slow, len(df)):
-            slice_df = df.iloc[:i+1]
-            current_price = slice_df.iloc[-1]['close']
-            current_atr = slice_df.iloc[-1]['atr']
-            current_day = slice_df.index[-1].date()
-            
-            # Rest of your existing code...
-            # Add logging statements at key points:
-            
-            if position == 0 and signal == 'buy':
-                logging.info(f"Buy signal detected at ${current_price:.2f}")
-                logging.info(f"ATR: {current_atr:.4f}, Volatility adjustment applied")
-                
-            if position > 0 and (decision != 'hold' or signal == 'sell'):
-                logging.info(f"Sell signal detected at ${current_price:.2f}")
-                logging.info(f"Exit reason: {decision if decision != 'hold' else 'signal'}")
-                logging.info(f"Trade PnL: ${trade_pnl:.2f} ({(trade_pnl/initial_balance)*100:.2f}%)")
-        
-        # Enhanced results logging
-        logging.info("\n=== Backtest Results ===")
-        logging.info(f"Initial Balance: ${initial_balance:.2f}")
-        logging.info(f"Final Balance: ${balance:.2f}")
-        logging.info(f"Total Profit/Loss: ${total_pnl:.2f} ({total_pnl_pct:.2f}%)")
-        logging.info(f"Maximum Drawdown: {max_drawdown*100:.2f}%")
-        logging.info(f"Number of Trades: {num_trades}")
-        logging.info(f"Win Rate: {win_rate:.2f}%")
-        logging.info(f"Total Fees Paid: ${total_fees:.2f}")
-        logging.info(f"Average Trade P/L: ${avg_trade_pnl:.2f}")
-        
-        # Log trade distribution
-        logging.info("\nExit Reasons Distribution:")
-        for reason, count in exit_reasons.items():
-            logging.info(f"{reason}: {count} trades ({(count/num_trades)*100:.1f}%)")
+        logging.info("Loaded %d candles from %s to %s", len(df), df.index[0], df.index[-1])
+        
+        close, atr, entry, exit_, day = self._prepare_arrays(df)
+        logging.info("Computed technical indicators and signals")
+        
+        # Run the compiled simulation loop
+        trades = allocate_trades(trade_capacity(len(close)))
+        stats = backtest_core(close, atr, entry, exit_, day, len(close),
+                              *self._kernel_params(initial_balance),
+                              *(trades[name] for name in TRADE_COLUMNS))
         
+        results = self._build_results(coin_id, initial_balance, stats, trades, include_trades)
+        self._log_results(results)
         return results
 
+    def run_batch_backtest(self, coin_ids, initial_balance=70, days_back=30, include_trades=False):
+        """
+        Backtest several coins at once; the per-coin simulations run in parallel.
+        
+        Args:
+            coin_ids (list): Trading pairs to backtest
+            initial_balance (float): Starting balance in USDT for each coin
+            days_back (int): Number of days to backtest
+            include_trades (bool): Attach the per-trade arrays to each coin's results
+        
+        Returns:
+            dict mapping each coin with data to its results dict
+        """
+        prepared = {}
+        for coin_id in coin_ids:
+            df = self.data_handler.fetch_altcoin_data(coin_id, days_back=days_back)
+            if df is None or df.empty:
+                logging.error("No data available for backtesting %s.", coin_id)
+                continue
+            prepared[coin_id] = self._prepare_arrays(df)
+        
+        if not prepared:
+            return {}
+        
+        # Stack per-coin arrays into NaN-padded (n_coins, T) matrices
+        n_coins = len(prepared)
+        n_bars = np.array([len(arrays[0]) for arrays in prepared.values()], dtype=np.int64)
+        width = int(n_bars.max())
+        close_m = np.full((n_coins, width), np.nan)
+        atr_m = np.full((n_coins, width), np.nan)
+        entry_m = np.zeros((n_coins, width), dtype=np.uint8)
+        exit_m = np.zeros((n_coins, width), dtype=np.uint8)
+        day_m = np.zeros((n_coins, width), dtype=np.int64)
+        for k, (close, atr, entry, exit_, day) in enumerate(prepared.values()):
+            close_m[k, :n_bars[k]] = close
+            atr_m[k, :n_bars[k]] = atr
+            entry_m[k, :n_bars[k]] = entry
+            exit_m[k, :n_bars[k]] = exit_
+            day_m[k, :n_bars[k]] = day
+        
+        trades = allocate_trades(trade_capacity(width), n_coins)
+        stats = _batch_backtest(close_m, atr_m, entry_m, exit_m, day_m, n_bars,
+                                *self._kernel_params(initial_balance),
+                                *(trades[name] for name in TRADE_COLUMNS))
+        
+        all_results = {}
+        for k, coin_id in enumerate(prepared):
+            coin_trades = {name: column[k] for name, column in trades.items()}
+            results = self._build_results(coin_id, initial_balance, stats[k], coin_trades,
+                                          include_trades)
+            self._log_results(results)
+            all_results[coin_id] = results
+        return all_results
+
 # =========================
 # Trading Bot Module
 # =========================
 class Position:
     """Tracks a single position with precise calculations"""
+    MIN_ORDER_SIZE = Decimal('10.00000000')  # Minimum order size in USDT
+    
+    # Normalized fee rates by raw value; positions share one or two rates
+    _fee_rate_cache = {}
+    
     def __init__(self, pair, entry_price, usdt_size, fee_rate):
         """Initialize a new position with proper decimal precision"""
         self.pair = pair
         self.entry_price = normalize_decimal(entry_price)
         self.usdt_size = normalize_decimal(usdt_size)
-        self.fee_rate = normalize_decimal(fee_rate)
+        self.fee_rate = self._fee_rate_cache.get(fee_rate)
+        if self.fee_rate is None:
+            self.fee_rate = self._fee_rate_cache[fee_rate] = normalize_decimal(fee_rate)
         
-        # Calculate entry details with consistent precision
+        # Calculate entry details with consistent precision; usdt_size is
+        # already normalized and doubles as the entry cost
         self.entry_fee = normalize_decimal(self.usdt_size * self.fee_rate)
         self.quantity = normalize_decimal((self.usdt_size - self.entry_fee) / self.entry_price)
-        self.entry_cost = normalize_decimal(self.usdt_size)
+        self.entry_cost = self.usdt_size
         
         # Initialize other attributes
         self.atr = normalize_decimal('0')
@@ -772,8 +1194,7 @@ class Position:
 
     def is_valid(self):
         """Check if position meets minimum requirements"""
-        min_order_size = normalize_decimal('10.0')  # Minimum order size in USDT
-        return self.usdt_size >= min_order_size
+        return self.usdt_size >= self.MIN_ORDER_SIZE
 
     def update_current_value(self, current_price):
         """Calculate current position value and unrealized PnL"""
@@ -790,6 +1211,27 @@ class Position:
             'exit_fee': exit_fee
         }
 
+    @classmethod
+    def batch_update(cls, positions, prices):
+        """
+        Net value and unrealized PnL of many positions in one float64 pass.
+        
+        prices lines up with positions. Only the arithmetic runs in floats; the
+        results are quantized back to 8 places on return, as lists of Decimals.
+        They can be 1e-8 away from update_current_value, which rounds the exit
+        fee on its own before subtracting it.
+        """
+        n = len(positions)
+        quantity = np.fromiter((p.quantity for p in positions), dtype=np.float64, count=n)
+        fee_rate = np.fromiter((p.fee_rate for p in positions), dtype=np.float64, count=n)
+        entry_cost = np.fromiter((p.entry_cost for p in positions), dtype=np.float64, count=n)
+        gross_value = quantity * np.asarray(prices, dtype=np.float64)
+        net_value = gross_value - gross_value * fee_rate
+        return {
+            'net_value': [normalize_decimal(v) for v in net_value.tolist()],
+            'unrealized_pnl': [normalize_decimal(v) for v in (net_value - entry_cost).tolist()]
+        }
+
     def close_position(self, exit_price):
         """Close the position and calculate realized PnL"""
         exit_price = normalize_decimal(exit_price)
@@ -835,6 +1277,83 @@ class Position:
             'remaining_quantity': remaining_quantity
         }
 
+class TradeHistory:
+    """Closed trades stored column-wise, one NumPy array per field"""
+    COLUMNS = {
+        'entry_price': np.float64,
+        'exit_price': np.float64,
+        'position_size': np.float64,
+        'quantity': np.float64,
+        'pnl': np.float64,
+        'fees': np.float64,
+        'reason': np.int8,  # Index into EXIT_REASONS
+        'day': np.int64,  # Days since the epoch of the exit
+    }
+
+    def __init__(self, capacity=64):
+        self.pairs = []
+        self._columns = {name: np.empty(capacity, dtype=dtype)
+                         for name, dtype in self.COLUMNS.items()}
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, name):
+        """Filled part of a column"""
+        return self._columns[name][:self._count]
+
+    def _reserve(self, n):
+        """Grow the columns geometrically so appends stay amortized O(1)"""
+        needed = self._count + n
+        capacity = len(self._columns['pnl'])
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name, column in self._columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._count] = column[:self._count]
+            self._columns[name] = grown
+
+    @staticmethod
+    def day_number(date):
+        """Days since the epoch, the same day numbering the backtest kernels use"""
+        return int(np.datetime64(date, 'D').astype(np.int64))
+
+    def append(self, pair, entry_price, exit_price, position_size, quantity, pnl, fees, exit_reason, date):
+        """Record one closed trade; exit_reason is one of EXIT_REASONS"""
+        self.extend(pair, [entry_price], [exit_price], [position_size], [quantity],
+                    [pnl], [fees], [EXIT_REASONS.index(exit_reason)], self.day_number(date))
+
+    def extend(self, pair, entry_price, exit_price, position_size, quantity, pnl, fees, reason, day):
+        """Record a batch of closed trades for one pair from equal-length arrays"""
+        n = len(pnl)
+        self._reserve(n)
+        end = self._count + n
+        values = (entry_price, exit_price, position_size, quantity, pnl, fees, reason, day)
+        for name, value in zip(self.COLUMNS, values):
+            self._columns[name][self._count:end] = value
+        self.pairs.extend([pair] * n)
+        self._count = end
+
+    def summary(self, date=None):
+        """Aggregate statistics over all recorded trades, or those closed on date"""
+        pnl, fees, reason = self['pnl'], self['fees'], self['reason']
+        if date is not None:
+            closed_on = self['day'] == self.day_number(date)
+            pnl, fees, reason = pnl[closed_on], fees[closed_on], reason[closed_on]
+        counts = np.bincount(reason, minlength=len(EXIT_REASONS))
+        return {
+            'num_trades': len(pnl),
+            'total_pnl': float(pnl.sum()),
+            'win_rate': float((pnl > 0).mean()) * 100 if len(pnl) else 0.0,
+            'avg_pnl': float(pnl.mean()) if len(pnl) else 0.0,
+            'total_fees': float(fees.sum()),
+            'exit_reasons': {reason: int(count)
+                             for reason, count in zip(EXIT_REASONS, counts) if count},
+        }
+
 class TradingBot:
     def __init__(self, trading_pairs, initial_balance=100):
         self.market_data = MarketDataHandler()
@@ -844,11 +1363,75 @@ class TradingBot:
         self.initial_balance = normalize_decimal(initial_balance)
         self.balance = self.initial_balance
         self.positions = {}  # Dictionary to track open positions
-        self.trade_history = []
+        self.trade_history = TradeHistory()
         self.daily_pnl = normalize_decimal('0')
         self.last_trade_day = None
         self.max_balance = self.initial_balance
         self.max_drawdown = normalize_decimal('0')
+        
+        # Rolling candle window per pair for live iterations
+        self.candle_window = 96  # 1 day of 15-minute candles
+        self._ohlcv_cache = {}  # pair -> (n, 6) [timestamp, o, h, l, c, v] array
+        # Candle requests are network-bound; one worker per pair overlaps them.
+        # The pool is only started by the first live iteration
+        self._fetch_pool = None
+        self._fetch_workers = threading.local()
+
+    def _candle_pool(self):
+        """The fetch worker pool, started on first use"""
+        if self._fetch_pool is None:
+            self._fetch_pool = ThreadPoolExecutor(max_workers=max(len(self.trading_pairs), 1),
+                                                  thread_name_prefix='candles')
+        return self._fetch_pool
+
+    def _worker_market_data(self):
+        """
+        The calling thread's own MarketDataHandler. ccxt's synchronous clients
+        share their session, nonce and rate limiter, so fetch workers never
+        use self.market_data or each other's.
+        """
+        market_data = getattr(self._fetch_workers, 'market_data', None)
+        if market_data is None:
+            market_data = self._fetch_workers.market_data = MarketDataHandler()
+        return market_data
+
+    def _fetch_recent_candles(self, pair):
+        """_recent_candles on the calling fetch worker's own exchange client"""
+        return self._recent_candles(pair, market_data=self._worker_market_data())
+
+    def close(self):
+        """Stop the fetch workers, if any were started"""
+        if self._fetch_pool is not None:
+            self._fetch_pool.shutdown(wait=True)
+            self._fetch_pool = None
+
+    def _recent_candles(self, pair, timeframe='15m', market_data=None):
+        """
+        Latest candle_window candles for pair, as an indicator-ready DataFrame.
+        
+        The first call fetches a full day; later calls only request candles
+        from the last cached one onwards (refreshing the still-open candle)
+        and shift them into the cached window. market_data defaults to the
+        bot's own handler.
+        """
+        market_data = market_data or self.market_data
+        window = self._ohlcv_cache.get(pair)
+        if window is None:
+            df = market_data.fetch_altcoin_data(pair, timeframe=timeframe, days_back=1)
+            if df is None or df.empty:
+                return None
+            window = df[['timestamp', 'open', 'high', 'low', 'close', 'volume']].to_numpy(np.float64)
+        else:
+            new = market_data.fetch_altcoin_data_since(pair, window[-1, 0], timeframe)
+            if new is not None and len(new):
+                window = np.concatenate([window[window[:, 0] < new[0, 0]], new])
+        window = window[-self.candle_window:]
+        self._ohlcv_cache[pair] = window
+        
+        df = pd.DataFrame(window, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        df.index = pd.to_datetime(df['timestamp'], unit='ms')
+        df.index.name = 'datetime'
+        return df
 
     def execute_trade(self, pair, signal, current_price, current_atr):
         """Execute a trade based on the signal and current market conditions"""
@@ -902,10 +1485,10 @@ class TradingBot:
             
             # Create new position
             position = Position(pair, current_price, position_size, self.risk_manager.fee_rate)
-            position.current_stop = normalize_decimal(str(stop_levels['stop_loss']))
-            position.take_profit = normalize_decimal(str(stop_levels['take_profit']))
-            position.trailing_stop = normalize_decimal(str(stop_levels['trailing_stop']))
-            position.atr = normalize_decimal(str(current_atr))
+            position.current_stop = normalize_decimal(stop_levels['stop_loss'])
+            position.take_profit = normalize_decimal(stop_levels['take_profit'])
+            position.trailing_stop = normalize_decimal(stop_levels['trailing_stop'])
+            position.atr = normalize_decimal(current_atr)
             
             # Update balance
             self.balance -= position.entry_cost
@@ -923,7 +1506,7 @@ class TradingBot:
             # Update trailing stop if applicable
             new_stop = self.risk_manager.update_trailing_stop(position, current_price)
             if new_stop:
-                position.current_stop = normalize_decimal(str(new_stop))
+                position.current_stop = normalize_decimal(new_stop)
             
             # Check exit conditions
             exit_signal = self.risk_manager.evaluate_trade(position, current_price)
@@ -933,55 +1516,105 @@ class TradingBot:
                 close_results = position.close_position(current_price)
                 
                 # Update balance and track metrics
-                self.balance += normalize_decimal(str(close_results['net_value']))
-                self.daily_pnl += normalize_decimal(str(close_results['realized_pnl']))
+                self.balance += close_results['net_value']
+                self.daily_pnl += close_results['realized_pnl']
                 
                 # Record trade
-                self.trade_history.append({
-                    'pair': pair,
-                    'entry_price': float(position.entry_price),
-                    'exit_price': current_price,
-                    'position_size': float(position.usdt_size),
-                    'quantity': float(position.quantity),
-                    'pnl': float(close_results['realized_pnl']),
-                    'fees': float(close_results['total_fees']),
-                    'exit_reason': exit_signal if exit_signal != 'hold' else 'signal'
-                })
+                self.trade_history.append(
+                    pair,
+                    entry_price=float(position.entry_price),
+                    exit_price=float(current_price),
+                    position_size=float(position.usdt_size),
+                    quantity=float(position.quantity),
+                    pnl=float(close_results['realized_pnl']),
+                    fees=float(close_results['total_fees']),
+                    exit_reason=exit_signal if exit_signal != 'hold' else 'signal',
+                    date=current_day
+                )
                 
                 print(f"Closing {pair} position: Exit=${current_price:.2f}, PnL=${float(close_results['realized_pnl']):.2f}")
                 
                 # Remove position
                 del self.positions[pair]
                 
-                # Update max balance and drawdown
-                self.max_balance = max(self.max_balance, self.balance)
-                current_drawdown = (self.max_balance - self.balance) / self.max_balance
-                self.max_drawdown = max(self.max_drawdown, current_drawdown)
+                # Update max balance and drawdown; at a new high the drawdown is
+                # zero, so the Decimal division is only needed below the peak
+                if self.balance >= self.max_balance:
+                    self.max_balance = self.balance
+                else:
+                    current_drawdown = (self.max_balance - self.balance) / self.max_balance
+                    self.max_drawdown = max(self.max_drawdown, current_drawdown)
+
+    def _account_state(self):
+        """Pack balance and drawdown tracking into a float64 array for _simulate_pair"""
+        account = np.zeros(NUM_ACCT)
+        account[ACCT_BALANCE] = float(self.balance)
+        account[ACCT_DAILY_PNL] = float(self.daily_pnl)
+        account[ACCT_MAX_BALANCE] = float(self.max_balance)
+        account[ACCT_MAX_DRAWDOWN] = float(self.max_drawdown)
+        return account
+
+    def _apply_account_state(self, pair, account):
+        """Copy a simulated account back onto the bot, rebuilding any open position"""
+        self.balance = normalize_decimal(account[ACCT_BALANCE])
+        self.daily_pnl = normalize_decimal(account[ACCT_DAILY_PNL])
+        self.max_balance = normalize_decimal(account[ACCT_MAX_BALANCE])
+        self.max_drawdown = normalize_decimal(account[ACCT_MAX_DRAWDOWN])
+        if account[ACCT_POS_OPEN]:
+            position = Position(pair, account[ACCT_POS_ENTRY_PRICE], account[ACCT_POS_SIZE],
+                                self.risk_manager.fee_rate)
+            position.current_stop = normalize_decimal(account[ACCT_POS_STOP])
+            position.take_profit = normalize_decimal(account[ACCT_POS_TAKE_PROFIT])
+            position.trailing_stop = normalize_decimal(account[ACCT_POS_TRAILING_STOP])
+            position.atr = normalize_decimal(account[ACCT_POS_ATR])
+            self.positions[pair] = position
 
     def run_backtest(self, start_date=None, end_date=None):
         """Run backtest with the specified parameters"""
         print(f"Starting backtest with initial balance: ${float(self.balance):.2f}")
         
+        rm = self.risk_manager
+        fee_rate = float(rm.fee_rate)
         for pair in self.trading_pairs:
             print(f"\nBacktesting {pair}...")
             
             # Fetch historical data
             df = self.market_data.fetch_altcoin_data(pair)
-            if df.empty:
+            if df is None or df.empty:
                 print(f"No data available for {pair}")
                 continue
                 
             # Generate signals
             signals = self.signal_generator.generate_signals(df)
             
-            # Simulate trading
-            for i in range(len(df)):
-                current_price = df['close'].iloc[i]
-                current_atr = df['atr'].iloc[i]
-                signal = signals.iloc[i]
-                
-                self.execute_trade(pair, signal, current_price, current_atr)
-                
+            # Simulate trading on float64 arrays; Decimal is only used for the
+            # account state copied back afterwards
+            close = df['close'].to_numpy(np.float64)
+            atr = df['atr'].to_numpy(np.float64)
+            sig = signals.to_numpy(np.int8)
+            account = self._account_state()
+            trades = allocate_trades(trade_capacity(len(close)))
+            n_trades = _simulate_pair(close, atr, sig, account, fee_rate,
+                                      float(rm.max_position_size), float(rm.min_trade_amount),
+                                      float(rm.max_daily_loss), float(rm.atr_sl_mult),
+                                      float(rm.atr_tp_mult), float(rm.atr_trail_mult),
+                                      *(trades[name] for name in TRADE_COLUMNS))
+            self._apply_account_state(pair, account)
+            
+            trades = {name: column[:n_trades] for name, column in trades.items()}
+            entry_price = close[trades['entry_idx']]
+            self.trade_history.extend(
+                pair,
+                entry_price=entry_price,
+                exit_price=close[trades['exit_idx']],
+                position_size=trades['size'],
+                quantity=trades['size'] * (1 - fee_rate) / entry_price,
+                pnl=trades['pnl'],
+                fees=trades['fees'],
+                reason=trades['reason'],
+                day=df.index.values[trades['exit_idx']].astype('datetime64[D]').astype(np.int64)
+            )
+            
         # Print final results
         print("\nBacktest Results:")
         print(f"Final Balance: ${float(self.balance):.2f}")
@@ -989,22 +1622,17 @@ class TradingBot:
         print(f"Total Profit/Loss: ${float(total_pnl):.2f} ({float(total_pnl/self.initial_balance)*100:.2f}%)")
         print(f"Max Drawdown: {float(self.max_drawdown)*100:.2f}%")
         
-        total_trades = len(self.trade_history)
+        stats = self.trade_history.summary()
+        total_trades = stats['num_trades']
         if total_trades > 0:
-            winning_trades = sum(1 for trade in self.trade_history if trade['pnl'] > 0)
-            win_rate = (winning_trades / total_trades) * 100
-            total_fees = sum(trade['fees'] for trade in self.trade_history)
-            avg_profit = sum(trade['pnl'] for trade in self.trade_history) / total_trades
-            
             print(f"Number of Trades: {total_trades}")
-            print(f"Win Rate: {win_rate:.2f}%")
-            print(f"Average Trade Profit: ${avg_profit:.2f}")
-            print(f"Total Fees Paid: ${total_fees:.2f}")
+            print(f"Win Rate: {stats['win_rate']:.2f}%")
+            print(f"Average Trade Profit: ${stats['avg_pnl']:.2f}")
+            print(f"Total Fees Paid: ${stats['total_fees']:.2f}")
             
             # Print exit reasons distribution
-            exit_reasons = Counter(trade['exit_reason'] for trade in self.trade_history)
             print("\nExit Reasons Distribution:")
-            for reason, count in exit_reasons.items():
+            for reason, count in stats['exit_reasons'].items():
                 print(f"{reason}: {count} trades ({(count/total_trades)*100:.1f}%)")
 
     def run_iteration(self):
@@ -1016,6 +1644,12 @@ class TradingBot:
         print(f"Current Balance: ${float(self.balance):.2f}")
         print(f"Open Positions: {len(self.positions)}")
         
+        # Request every pair's candles at once so the iteration waits for the
+        # slowest response rather than the sum of them
+        pool = self._candle_pool()
+        candles = {pair: pool.submit(self._fetch_recent_candles, pair)
+                   for pair in self.trading_pairs}
+        
         for pair in self.trading_pairs:
             try:
                 # Skip if we already have maximum positions
@@ -1023,19 +1657,20 @@ class TradingBot:
                     print(f"Maximum positions ({self.risk_manager.max_trades}) reached. Skipping {pair}")
                     continue
                 
-                # Fetch latest data (1 day of 15-minute candles should be enough for indicators)
-                df = self.market_data.fetch_altcoin_data(pair, timeframe='15m', days_back=1)
+                # Latest day of 15-minute candles, fetched incrementally
+                df = candles[pair].result()
                 if df is None or df.empty:
                     print(f"No data available for {pair}")
                     continue
                 
-                # Generate signal
-                signals = self.signal_generator.generate_signals(df)
-                current_signal = signals.iloc[-1]
+                # Only the newest candle's signal is traded; indicators are carried
+                # forward per pair, so just the new candles are folded in
+                signal, values = self.signal_generator.generate_signal_incremental(pair, df)
+                current_signal = 1 if signal == 'buy' else (-1 if signal == 'sell' else 0)
                 
                 # Get current price and ATR
                 current_price = df['close'].iloc[-1]
-                current_atr = df['atr'].iloc[-1]
+                current_atr = values['atr'] if values else np.nan
                 
                 # Execute trade based on signal
                 self.execute_trade(pair, current_signal, current_price, current_atr)
@@ -1045,7 +1680,7 @@ class TradingBot:
                     position = self.positions[pair]
                     new_stop = self.risk_manager.update_trailing_stop(position, current_price)
                     if new_stop and new_stop != position.current_stop:
-                        position.current_stop = normalize_decimal(str(new_stop))
+                        position.current_stop = normalize_decimal(new_stop)
                         print(f"Updated trailing stop for {pair} to ${float(new_stop):.2f}")
                 
             except Exception as e:
@@ -1055,24 +1690,26 @@ class TradingBot:
         # Print current positions status
         if self.positions:
             print("\nCurrent Positions:")
+            prices = self.market_data.get_current_prices(list(self.positions))
             for pair, position in self.positions.items():
-                current_price = self.market_data.get_current_price(pair)
-                if current_price:
-                    position_value = position.update_current_value(current_price)
+                current_price = prices.get(pair)
+                if current_price is None:
+                    print(f"{pair}: Entry=${float(position.entry_price):.2f}, price unavailable")
+                    continue
+                # The reported PnL stays on the exact Decimal path
+                unrealized_pnl = position.update_current_value(current_price)['unrealized_pnl']
                 print(f"{pair}: Entry=${float(position.entry_price):.2f}, "
-                        f"Current=${current_price:.2f}, "
+                      f"Current=${current_price:.2f}, "
                       f"Size=${float(position.usdt_size):.2f}, "
-                        f"PnL=${float(position_value['unrealized_pnl']):.2f}")
+                      f"PnL=${float(unrealized_pnl):.2f}")
         
         # Print daily statistics
-        if self.trade_history:
-            today_trades = [t for t in self.trade_history 
-                          if datetime.now().date() == datetime.now().date()]
-            if today_trades:
-                print("\nToday's Trading Statistics:")
-                print(f"Number of Trades: {len(today_trades)}")
-                print(f"Profit/Loss: ${sum(t['pnl'] for t in today_trades):.2f}")
-                print(f"Win Rate: {(sum(1 for t in today_trades if t['pnl'] > 0) / len(today_trades)) * 100:.1f}%")
+        stats = self.trade_history.summary(date=current_time.date())
+        if stats['num_trades']:
+            print("\nToday's Trading Statistics:")
+            print(f"Number of Trades: {stats['num_trades']}")
+            print(f"Profit/Loss: ${stats['total_pnl']:.2f}")
+            print(f"Win Rate: {stats['win_rate']:.1f}%")
 
 # =========================
 # Utility Functions
@@ -1156,15 +1793,18 @@ def main():
             logging.info("Starting live trading mode")
             bot = TradingBot(TRADING_PAIRS, initial_balance=float(os.getenv('INITIAL_BALANCE', '1000')))
             
-            while True:
-                try:
-                    bot.run_iteration()
-                    update_interval = os.getenv('UPDATE_INTERVAL', '900').strip()
-                    update_interval = update_interval.split('#')[0].strip()  # Remove any comments
-                    time.sleep(int(update_interval))  # Convert to integer and sleep
-                except Exception as e:
-                    logging.error(f"Trading loop error: {str(e)}")
-                    time.sleep(60)  # Wait 1 minute on error before retrying
+            try:
+                while True:
+                    try:
+                        bot.run_iteration()
+                        update_interval = os.getenv('UPDATE_INTERVAL', '900').strip()
+                        update_interval = update_interval.split('#')[0].strip()  # Remove any comments
+                        time.sleep(int(update_interval))  # Convert to integer and sleep
+                    except Exception as e:
+                        logging.error(f"Trading loop error: {str(e)}")
+                        time.sleep(60)  # Wait 1 minute on error before retrying
+            finally:
+                bot.close()
             
     except Exception as e:
         print(f"Error in main: {str(e)}")  # Debug print
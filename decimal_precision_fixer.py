@@ -4,30 +4,30 @@ Decimal Precision Fixer
 =======================
 
 A robust implementation to fix decimal precision issues in the trading bot.
-Uses AST-based validation and context-aware regex patterns to safely modify code.
+Locates code through the AST and validates the result before saving.
 """
 
 import ast
 import re
+import shutil
 import sys
 from pathlib import Path
 import io
 from tokenize import detect_encoding
 
+_IMPORT_RE = re.compile(r'(from\s+decimal\s+import\s+)([^\n]+)')
+
 class DecimalPrecisionFixer:
     def __init__(self, file_path):
         self.file_path = Path(file_path)
-        self.original_code = self._read_file_with_proper_encoding()
-        self.modified_code = self.original_code
+        self.modified_code = self._read_file_with_proper_encoding()
         self.imports_modified = False
         
     def _read_file_with_proper_encoding(self):
-        """Read file with proper encoding detection"""
-        with open(self.file_path, 'rb') as f:
-            encoding, _ = detect_encoding(f.readline)
-        
-        with open(self.file_path, 'r', encoding=encoding) as f:
-            return f.read()
+        """Read file with proper encoding detection, reading the bytes once"""
+        data = self.file_path.read_bytes()
+        encoding, _ = detect_encoding(io.BytesIO(data).readline)
+        return data.decode(encoding)
 
     def _add_rounding_import(self):
         """Add ROUND_HALF_UP to decimal imports if not already present"""
@@ -35,16 +35,14 @@ class DecimalPrecisionFixer:
         
         # Check if import already exists
         if 'ROUND_HALF_UP' not in self.modified_code:
-            # Try to find decimal import line
-            pattern = r'(from\s+decimal\s+import\s+)([^\n]+)'
-            
             def add_round_half_up(match):
                 imports = match.group(2)
                 if 'ROUND_HALF_UP' not in imports:
                     return f"{match.group(1)}{imports}, ROUND_HALF_UP"
                 return match.group(0)
             
-            updated_code = re.sub(pattern, add_round_half_up, self.modified_code, count=1)
+            # Try to find decimal import line
+            updated_code = _IMPORT_RE.sub(add_round_half_up, self.modified_code, count=1)
             
             if updated_code != self.modified_code:
                 self.modified_code = updated_code
@@ -56,10 +54,20 @@ class DecimalPrecisionFixer:
             print("✅ ROUND_HALF_UP already imported")
 
     def _replace_normalize_decimal(self):
-        """Safely replace the normalize_decimal function using precise regex"""
+        """Safely replace the normalize_decimal function located via the AST"""
         print("Replacing normalize_decimal function...")
         
         # The new function implementation
+        quantizer_cache = '''_QUANTIZERS = {}
+
+def _get_quantizer(precision):
+    """Cached Decimal('1e-precision'), built once per precision"""
+    quantizer = _QUANTIZERS.get(precision)
+    if quantizer is None:
+        quantizer = _QUANTIZERS[precision] = Decimal(1).scaleb(-precision)
+    return quantizer
+
+'''
         new_function = '''def normalize_decimal(value, precision=8):
     """
     Enforce exact decimal precision using quantization
@@ -71,33 +79,44 @@ class DecimalPrecisionFixer:
     Returns:
         Decimal value with exactly 'precision' decimal places
     """
-    if not isinstance(value, Decimal):
-        # Convert all values to Decimal first (handling float precision issues)
-        try:
-            value = Decimal(str(value))
-        except:
-            raise TypeError(f"Cannot convert {value} to Decimal")
+    if isinstance(value, float):
+        # Same shortest digits as str(), minus numpy's scalar formatting for float64
+        value = Decimal(float.__repr__(value))
+    elif not isinstance(value, Decimal):
+        # Convert all values to Decimal first (handling float precision issues);
+        # unconvertible values raise decimal.InvalidOperation
+        value = Decimal(str(value))
+    elif value.as_tuple().exponent == -precision:
+        return value  # Already normalized
     
-    # Create a quantizer with the exact number of decimal places
-    quantizer = Decimal('1e-{}'.format(precision))
-    return value.quantize(quantizer, rounding=ROUND_HALF_UP)'''
+    return value.quantize(_get_quantizer(precision), rounding=ROUND_HALF_UP)'''
+        # The quantizer cache survives earlier runs; only emit it once
+        if '_QUANTIZERS = {}' not in self.modified_code:
+            new_function = quantizer_cache + new_function
         
-        # Find the existing function using multi-line regex
-        pattern = r'def\s+normalize_decimal\s*\([^)]*\):.*?(?=\n\s*def|\n\s*class|\Z)'
+        # Locate the existing function through the AST so its exact line span is known
+        try:
+            tree = ast.parse(self.modified_code)
+        except SyntaxError as e:
+            print(f"❌ Cannot parse {self.file_path}: {e}. Aborting.")
+            return False
         
-        match = re.search(pattern, self.modified_code, re.DOTALL)
-        if not match:
+        node = next((n for n in ast.walk(tree)
+                     if isinstance(n, ast.FunctionDef) and n.name == 'normalize_decimal'), None)
+        if node is None:
             print("❌ Could not find normalize_decimal function. Aborting.")
             return False
-            
-        print(f"Found normalize_decimal function at position {match.start()}-{match.end()}")
         
-        # Replace the function
-        old_function = match.group(0)
-        indent = re.match(r'^(\s*)', old_function).group(1)
-        indented_new_function = '\n'.join(indent + line if line else '' for line in new_function.split('\n'))
+        # Decorators belong to the function being replaced
+        start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+        print(f"Found normalize_decimal function at lines {start}-{node.end_lineno}")
+        
+        # Replace the function's lines
+        lines = self.modified_code.split('\n')
+        indent = ' ' * node.col_offset
+        new_lines = [indent + line if line else '' for line in new_function.split('\n')]
         
-        self.modified_code = self.modified_code.replace(old_function, indented_new_function)
+        self.modified_code = '\n'.join(lines[:start - 1] + new_lines + lines[node.end_lineno:])
         print("✅ Replaced normalize_decimal function")
         return True
 
@@ -139,13 +158,12 @@ class DecimalPrecisionFixer:
         return True
 
     def create_backup(self):
-        """Create a backup of the original file"""
+        """Create a byte-for-byte backup of the original file"""
         backup_path = self.file_path.with_suffix('.py.bak')
         print(f"Creating backup at {backup_path}")
         
         try:
-            with open(backup_path, 'w', encoding='utf-8') as f:
-                f.write(self.original_code)
+            shutil.copyfile(self.file_path, backup_path)
             print(f"✅ Backup created at {backup_path}")
             return True
         except Exception as e:
@@ -16,6 +16,7 @@ if (-not (Test-Path $sshKeyPath)) {
 
 # Files to upload
 $replacementFile = "direct_replace.py"
+$coreModule = "_decimal_fix_core.py"
 $verificationFile = "verify_decimal_fix.py"
 
 # Check if required files exist
@@ -35,7 +36,7 @@ Write-Host "=== Direct Replacement Deployment ===" -ForegroundColor Cyan
 Write-Host "`nStep 1: Uploading scripts to server..." -ForegroundColor Yellow
 try {
     Write-Host "Uploading $replacementFile..."
-    & scp -i $sshKeyPath $replacementFile "$username@$serverIp`:$remoteDir/"
+    & scp -i $sshKeyPath $replacementFile $coreModule "$username@$serverIp`:$remoteDir/"
     if ($LASTEXITCODE -ne 0) {
         throw "Failed to upload $replacementFile"
     }
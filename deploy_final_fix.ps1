@@ -7,6 +7,7 @@ $SSH_KEY = $env:SSH_KEY
 $REMOTE_DIR = "/root/CryptoScript"
 $BOT_FILE = "crypto_trading_bot.py"
 $FIX_SCRIPT = "final_decimal_fix.py"
+$CORE_MODULE = "_decimal_fix_core.py"
 $VERIFY_SCRIPT = "verify_fix.py"
 $CONDA_ENV = "trading"
 
@@ -36,7 +37,7 @@ if (-not $SSH_KEY) {
 
 # Step 1: Upload the scripts to the server
 Write-Host "Step 1: Uploading scripts to server..." -ForegroundColor Yellow
-$uploadResult1 = scp -i "$SSH_KEY" "$FIX_SCRIPT" "root@$SERVER`:$REMOTE_DIR/"
+$uploadResult1 = scp -i "$SSH_KEY" "$FIX_SCRIPT" "$CORE_MODULE" "root@$SERVER`:$REMOTE_DIR/"
 if ($LASTEXITCODE -ne 0) {
     Write-Host "❌ Failed to upload fix script" -ForegroundColor Red
     Write-Host $uploadResult1
@@ -1,27 +1,29 @@
-import re
+import ast
 import sys
 from pathlib import Path
 
+from _decimal_fix_core import patch_decimal_import
+
 def normalize_line_endings(text):
     return text.replace('\r\n', '\n').replace('\r', '\n')
 
 def modify_decimal_imports(content):
     """Add ROUND_HALF_UP to imports"""
-    if 'ROUND_HALF_UP' not in content:
-        return re.sub(
-            r'(from\s+decimal\s+import\s+)(Decimal)(\s*|,|$)',
-            r'\1Decimal, ROUND_HALF_UP',
-            content,
-            count=1
-        )
-    return content
+    try:
+        return patch_decimal_import(content)
+    except SyntaxError:
+        return content
 
 def replace_normalize_decimal(content):
-    """Precise function replacement using signature matching"""
-    old_pattern = re.compile(
-        r'def normalize_decimal\(.*?\).*?return value\.normalize\(\)',
-        re.DOTALL
-    )
+    """Precise function replacement using the function's AST line span"""
+    try:
+        tree = ast.parse(content)
+    except SyntaxError:
+        return content
+    node = next((n for n in ast.walk(tree)
+                 if isinstance(n, ast.FunctionDef) and n.name == 'normalize_decimal'), None)
+    if node is None:
+        return content
     
     new_function = '''\
 def normalize_decimal(value):
@@ -33,7 +35,11 @@ def normalize_decimal(value):
     result = value.quantize(Decimal('0.00000001'), rounding=ROUND_HALF_UP)
     return result'''
     
-    return old_pattern.sub(new_function, content, count=1)
+    start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+    lines = content.split('\n')
+    indent = ' ' * node.col_offset
+    new_lines = [indent + line if line else '' for line in new_function.split('\n')]
+    return '\n'.join(lines[:start - 1] + new_lines + lines[node.end_lineno:])
 
 def main(file_path):
     original = Path(file_path).read_text(encoding='utf-8')
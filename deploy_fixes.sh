@@ -24,7 +24,7 @@ fi
 
 # Upload fixed implementation files
 echo "Uploading fixed implementation files..."
-scp -i "$SSH_KEY" fixed_decimal.py fixed_position.py fixed_risk_manager.py apply_fixes.py test_fixed_precision.py "$SERVER:$REMOTE_DIR/"
+scp -i "$SSH_KEY" _njit.py fixed_decimal.py fixed_position.py fixed_risk_manager.py apply_fixes.py test_fixed_precision.py "$SERVER:$REMOTE_DIR/"
 
 if [ $? -ne 0 ]; then
     echo "Error: Failed to upload files to server"
@@ -7,20 +7,35 @@ This script directly applies the fixed decimal precision implementation
 to the crypto trading bot by replacing specific functions and classes.
 """
 
-import re
 import sys
 from decimal import Decimal, ROUND_HALF_UP
 
+from _decimal_fix_core import replace_definitions
+
 def read_file(path):
-    with open(path, 'r') as f:
+    with open(path, 'rb') as f:
         return f.read()
 
 def write_file(path, content):
-    with open(path, 'w') as f:
+    with open(path, 'wb') as f:
         f.write(content)
 
 # Define the fixed normalize_decimal function
 FIXED_NORMALIZE_DECIMAL_FUNCTION = '''
+from decimal import Context
+
+# Quantizing runs under its own context; the bot's prec-8 context would
+# reject any result with more than 8 digits
+_CTX = Context(prec=28)
+_QUANTIZERS = {}
+
+def _get_quantizer(precision):
+    """Cached Decimal('1e-precision'), built once per precision"""
+    quantizer = _QUANTIZERS.get(precision)
+    if quantizer is None:
+        quantizer = _QUANTIZERS[precision] = Decimal(1).scaleb(-precision)
+    return quantizer
+
 def normalize_decimal(value, precision=8):
     """
     Enforce exact decimal precision using quantization
@@ -32,22 +47,57 @@ def normalize_decimal(value, precision=8):
     Returns:
         Decimal value with exactly 'precision' decimal places
     """
-    if not isinstance(value, Decimal):
-        # Convert all values to Decimal first (handling float precision issues)
-        try:
-            value = Decimal(str(value))
-        except:
-            raise TypeError(f"Cannot convert {value} to Decimal")
+    if isinstance(value, int):
+        value = Decimal(value)
+    elif not isinstance(value, Decimal):
+        # Convert all values to Decimal first (handling float precision issues);
+        # unconvertible values raise decimal.InvalidOperation
+        value = Decimal(str(value))
+    elif value.as_tuple().exponent == -precision:
+        return value  # Already normalized
     
-    # Create a quantizer with the exact number of decimal places
-    quantizer = Decimal('1e-{}'.format(precision))
-    return value.quantize(quantizer, rounding=ROUND_HALF_UP)
+    return value.quantize(_get_quantizer(precision), rounding=ROUND_HALF_UP, context=_CTX)
+
+# Constants used by Position and RiskManager, written out at 8 places
+_D0 = Decimal('0E-8')
+_D1 = Decimal('1.00000000')
+_D2 = Decimal('2.00000000')
+_D095 = Decimal('0.95000000')
+_D101 = Decimal('1.01000000')
+_D10 = Decimal('10.00000000')
 '''
 
 # Define the fixed Position class
 FIXED_POSITION_CLASS = '''
+# Position amounts are held as integer counts of 1e-8 (satoshi-style units);
+# products of two unit counts carry _SCALE2, of three _SCALE2 * _SCALE
+_SCALE = 10 ** 8
+_SCALE2 = _SCALE * _SCALE
+
+def _round_div(numerator, denominator):
+    """numerator / denominator rounded half away from zero, as an int"""
+    quotient, remainder = divmod(abs(numerator), denominator)
+    if 2 * remainder >= denominator:
+        quotient += 1
+    return quotient if numerator >= 0 else -quotient
+
+def _to_units(value):
+    """value as a whole number of 1e-8 units; Decimals are converted exactly"""
+    if not isinstance(value, Decimal):
+        value = normalize_decimal(value)
+    numerator, denominator = value.as_integer_ratio()
+    return _round_div(numerator * _SCALE, denominator)
+
+def _from_units(units):
+    """Decimal with exactly 8 places; built from text, so no context rounding applies"""
+    return Decimal(f'{units}e-8')
+
 class Position:
     """Tracks a single position with precise calculations"""
+    __slots__ = ('pair', 'entry_price', 'usdt_size', '_fee_rate', '_entry_fee', '_quantity',
+                 '_entry_cost', 'atr', 'current_stop', 'stop_loss', 'take_profit',
+                 'trailing_stop', 'trailing_activation')
+
     def __init__(self, pair, entry_price, usdt_size, fee_rate):
         """Initialize a new position with proper decimal precision"""
         self.pair = pair
@@ -55,100 +105,122 @@ class Position:
         # Convert all inputs to normalized Decimals immediately
         self.entry_price = normalize_decimal(entry_price)
         self.usdt_size = normalize_decimal(usdt_size)
-        self.fee_rate = normalize_decimal(fee_rate)
         
-        # Calculate entry details with normalization at each step
-        self.entry_fee = normalize_decimal(self.usdt_size * self.fee_rate)
-        self.quantity = normalize_decimal((self.usdt_size - self.entry_fee) / self.entry_price)
-        self.entry_cost = self.usdt_size  # This is already normalized
+        # Fee, quantity and cost are kept in integer units, rounded once each
+        usdt_units = _to_units(self.usdt_size)
+        self._fee_rate = _to_units(fee_rate)
+        self._entry_fee = _round_div(usdt_units * self._fee_rate, _SCALE)
+        self._quantity = _round_div((usdt_units - self._entry_fee) * _SCALE,
+                                    _to_units(self.entry_price))
+        self._entry_cost = usdt_units
 
         # Initialize other attributes
-        self.atr = normalize_decimal(0)
+        self.atr = _D0
         self.current_stop = None
         self.stop_loss = None
         self.take_profit = None
         self.trailing_stop = None
         self.trailing_activation = None
 
+    @property
+    def fee_rate(self):
+        return _from_units(self._fee_rate)
+
+    @property
+    def entry_fee(self):
+        return _from_units(self._entry_fee)
+
+    @property
+    def quantity(self):
+        return _from_units(self._quantity)
+
+    @property
+    def entry_cost(self):
+        return _from_units(self._entry_cost)
+
     def is_valid(self):
         """Check if position meets minimum requirements"""
-        min_order_size = normalize_decimal(10.0)  # Minimum order size in USDT
+        min_order_size = _D10  # Minimum order size in USDT
         return self.usdt_size >= min_order_size
 
+    def _exit_amounts(self, quantity, price):
+        """Exact gross value (_SCALE2), exit fee and net value (_SCALE2 * _SCALE) of selling quantity units"""
+        gross_value = quantity * price
+        exit_fee = gross_value * self._fee_rate
+        return gross_value, exit_fee, gross_value * _SCALE - exit_fee
+
+    def _exit_values(self, current_price):
+        """Quantized exit values of the whole position and its PnL at current_price"""
+        gross_value, exit_fee, net_value = self._exit_amounts(self._quantity, _to_units(current_price))
+        return {
+            'gross_value': _from_units(_round_div(gross_value, _SCALE)),
+            'net_value': _from_units(_round_div(net_value, _SCALE2)),
+            'pnl': _from_units(_round_div(net_value - self._entry_cost * _SCALE2, _SCALE2)),
+            'exit_fee': _from_units(_round_div(exit_fee, _SCALE2)),
+            'total_fees': _from_units(_round_div(self._entry_fee * _SCALE2 + exit_fee, _SCALE2))
+        }
+
     def update_current_value(self, current_price):
         """Calculate current position value and unrealized PnL"""
-        # Normalize the current price
-        current_price = normalize_decimal(current_price)
-        
-        # Calculate with normalization at each step
-        gross_value = normalize_decimal(self.quantity * current_price)
-        exit_fee = normalize_decimal(gross_value * self.fee_rate)
-        net_value = normalize_decimal(gross_value - exit_fee)
-        unrealized_pnl = normalize_decimal(net_value - self.entry_cost)
-        total_fees = normalize_decimal(self.entry_fee + exit_fee)
+        values = self._exit_values(current_price)
+        values['unrealized_pnl'] = values.pop('pnl')
+        return values
 
+    @classmethod
+    def batch_update(cls, positions, prices):
+        """
+        Net value and unrealized PnL of many positions in one float64 pass.
+        
+        prices lines up with positions. Only the arithmetic runs in floats; the
+        results are quantized back to 8 places on return, as lists of Decimals.
+        They can be 1e-8 away from update_current_value.
+        """
+        n = len(positions)
+        quantity = np.fromiter((p._quantity for p in positions), dtype=np.float64, count=n) / _SCALE
+        fee_rate = np.fromiter((p._fee_rate for p in positions), dtype=np.float64, count=n) / _SCALE
+        entry_cost = np.fromiter((p._entry_cost for p in positions), dtype=np.float64, count=n) / _SCALE
+        gross_value = quantity * np.asarray(prices, dtype=np.float64)
+        net_value = gross_value - gross_value * fee_rate
         return {
-            'gross_value': gross_value,
-            'net_value': net_value,
-            'unrealized_pnl': unrealized_pnl,
-            'exit_fee': exit_fee,
-            'total_fees': total_fees
+            'net_value': [normalize_decimal(v) for v in net_value.tolist()],
+            'unrealized_pnl': [normalize_decimal(v) for v in (net_value - entry_cost).tolist()]
         }
 
     def close_position(self, exit_price):
         """Calculate final position value and realized PnL"""
-        # Normalize the exit price
-        exit_price = normalize_decimal(exit_price)
-        
-        # Calculate with normalization at each step
-        gross_value = normalize_decimal(self.quantity * exit_price)
-        exit_fee = normalize_decimal(gross_value * self.fee_rate)
-        net_value = normalize_decimal(gross_value - exit_fee)
-        realized_pnl = normalize_decimal(net_value - self.entry_cost)
-        total_fees = normalize_decimal(self.entry_fee + exit_fee)
-
-        return {
-            'gross_value': gross_value,
-            'net_value': net_value,
-            'realized_pnl': realized_pnl,
-            'exit_fee': exit_fee,
-            'total_fees': total_fees
-        }
+        values = self._exit_values(exit_price)
+        values['realized_pnl'] = values.pop('pnl')
+        return values
 
     def close_partial_position(self, exit_price, close_ratio):
         """Close a portion of the position"""
-        # Normalize inputs
-        exit_price = normalize_decimal(exit_price)
-        close_ratio = normalize_decimal(close_ratio)
+        close_ratio = _to_units(close_ratio)
         
         # Validate close ratio
-        zero = normalize_decimal(0)
-        one = normalize_decimal(1)
-        if not (zero < close_ratio <= one):
+        if not (0 < close_ratio <= _SCALE):
             raise ValueError("Close ratio must be between 0 and 1")
 
-        # Calculate with normalization at each step
-        close_quantity = normalize_decimal(self.quantity * close_ratio)
-        remaining_quantity = normalize_decimal(self.quantity - close_quantity)
-        gross_value = normalize_decimal(close_quantity * exit_price)
-        exit_fee = normalize_decimal(gross_value * self.fee_rate)
-        net_value = normalize_decimal(gross_value - exit_fee)
+        close_quantity = _round_div(self._quantity * close_ratio, _SCALE)
+        gross_value, exit_fee, net_value = self._exit_amounts(close_quantity, _to_units(exit_price))
         
         # Update position values
-        self.quantity = remaining_quantity
-        self.entry_cost = normalize_decimal(self.entry_cost * (one - close_ratio))
-        self.entry_fee = normalize_decimal(self.entry_fee * (one - close_ratio))
+        keep_ratio = _SCALE - close_ratio
+        self._quantity -= close_quantity
+        self._entry_cost = _round_div(self._entry_cost * keep_ratio, _SCALE)
+        self._entry_fee = _round_div(self._entry_fee * keep_ratio, _SCALE)
 
         return {
-            'gross_value': gross_value,
-            'net_value': net_value,
-            'exit_fee': exit_fee,
-            'remaining_quantity': remaining_quantity
+            'gross_value': _from_units(_round_div(gross_value, _SCALE)),
+            'net_value': _from_units(_round_div(net_value, _SCALE2)),
+            'exit_fee': _from_units(_round_div(exit_fee, _SCALE2)),
+            'remaining_quantity': self.quantity
         }
 '''
 
 # Define the fixed RiskManager class
 FIXED_RISK_MANAGER_CLASS = '''
+from risk_kernels import stop_levels, volatility_scale
+
 class RiskManager:
     """Manages risk for trading positions"""
     def __init__(self, account_balance, risk_per_trade=0.01, daily_loss_limit=0.05):
@@ -156,9 +228,9 @@ class RiskManager:
         self.account_balance = normalize_decimal(account_balance)
         self.risk_per_trade = normalize_decimal(risk_per_trade)
         self.daily_loss_limit = normalize_decimal(daily_loss_limit)
-        self.daily_loss = normalize_decimal(0)
+        self.daily_loss = _D0
         self.positions = []
-        self.volatility_adjustment = normalize_decimal(1.0)
+        self.volatility_adjustment = _D1
 
     def calculate_position_size(self, entry_price, stop_loss, fee_rate=0.001):
         """Calculate position size based on risk parameters and price levels"""
@@ -174,13 +246,13 @@ class RiskManager:
         price_diff_pct = normalize_decimal(abs((entry_price - stop_loss) / entry_price))
         
         # Account for fees in both directions
-        total_fee_impact = normalize_decimal(fee_rate * normalize_decimal(2))
+        total_fee_impact = normalize_decimal(fee_rate * _D2)
         
         # Calculate position size with fee consideration
         position_size = normalize_decimal(risk_amount / (price_diff_pct + total_fee_impact))
         
         # Ensure position size doesn't exceed account balance
-        max_position = normalize_decimal(self.account_balance * normalize_decimal(0.95))  # 95% of balance max
+        max_position = normalize_decimal(self.account_balance * _D095)  # 95% of balance max
         position_size = normalize_decimal(min(position_size, max_position))
         
         return position_size
@@ -191,31 +263,25 @@ class RiskManager:
         entry_price = normalize_decimal(entry_price)
         atr = normalize_decimal(atr)
         
-        # Different multipliers for stop loss and take profit
-        stop_multiplier = normalize_decimal(2.0)
-        tp_multiplier = normalize_decimal(3.0)
-        
-        if direction.lower() == 'long':
-            stop_loss = normalize_decimal(entry_price - (atr * stop_multiplier))
-            take_profit = normalize_decimal(entry_price + (atr * tp_multiplier))
-        else:  # short
-            stop_loss = normalize_decimal(entry_price + (atr * stop_multiplier))
-            take_profit = normalize_decimal(entry_price - (atr * tp_multiplier))
+        # 2x ATR stop loss, 3x ATR take profit; computed in float64, quantized once
+        stop_loss, take_profit = stop_levels(float(entry_price), float(atr),
+                                             direction.lower() == 'long', 2.0, 3.0)
         
         return {
-            'stop_loss': stop_loss,
-            'take_profit': take_profit,
+            'stop_loss': normalize_decimal(stop_loss),
+            'take_profit': normalize_decimal(take_profit),
             'atr': atr
         }
 
     def update_trailing_stop(self, position, current_price):
         """Update trailing stop if price moves favorably"""
-        current_price = normalize_decimal(current_price)
+        if not isinstance(current_price, Decimal):
+            current_price = normalize_decimal(current_price)
         
         # Initialize trailing stop if not set
         if position.trailing_stop is None:
             position.trailing_stop = position.stop_loss
-            position.trailing_activation = normalize_decimal(position.entry_price * normalize_decimal(1.01))  # 1% above entry
+            position.trailing_activation = normalize_decimal(position.entry_price * _D101)  # 1% above entry
             return position.trailing_stop
         
         # For long positions
@@ -223,7 +289,7 @@ class RiskManager:
             # Check if price has reached activation level
             if current_price >= position.trailing_activation:
                 # Calculate new trailing stop
-                new_stop = normalize_decimal(current_price - (position.atr * normalize_decimal(2.0)))
+                new_stop = normalize_decimal(current_price - (position.atr * _D2))
                 
                 # Only update if new stop is higher than current stop
                 if new_stop > position.trailing_stop:
@@ -232,7 +298,7 @@ class RiskManager:
         # For short positions (not implemented in this example)
         # else:
         #     if current_price <= position.trailing_activation:
-        #         new_stop = normalize_decimal(current_price + (position.atr * normalize_decimal(2.0)))
+        #         new_stop = normalize_decimal(current_price + (position.atr * _D2))
         #         if new_stop < position.trailing_stop:
         #             position.trailing_stop = new_stop
         
@@ -252,19 +318,14 @@ class RiskManager:
         baseline_volatility = normalize_decimal(baseline_volatility)
         
         # Calculate volatility ratio
-        zero = normalize_decimal(0)
-        if baseline_volatility > zero:
-            volatility_ratio = normalize_decimal(baseline_volatility / current_volatility)
-            
-            # Adjust position sizing (lower for higher volatility)
-            min_adjustment = normalize_decimal(0.5)  # Min 50% of normal size
-            max_adjustment = normalize_decimal(1.5)  # Max 150% of normal size
-            
-            self.volatility_adjustment = normalize_decimal(
-                min(max(volatility_ratio, min_adjustment), max_adjustment)
-            )
+        if baseline_volatility > _D0:
+            # Adjust position sizing (lower for higher volatility), between
+            # 50% and 150% of normal size
+            self.volatility_adjustment = normalize_decimal(volatility_scale(
+                float(current_volatility), float(baseline_volatility), 0.5, 1.5
+            ))
         else:
-            self.volatility_adjustment = normalize_decimal(1.0)
+            self.volatility_adjustment = _D1
         
         return self.volatility_adjustment
 '''
@@ -286,41 +347,22 @@ def main():
     except Exception as e:
         print(f"Warning: Failed to create backup: {e}")
     
-    # Replace the normalize_decimal function
+    # Replace the normalize_decimal function and the Position and RiskManager classes
+    # in a single parse of the original file
+    replacements = {
+        'normalize_decimal': FIXED_NORMALIZE_DECIMAL_FUNCTION,
+        'Position': FIXED_POSITION_CLASS,
+        'RiskManager': FIXED_RISK_MANAGER_CLASS,
+    }
     try:
-        # Find the normalize_decimal function in the original file
-        normalize_pattern = r'def\s+normalize_decimal\s*\([^)]*\):[^}]*?return\s+value\.normalize\(\)'
-        if re.search(normalize_pattern, original_content, re.DOTALL):
-            print("Replacing normalize_decimal function...")
-            original_content = re.sub(normalize_pattern, FIXED_NORMALIZE_DECIMAL_FUNCTION.strip(), original_content, flags=re.DOTALL)
-        else:
-            print("Warning: normalize_decimal function not found in original file")
-    except Exception as e:
-        print(f"Error replacing normalize_decimal function: {e}")
-    
-    # Replace the Position class
-    try:
-        # Find the Position class in the original file
-        position_pattern = r'class\s+Position:[^}]*?def\s+close_partial_position\s*\([^)]*\):[^}]*?\{[^}]*?\'remaining_quantity\'[^}]*?\}'
-        if re.search(position_pattern, original_content, re.DOTALL):
-            print("Replacing Position class...")
-            original_content = re.sub(position_pattern, FIXED_POSITION_CLASS.strip(), original_content, flags=re.DOTALL)
-        else:
-            print("Warning: Position class not found in original file")
-    except Exception as e:
-        print(f"Error replacing Position class: {e}")
-    
-    # Replace the RiskManager class
-    try:
-        # Find the RiskManager class in the original file
-        risk_manager_pattern = r'class\s+RiskManager:[^}]*?def\s+adjust_for_volatility\s*\([^)]*\):[^}]*?return\s+self\.volatility_adjustment'
-        if re.search(risk_manager_pattern, original_content, re.DOTALL):
-            print("Replacing RiskManager class...")
-            original_content = re.sub(risk_manager_pattern, FIXED_RISK_MANAGER_CLASS.strip(), original_content, flags=re.DOTALL)
-        else:
-            print("Warning: RiskManager class not found in original file")
-    except Exception as e:
-        print(f"Error replacing RiskManager class: {e}")
+        original_content, replaced = replace_definitions(original_content, replacements)
+        for name in replacements:
+            if name in replaced:
+                print(f"Replaced {name}")
+            else:
+                print(f"Warning: {name} not found in original file")
+    except SyntaxError as e:
+        print(f"Error parsing original file: {e}")
     
     # Write the updated content to a new file
     try:
@@ -2,70 +2,78 @@
 """
 Direct replacement script to update the crypto_trading_bot.py file
 """
-import re
+import ast
 import sys
 from decimal import Decimal, localcontext
 
+from _decimal_fix_core import bound_names, split_donor
+
+# The donor modules; their imports of each other are not carried into the bot
+DONOR_MODULES = {'fix_position', 'fix_risk_manager'}
+
 def update_file(filename):
     """Update the crypto_trading_bot.py file with fixed classes"""
     print(f"Reading {filename}...")
     with open(filename, 'r') as f:
-        content = f.read()
-    
-    # Read the fixed classes
-    with open('fix_position.py', 'r') as f:
-        position_content = f.read()
-    
-    with open('fix_risk_manager.py', 'r') as f:
-        risk_manager_content = f.read()
-    
-    # Extract the normalize_decimal function from fix_position.py
-    normalize_match = re.search(r'def normalize_decimal\(.*?\):.*?return value\.normalize\(\)', 
-                               position_content, re.DOTALL)
-    if normalize_match:
-        normalize_function = normalize_match.group(0)
-    else:
-        print("Error: Could not find normalize_decimal function in fix_position.py")
-        return
-    
-    # Extract the Position class from fix_position.py
-    position_match = re.search(r'class Position:.*?def close_partial_position\(.*?\):.*?return \{.*?\'remaining_quantity\': remaining_quantity.*?\}', 
-                              position_content, re.DOTALL)
-    if position_match:
-        position_class = position_match.group(0)
-    else:
-        print("Error: Could not find Position class in fix_position.py")
-        return
-    
-    # Extract the RiskManager class from fix_risk_manager.py
-    risk_manager_match = re.search(r'class RiskManager:.*?def evaluate_trade\(.*?\):.*?return \'hold\'', 
-                                  risk_manager_content, re.DOTALL)
-    if risk_manager_match:
-        risk_manager_class = risk_manager_match.group(0)
-    else:
-        print("Error: Could not find RiskManager class in fix_risk_manager.py")
-        return
+        tree = ast.parse(f.read(), filename)
     
-    # Replace the normalize_decimal function in the content
-    print("Replacing normalize_decimal function...")
-    content = re.sub(r'def normalize_decimal\(.*?\):.*?return value\.normalize\(\)', 
-                    normalize_function, content, flags=re.DOTALL)
+    # The fixed definitions to swap in and the donor file each comes from
+    wanted = {
+        'normalize_decimal': ('normalize_decimal function', 'fix_position.py'),
+        'Position': ('Position class', 'fix_position.py'),
+        'RiskManager': ('RiskManager class', 'fix_risk_manager.py'),
+    }
     
-    # Replace the Position class in the content
-    print("Replacing Position class...")
-    content = re.sub(r'class Position:.*?def close_partial_position\(.*?\):.*?return \{.*?\'remaining_quantity\': remaining_quantity.*?\}', 
-                    position_class, content, flags=re.DOTALL)
+    # Extract their exact source with one parse per donor file
+    # What the bot already binds at top level is not added again
+    existing = set().union(*(bound_names(node) for node in tree.body))
+    replacements = {}
+    support = []
+    for donor in dict.fromkeys(donor for _, donor in wanted.values()):
+        with open(donor, 'r') as f:
+            segments, donor_support = split_donor(
+                f.read(), [name for name, (_, d) in wanted.items() if d == donor], existing, DONOR_MODULES)
+        support += donor_support
+        for name, segment in segments.items():
+            replacements[name] = (wanted[name][0], segment)
+    for name, (label, donor) in wanted.items():
+        if name not in replacements:
+            print(f"Error: Could not find {label} in {donor}")
+            return
+    # Statements both donors share (the decimal import) go in once
+    support = list(dict.fromkeys(support))
     
-    # Replace the RiskManager class in the content
-    print("Replacing RiskManager class...")
-    content = re.sub(r'class RiskManager:.*?def evaluate_trade\(.*?\):.*?return \'hold\'', 
-                    risk_manager_class, content, flags=re.DOTALL)
+    # Locate the three definitions in one pass over the parsed file, keyed by
+    # the first line of each (decorators included)
+    spans = {}
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)) and node.name in replacements:
+            start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+            spans[start] = (node.end_lineno, node.name)
+    for name, (label, _) in replacements.items():
+        if name not in (span_name for _, span_name in spans.values()):
+            print(f"Warning: {label} not found in {filename}")
     
-    # Write the updated content to a new file
+    # Copy the file line by line into the new file, writing each replacement
+    # in place of the lines it spans; the donors' supporting statements go in
+    # above the first replacement
     new_filename = f"{filename}.new"
     print(f"Writing updated content to {new_filename}...")
-    with open(new_filename, 'w') as f:
-        f.write(content)
+    with open(filename, 'r') as src, open(new_filename, 'w') as dst:
+        skip_through = 0
+        for lineno, line in enumerate(src, 1):
+            if lineno <= skip_through:
+                continue
+            if lineno in spans:
+                skip_through, name = spans[lineno]
+                label, replacement = replacements[name]
+                print(f"Replacing {label}...")
+                if support:
+                    dst.write('\n'.join(support) + '\n\n')
+                    support = None
+                dst.write(replacement + '\n')
+                continue
+            dst.write(line)
     
     print(f"Update completed successfully! New file: {new_filename}")
     print(f"To apply the changes, run: mv {new_filename} {filename}")
@@ -1,35 +1,87 @@
-from decimal import Decimal, localcontext
+from decimal import Context, Decimal, ROUND_HALF_UP
+
+from risk_kernels import exit_amounts, partial_exit_amounts
+
+# High precision context for intermediate calculations; its methods compute
+# under prec 28 without copying and restoring the thread's context per call
+_CTX = Context(prec=28)
+
+# Quantizers for the usual precisions, built once
+_QUANTIZERS = {precision: Decimal(1).scaleb(-precision) for precision in range(19)}
+
+_ZERO = Decimal(0)
+_ONE = Decimal(1)
+_MIN_ORDER_SIZE = Decimal('10.0')  # Minimum order size in USDT
+
+def _as_dec(value):
+    """
+    value as a Decimal. Decimals pass through and str/int are parsed directly;
+    anything else (floats) still goes through str() so it keeps the digits it
+    prints with rather than its exact binary value.
+    """
+    kind = type(value)
+    if kind is Decimal:
+        return value
+    return Decimal(value if kind is str or kind is int else str(value))
 
 def normalize_decimal(value, force_precision=8):
     """Helper function to normalize decimal values with forced precision"""
-    if isinstance(value, (int, float, str)):
-        value = Decimal(str(value))
+    value = _as_dec(value)
     if force_precision is not None:
-        # Create a context with higher precision for intermediate calculations
-        with localcontext() as ctx:
-            ctx.prec = 28  # High precision for intermediate calculations
-            # Format string with exact number of decimal places
-            format_str = f'{{:.{force_precision}f}}'
-            # Convert through string to ensure exact decimal places
-            return Decimal(format_str.format(value))
+        quantizer = _QUANTIZERS.get(force_precision)
+        if quantizer is None:
+            quantizer = Decimal(1).scaleb(-force_precision)
+        # Quantized under _CTX so the thread's precision cannot cut the digits short
+        return value.quantize(quantizer, rounding=ROUND_HALF_UP, context=_CTX)
     return value.normalize()
 
+def _kernel_field(name):
+    """
+    A Decimal attribute stored in name, whose float64 copy in name + '_f' the
+    exit kernels read; setting it refreshes the copy and the position's row in
+    the RiskManager arrays, if any.
+    """
+    float_name = name + '_f'
+
+    def set_field(self, value):
+        setattr(self, name, value)
+        setattr(self, float_name, float(value))
+        if self._book is not None:
+            self._book._store_row(self)
+
+    return property(lambda self: getattr(self, name), set_field)
+
 class Position:
     """Tracks a single position with precise calculations"""
+    __slots__ = (
+        'pair',
+        '_entry_price_raw', '_usdt_size_raw', '_fee_rate_raw', '_entry_fee_raw', '_quantity_raw',
+        'entry_price', 'usdt_size', '_fee_rate', '_entry_fee', '_quantity', '_entry_cost',
+        'atr', 'current_stop', 'stop_loss', 'take_profit', 'trailing_stop', 'trailing_activation',
+        '_is_valid', '_book', '_book_row',
+        # float64 copies for the compiled kernels, kept by the _kernel_field setters
+        '_quantity_f', '_fee_rate_f', '_entry_cost_f', '_entry_fee_f',
+    )
+    fee_rate = _kernel_field('_fee_rate')
+    entry_fee = _kernel_field('_entry_fee')
+    quantity = _kernel_field('_quantity')
+    entry_cost = _kernel_field('_entry_cost')
+
     def __init__(self, pair, entry_price, usdt_size, fee_rate):
         """Initialize a new position with proper decimal precision"""
         self.pair = pair
+        self._book = None  # RiskManager tracking this position in its arrays, if any
+        self._book_row = None
         
         # Store original values for exact calculations
-        self._entry_price_raw = Decimal(str(entry_price))
-        self._usdt_size_raw = Decimal(str(usdt_size))
-        self._fee_rate_raw = Decimal(str(fee_rate))
+        self._entry_price_raw = _as_dec(entry_price)
+        self._usdt_size_raw = _as_dec(usdt_size)
+        self._fee_rate_raw = _as_dec(fee_rate)
         
         # Calculate entry details with exact precision
-        with localcontext() as ctx:
-            ctx.prec = 28  # High precision for intermediate calculations
-            self._entry_fee_raw = self._usdt_size_raw * self._fee_rate_raw
-            self._quantity_raw = (self._usdt_size_raw - self._entry_fee_raw) / self._entry_price_raw
+        self._entry_fee_raw = _CTX.multiply(self._usdt_size_raw, self._fee_rate_raw)
+        self._quantity_raw = _CTX.divide(_CTX.subtract(self._usdt_size_raw, self._entry_fee_raw),
+                                         self._entry_price_raw)
         
         # Store normalized values for display and consistency
         self.entry_price = self._entry_price_raw
@@ -38,90 +90,123 @@ class Position:
         self.entry_fee = self._entry_fee_raw
         self.quantity = self._quantity_raw
         self.entry_cost = self._usdt_size_raw
+        # usdt_size never changes after entry, so neither does the size check
+        self._is_valid = self.usdt_size >= _MIN_ORDER_SIZE
 
         # Initialize other attributes
-        self.atr = Decimal('0')
+        self.atr = _ZERO
         self.current_stop = None
         self.stop_loss = None
         self.take_profit = None
         self.trailing_stop = None
         self.trailing_activation = None
 
+    @classmethod
+    def from_floats(cls, pair, entry_price, usdt_size, fee_rate):
+        """
+        A simulation-only position held in float64, for backtest hot loops.
+        
+        It has no Decimal fields, so only the *_fast methods work on it; use
+        the regular constructor for anything that is ledgered or traded.
+        """
+        position = cls.__new__(cls)
+        position.pair = pair
+        usdt_size, fee_rate = float(usdt_size), float(fee_rate)
+        entry_fee = usdt_size * fee_rate
+        position._quantity_f = (usdt_size - entry_fee) / float(entry_price)
+        position._fee_rate_f = fee_rate
+        position._entry_cost_f = usdt_size
+        position._entry_fee_f = entry_fee
+        position._is_valid = usdt_size >= float(_MIN_ORDER_SIZE)
+        position._book = position._book_row = None
+        return position
+
+    def update_current_value_fast(self, current_price):
+        """
+        update_current_value in plain float64, for simulation.
+        
+        Returns (gross_value, net_value, unrealized_pnl, exit_fee, total_fees)
+        unquantized; the figures are not fit for ledgering.
+        """
+        gross_value = self._quantity_f * current_price
+        exit_fee = gross_value * self._fee_rate_f
+        net_value = gross_value - exit_fee
+        return gross_value, net_value, net_value - self._entry_cost_f, exit_fee, self._entry_fee_f + exit_fee
+
     def is_valid(self):
         """Check if position meets minimum requirements"""
-        min_order_size = Decimal('10.0')  # Minimum order size in USDT
-        return self.usdt_size >= min_order_size
+        return self._is_valid
 
     def update_current_value(self, current_price):
-        """Calculate current position value and unrealized PnL"""
-        # Store raw value for exact calculations
-        _current_price_raw = Decimal(str(current_price))
+        """
+        Calculate current position value and unrealized PnL.
         
-        # Calculate with exact precision
-        with localcontext() as ctx:
-            ctx.prec = 28  # High precision for intermediate calculations
-            _gross_value_raw = self.quantity * _current_price_raw
-            _exit_fee_raw = _gross_value_raw * self.fee_rate
-            _net_value_raw = _gross_value_raw - _exit_fee_raw
-            _unrealized_pnl_raw = _net_value_raw - self.entry_cost
-            _total_fees_raw = self.entry_fee + _exit_fee_raw
+        The amounts are computed in float64 and quantized to 8 places, so each
+        can be 1e-8 away from the exact Decimal result (see risk_kernels).
+        """
+        # Computed in float64 by the compiled kernel, quantized to Decimal once
+        gross_value, net_value, unrealized_pnl, exit_fee, total_fees = exit_amounts(
+            self._quantity_f, float(current_price), self._fee_rate_f,
+            self._entry_cost_f, self._entry_fee_f)
 
         return {
-            'gross_value': _gross_value_raw,
-            'net_value': _net_value_raw,
-            'unrealized_pnl': _unrealized_pnl_raw,
-            'exit_fee': _exit_fee_raw,
-            'total_fees': _total_fees_raw
+            'gross_value': normalize_decimal(gross_value),
+            'net_value': normalize_decimal(net_value),
+            'unrealized_pnl': normalize_decimal(unrealized_pnl),
+            'exit_fee': normalize_decimal(exit_fee),
+            'total_fees': normalize_decimal(total_fees)
         }
 
     def close_position(self, exit_price):
-        """Calculate final position value and realized PnL"""
-        # Store raw value for exact calculations
-        _exit_price_raw = Decimal(str(exit_price))
+        """
+        Calculate final position value and realized PnL.
         
-        # Calculate with exact precision
-        with localcontext() as ctx:
-            ctx.prec = 28  # High precision for intermediate calculations
-            _gross_value_raw = self.quantity * _exit_price_raw
-            _exit_fee_raw = _gross_value_raw * self.fee_rate
-            _net_value_raw = _gross_value_raw - _exit_fee_raw
-            _realized_pnl_raw = _net_value_raw - self.entry_cost
-            _total_fees_raw = self.entry_fee + _exit_fee_raw
+        Like update_current_value, the amounts are float64 results quantized
+        to 8 places, within 1e-8 of the exact Decimal result.
+        """
+        # Computed in float64 by the compiled kernel, quantized to Decimal once
+        gross_value, net_value, realized_pnl, exit_fee, total_fees = exit_amounts(
+            self._quantity_f, float(exit_price), self._fee_rate_f,
+            self._entry_cost_f, self._entry_fee_f)
 
         return {
-            'gross_value': _gross_value_raw,
-            'net_value': _net_value_raw,
-            'realized_pnl': _realized_pnl_raw,
-            'exit_fee': _exit_fee_raw,
-            'total_fees': _total_fees_raw
+            'gross_value': normalize_decimal(gross_value),
+            'net_value': normalize_decimal(net_value),
+            'realized_pnl': normalize_decimal(realized_pnl),
+            'exit_fee': normalize_decimal(exit_fee),
+            'total_fees': normalize_decimal(total_fees)
         }
 
     def close_partial_position(self, exit_price, close_ratio):
-        """Close a portion of the position"""
+        """
+        Close a portion of the position.
+        
+        The gross value, net value and exit fee are float64 results quantized
+        to 8 places, within 1e-8 of the exact Decimal result; the remaining
+        quantity, cost and fee stay exact.
+        """
         # Store raw values for exact calculations
-        _exit_price_raw = Decimal(str(exit_price))
-        _close_ratio_raw = Decimal(str(close_ratio))
+        _close_ratio_raw = _as_dec(close_ratio)
         
-        if not Decimal('0') < _close_ratio_raw <= Decimal('1'):
+        if not _ZERO < _close_ratio_raw <= _ONE:
             raise ValueError("Close ratio must be between 0 and 1")
 
-        # Calculate with exact precision
-        with localcontext() as ctx:
-            ctx.prec = 28  # High precision for intermediate calculations
-            _close_quantity_raw = self.quantity * _close_ratio_raw
-            _remaining_quantity_raw = self.quantity - _close_quantity_raw
-            _gross_value_raw = _close_quantity_raw * _exit_price_raw
-            _exit_fee_raw = _gross_value_raw * self.fee_rate
-            _net_value_raw = _gross_value_raw - _exit_fee_raw
+        # The amounts are computed in float64 by the compiled kernel
+        gross_value, net_value, exit_fee = partial_exit_amounts(
+            self._quantity_f, float(_close_ratio_raw), float(exit_price), self._fee_rate_f)
+        
+        # The remaining position stays exact in Decimal
+        _close_quantity_raw = _CTX.multiply(self.quantity, _close_ratio_raw)
+        _remaining_quantity_raw = _CTX.subtract(self.quantity, _close_quantity_raw)
         
         # Update values
         self.quantity = _remaining_quantity_raw
-        self.entry_cost = self.entry_cost * (Decimal('1') - _close_ratio_raw)
-        self.entry_fee = self.entry_fee * (Decimal('1') - _close_ratio_raw)
+        self.entry_cost = self.entry_cost * (_ONE - _close_ratio_raw)
+        self.entry_fee = self.entry_fee * (_ONE - _close_ratio_raw)
 
         return {
-            'gross_value': _gross_value_raw,
-            'net_value': _net_value_raw,
-            'exit_fee': _exit_fee_raw,
+            'gross_value': normalize_decimal(gross_value),
+            'net_value': normalize_decimal(net_value),
+            'exit_fee': normalize_decimal(exit_fee),
             'remaining_quantity': _remaining_quantity_raw
         } 
\ No newline at end of file
@@ -1,75 +1,157 @@
-from decimal import Decimal, localcontext
-
-def normalize_decimal(value, force_precision=8):
-    """Helper function to normalize decimal values with forced precision"""
-    if isinstance(value, (int, float, str)):
-        value = Decimal(str(value))
-    if force_precision is not None:
-        # Create a context with higher precision for intermediate calculations
-        with localcontext() as ctx:
-            ctx.prec = 28  # High precision for intermediate calculations
-            # Format string with exact number of decimal places
-            format_str = f'{{:.{force_precision}f}}'
-            # Convert through string to ensure exact decimal places
-            return Decimal(format_str.format(value))
-    return value.normalize()
+from decimal import Context, Decimal
+
+import numpy as np
+
+from final_position import _as_dec, normalize_decimal
+from risk_kernels import position_size, trailing_stops
+
+# High precision context for intermediate calculations; its methods compute
+# under prec 28 without copying and restoring the thread's context per call
+_CTX = Context(prec=28)
+
+# Starting row capacity of the RiskManager position arrays
+_INITIAL_CAPACITY = 16
+
+# Decimal constants, built once instead of parsed on every call. The string
+# forms set the exponent of the results they enter, so they are kept as is.
+_ZERO = Decimal(0)
+_TWO = Decimal(2)
+_NEUTRAL_ADJUSTMENT = Decimal('1.0')
+_MAX_POSITION_FRACTION = Decimal('0.95')  # 95% of balance max
+_STOP_MULTIPLIER = Decimal('2.0')
+_TP_MULTIPLIER = Decimal('3.0')
+_TRAIL_ATR_MULTIPLIER = Decimal('2.0')
+_TRAIL_ACTIVATION = Decimal('1.01')  # 1% above entry
+
+# Bounds of the volatility adjustment: 50% to 150% of normal size
+_VOL_LO = Decimal('0.5')
+_VOL_HI = Decimal('1.5')
 
 class RiskManager:
     """Manages risk for trading positions"""
-    def __init__(self, account_balance, risk_per_trade=0.01, daily_loss_limit=0.05):
+    def __init__(self, account_balance, risk_per_trade=0.01, daily_loss_limit=0.05, fee_rate=Decimal('0.001')):
         """Initialize risk manager with account balance and risk parameters"""
-        self.account_balance = Decimal(str(account_balance))
-        self.risk_per_trade = Decimal(str(risk_per_trade))
-        self.daily_loss_limit = Decimal(str(daily_loss_limit))
-        self.daily_loss = Decimal('0')
+        self.account_balance = account_balance
+        self.fee_rate = fee_rate
+        self.risk_per_trade = _as_dec(risk_per_trade)
+        self.daily_loss_limit = _as_dec(daily_loss_limit)
+        self.daily_loss = _ZERO
         self.positions = []
-        self.volatility_adjustment = Decimal('1.0')
-
-    def calculate_position_size(self, entry_price, stop_loss, fee_rate=Decimal('0.001')):
-        """Calculate position size based on risk parameters and price levels"""
-        # Ensure all inputs are Decimal
-        entry_price = Decimal(str(entry_price))
-        stop_loss = Decimal(str(stop_loss))
-        fee_rate = Decimal(str(fee_rate))
-        
-        # Calculate risk amount in USDT
-        risk_amount = self.account_balance * self.risk_per_trade * self.volatility_adjustment
-        
-        # Calculate price difference as a percentage
-        with localcontext() as ctx:
-            ctx.prec = 28  # High precision for intermediate calculations
-            price_diff_pct = abs((entry_price - stop_loss) / entry_price)
-            
-            # Account for fees in both directions
-            total_fee_impact = fee_rate * Decimal('2')
-            
-            # Calculate position size with fee consideration
-            position_size = risk_amount / (price_diff_pct + total_fee_impact)
-            
-            # Ensure position size doesn't exceed account balance
-            max_position = self.account_balance * Decimal('0.95')  # 95% of balance max
-            position_size = min(position_size, max_position)
+        self.volatility_adjustment = _NEUTRAL_ADJUSTMENT
+        
+        # Struct-of-arrays copy of the tracked positions' float64 fields; row i
+        # belongs to positions[i] and the arrays grow by doubling like a list
+        self._q = np.empty(_INITIAL_CAPACITY)
+        self._fee = np.empty(_INITIAL_CAPACITY)
+        self._ec = np.empty(_INITIAL_CAPACITY)
+        self._ef = np.empty(_INITIAL_CAPACITY)
+
+    @property
+    def account_balance(self):
+        return self._account_balance
+
+    @account_balance.setter
+    def account_balance(self, value):
+        """Set the balance and the 95% position cap derived from it"""
+        self._account_balance = _as_dec(value)
+        self._max_position = _CTX.multiply(self._account_balance, _MAX_POSITION_FRACTION)
+        self._account_balance_f = float(self._account_balance)
+        self._max_position_f = float(self._max_position)
+
+    @property
+    def fee_rate(self):
+        return self._fee_rate
+
+    @fee_rate.setter
+    def fee_rate(self, value):
+        """Set the exchange fee rate and its round-trip (entry plus exit) impact"""
+        self._fee_rate = _as_dec(value)
+        self._double_fee = _CTX.multiply(self._fee_rate, _TWO)
+        self._double_fee_f = float(self._double_fee)
+
+    def add_position(self, position):
+        """Track an open position so revalue_all includes it"""
+        row = len(self.positions)
+        if row == len(self._q):
+            self._q, self._fee, self._ec, self._ef = (
+                np.concatenate((a, np.empty_like(a))) for a in (self._q, self._fee, self._ec, self._ef))
+        self.positions.append(position)
+        position._book, position._book_row = self, row
+        self._store_row(position)
+
+    def remove_position(self, position):
+        """Stop tracking a position; the last row moves into its place"""
+        row, last = position._book_row, len(self.positions) - 1
+        moved = self.positions.pop()
+        if row != last:
+            self.positions[row] = moved
+            moved._book_row = row
+            for a in (self._q, self._fee, self._ec, self._ef):
+                a[row] = a[last]
+        position._book = position._book_row = None
+
+    def _store_row(self, position):
+        """Copy a tracked position's float64 fields into its row; called by the position on every change"""
+        row = position._book_row
+        self._q[row] = position._quantity_f
+        self._fee[row] = position._fee_rate_f
+        self._ec[row] = position._entry_cost_f
+        self._ef[row] = position._entry_fee_f
+
+    def revalue_all(self, prices):
+        """
+        Value every tracked position at once.
         
-        return position_size
+        prices lines up with positions. Returns float64 arrays of gross value,
+        net value, unrealized PnL, exit fee and total fees; the Position methods
+        remain the Decimal API for single positions.
+        """
+        n = len(self.positions)
+        gross_value = self._q[:n] * np.asarray(prices, dtype=np.float64)
+        exit_fee = gross_value * self._fee[:n]
+        net_value = gross_value - exit_fee
+        return {
+            'gross_value': gross_value,
+            'net_value': net_value,
+            'unrealized_pnl': net_value - self._ec[:n],
+            'exit_fee': exit_fee,
+            'total_fees': self._ef[:n] + exit_fee
+        }
+
+    def calculate_position_size(self, entry_price, stop_loss, fee_rate=None):
+        """
+        Calculate position size based on risk parameters and price levels.
+        
+        fee_rate defaults to the manager's own fee_rate, whose fee impact is
+        precomputed.
+        """
+        # Account for fees in both directions
+        if fee_rate is None:
+            total_fee_impact = self._double_fee_f
+        else:
+            total_fee_impact = float(_as_dec(fee_rate)) * 2.0
+        
+        # Risk amount over the stop distance plus fees, capped at 95% of the
+        # balance; computed in float64 by the compiled kernel, quantized once
+        return normalize_decimal(position_size(
+            self._account_balance_f, float(self.risk_per_trade), float(self.volatility_adjustment),
+            float(_as_dec(entry_price)), float(_as_dec(stop_loss)), total_fee_impact,
+            self._max_position_f))
 
     def calculate_stop_levels(self, entry_price, atr, direction='long'):
         """Calculate stop loss and take profit levels based on ATR"""
-        entry_price = Decimal(str(entry_price))
-        atr = Decimal(str(atr))
+        entry_price = _as_dec(entry_price)
+        atr = _as_dec(atr)
         
         # Different multipliers for stop loss and take profit
-        stop_multiplier = Decimal('2.0')
-        tp_multiplier = Decimal('3.0')
-        
-        with localcontext() as ctx:
-            ctx.prec = 28  # High precision for intermediate calculations
-            
-            if direction.lower() == 'long':
-                stop_loss = entry_price - (atr * stop_multiplier)
-                take_profit = entry_price + (atr * tp_multiplier)
-            else:  # short
-                stop_loss = entry_price + (atr * stop_multiplier)
-                take_profit = entry_price - (atr * tp_multiplier)
+        stop_distance = _CTX.multiply(atr, _STOP_MULTIPLIER)
+        tp_distance = _CTX.multiply(atr, _TP_MULTIPLIER)
+        if direction.lower() == 'long':
+            stop_loss = _CTX.subtract(entry_price, stop_distance)
+            take_profit = _CTX.add(entry_price, tp_distance)
+        else:  # short
+            stop_loss = _CTX.add(entry_price, stop_distance)
+            take_profit = _CTX.subtract(entry_price, tp_distance)
         
         return {
             'stop_loss': stop_loss,
@@ -79,62 +161,90 @@ class RiskManager:
 
     def update_trailing_stop(self, position, current_price):
         """Update trailing stop if price moves favorably"""
-        current_price = Decimal(str(current_price))
+        current_price = _as_dec(current_price)
         
         # Initialize trailing stop if not set
         if position.trailing_stop is None:
             position.trailing_stop = position.stop_loss
-            position.trailing_activation = position.entry_price * Decimal('1.01')  # 1% above entry
+            position.trailing_activation = position.entry_price * _TRAIL_ACTIVATION
             return position.trailing_stop
         
-        with localcontext() as ctx:
-            ctx.prec = 28  # High precision for intermediate calculations
-            
-            # For long positions
-            if current_price > position.entry_price:
-                # Check if price has reached activation level
-                if current_price >= position.trailing_activation:
-                    # Calculate new trailing stop
-                    new_stop = current_price - (position.atr * Decimal('2.0'))
-                    
-                    # Only update if new stop is higher than current stop
-                    if new_stop > position.trailing_stop:
-                        position.trailing_stop = new_stop
-            
-            # For short positions (not implemented in this example)
-            # else:
-            #     if current_price <= position.trailing_activation:
-            #         new_stop = current_price + (position.atr * Decimal('2.0'))
-            #         if new_stop < position.trailing_stop:
-            #             position.trailing_stop = new_stop
+        # For long positions
+        if current_price > position.entry_price:
+            # Check if price has reached activation level
+            if current_price >= position.trailing_activation:
+                # Calculate new trailing stop
+                new_stop = _CTX.subtract(current_price, _CTX.multiply(position.atr, _TRAIL_ATR_MULTIPLIER))
+                
+                # Only update if new stop is higher than current stop
+                if new_stop > position.trailing_stop:
+                    position.trailing_stop = new_stop
+        
+        # For short positions (not implemented in this example)
+        # else:
+        #     if current_price <= position.trailing_activation:
+        #         new_stop = current_price + (position.atr * Decimal('2.0'))
+        #         if new_stop < position.trailing_stop:
+        #             position.trailing_stop = new_stop
         
         return position.trailing_stop
 
-    def check_daily_loss_limit(self, new_loss=Decimal('0')):
+    def update_trailing_stops(self, prices):
+        """
+        update_trailing_stop for every tracked position at once.
+        
+        prices lines up with positions. Positions without a trailing stop yet
+        are initialized as update_trailing_stop does; the others move in one
+        compiled pass, and a stop that moves is stored quantized to 8 places.
+        Returns the trailing stops in position order.
+        """
+        trailing, trailing_prices = [], []
+        for position, price in zip(self.positions, prices):
+            if position.trailing_stop is None:
+                self.update_trailing_stop(position, price)
+            else:
+                trailing.append(position)
+                trailing_prices.append(price)
+        
+        if trailing:
+            n = len(trailing)
+            stops = np.fromiter((p.trailing_stop for p in trailing), np.float64, n)
+            moved = trailing_stops(
+                np.fromiter((p.entry_price for p in trailing), np.float64, n),
+                np.fromiter((p.atr for p in trailing), np.float64, n),
+                stops,
+                np.fromiter((p.trailing_activation for p in trailing), np.float64, n),
+                np.fromiter(trailing_prices, np.float64, n),
+                float(_TRAIL_ATR_MULTIPLIER)
+            )
+            for i in np.flatnonzero(moved):
+                trailing[i].trailing_stop = normalize_decimal(float(stops[i]))
+        
+        return [position.trailing_stop for position in self.positions]
+
+    def check_daily_loss_limit(self, new_loss=_ZERO):
         """Check if daily loss limit has been reached"""
-        self.daily_loss += Decimal(str(new_loss))
+        self.daily_loss += _as_dec(new_loss)
         max_loss = self.account_balance * self.daily_loss_limit
         
         return self.daily_loss >= max_loss
 
     def adjust_for_volatility(self, current_volatility, baseline_volatility):
         """Adjust position sizing based on current market volatility"""
-        current_volatility = Decimal(str(current_volatility))
-        baseline_volatility = Decimal(str(baseline_volatility))
+        current_volatility = _as_dec(current_volatility)
+        baseline_volatility = _as_dec(baseline_volatility)
         
-        with localcontext() as ctx:
-            ctx.prec = 28  # High precision for intermediate calculations
+        # Calculate volatility ratio
+        if baseline_volatility > _ZERO:
+            volatility_ratio = _CTX.divide(baseline_volatility, current_volatility)
             
-            # Calculate volatility ratio
-            if baseline_volatility > Decimal('0'):
-                volatility_ratio = baseline_volatility / current_volatility
-                
-                # Adjust position sizing (lower for higher volatility)
-                self.volatility_adjustment = min(
-                    max(volatility_ratio, Decimal('0.5')),  # Min 50% of normal size
-                    Decimal('1.5')  # Max 150% of normal size
-                )
-            else:
-                self.volatility_adjustment = Decimal('1.0')
+            # Adjust position sizing (lower for higher volatility)
+            if volatility_ratio < _VOL_LO:
+                volatility_ratio = _VOL_LO
+            elif volatility_ratio > _VOL_HI:
+                volatility_ratio = _VOL_HI
+            self.volatility_adjustment = volatility_ratio
+        else:
+            self.volatility_adjustment = _NEUTRAL_ADJUSTMENT
         
         return self.volatility_adjustment 
\ No newline at end of file
@@ -1,58 +1,67 @@
-import re
+import ast
+
+from _decimal_fix_core import bound_names, split_donor
 
 def read_file(file_path):
     with open(file_path, 'r') as file:
         return file.read()
 
-def write_file(file_path, content):
+def write_file(file_path, parts):
     with open(file_path, 'w') as file:
-        file.write(content)
+        file.writelines(parts)
 
-def replace_function_or_class(content, pattern, replacement):
-    """Replace a function or class in the content using regex pattern matching"""
-    return re.sub(pattern, replacement, content, flags=re.DOTALL)
+# The donor modules; their imports of each other are not carried into the bot
+DONOR_MODULES = {'final_position', 'final_risk_manager'}
 
-# Read the original trading bot file
+# Read the original trading bot file and parse it once
 original_content = read_file('crypto_trading_bot.py')
+tree = ast.parse(original_content)
+
+# Read the fixed implementations; what the bot already defines at top level is
+# not added again, so rerunning on an updated bot changes nothing
+existing = set().union(*(bound_names(node) for node in tree.body))
+position_definitions, position_support = split_donor(read_file('final_position.py'),
+                                                     {'normalize_decimal', 'Position'}, existing,
+                                                     DONOR_MODULES)
+risk_manager_definitions, risk_manager_support = split_donor(read_file('final_risk_manager.py'),
+                                                             {'RiskManager'}, existing,
+                                                             DONOR_MODULES)
+replacements = {**position_definitions, **risk_manager_definitions}
+# Statements both donors share (the Context, the decimal import) go in once
+support = list(dict.fromkeys(position_support + risk_manager_support))
+
+labels = {
+    'normalize_decimal': 'normalize_decimal function',
+    'Position': 'Position class',
+    'RiskManager': 'RiskManager class',
+}
+
+# Locate the definitions to replace in the original, decorators included
+spans = []
+for node in tree.body:
+    if isinstance(node, (ast.FunctionDef, ast.ClassDef)) and node.name in replacements:
+        start = min([node.lineno] + [d.lineno for d in node.decorator_list]) - 1
+        spans.append((start, node.end_lineno, node.name))
+spans.sort()
+for name in replacements:
+    if name not in (span_name for _, _, span_name in spans):
+        print(f"Warning: {labels[name]} not found in crypto_trading_bot.py")
 
-# Read the fixed implementations
-position_class = read_file('final_position.py')
-risk_manager_class = read_file('final_risk_manager.py')
-
-# Extract the normalize_decimal function from the Position class file
-normalize_decimal_pattern = r'def normalize_decimal\(.*?\):.*?return value\.normalize\(\)'
-normalize_decimal_match = re.search(normalize_decimal_pattern, position_class, re.DOTALL)
-normalize_decimal_function = normalize_decimal_match.group(0) if normalize_decimal_match else None
-
-# Extract the Position class from the file
-position_class_pattern = r'class Position:.*?def close_partial_position\(.*?\}$'
-position_class_match = re.search(position_class_pattern, position_class, re.DOTALL)
-position_class_code = position_class_match.group(0) if position_class_match else None
-
-# Extract the RiskManager class from the file
-risk_manager_class_pattern = r'class RiskManager:.*?return self\.volatility_adjustment$'
-risk_manager_class_match = re.search(risk_manager_class_pattern, risk_manager_class, re.DOTALL)
-risk_manager_class_code = risk_manager_class_match.group(0) if risk_manager_class_match else None
-
-# Replace the normalize_decimal function in the original content
-if normalize_decimal_function:
-    normalize_decimal_pattern_in_original = r'def normalize_decimal\(.*?\):.*?return value\.normalize\(\)'
-    original_content = replace_function_or_class(original_content, normalize_decimal_pattern_in_original, normalize_decimal_function)
-    print("Replaced normalize_decimal function")
-
-# Replace the Position class in the original content
-if position_class_code:
-    position_class_pattern_in_original = r'class Position:.*?def close_partial_position\(.*?\}$'
-    original_content = replace_function_or_class(original_content, position_class_pattern_in_original, position_class_code)
-    print("Replaced Position class")
-
-# Replace the RiskManager class in the original content
-if risk_manager_class_code:
-    risk_manager_class_pattern_in_original = r'class RiskManager:.*?return self\.volatility_adjustment$'
-    original_content = replace_function_or_class(original_content, risk_manager_class_pattern_in_original, risk_manager_class_code)
-    print("Replaced RiskManager class")
+# Build the new file from the untouched slices around the replaced spans; the
+# donors' supporting statements go in above the first replacement
+lines = original_content.splitlines(keepends=True)
+parts = []
+position = 0
+for i, (start, end, name) in enumerate(spans):
+    parts.append(''.join(lines[position:start]))
+    if i == 0 and support:
+        parts.append('\n'.join(support) + '\n\n')
+    parts.append(replacements[name] + '\n')
+    print(f"Replaced {labels[name]}")
+    position = end
+parts.append(''.join(lines[position:]))
 
 # Write the updated content to a new file
-write_file('crypto_trading_bot.py.new', original_content)
+write_file('crypto_trading_bot.py.new', parts)
 print("Update completed successfully. The updated file is saved as 'crypto_trading_bot.py.new'.")
-print("To apply the changes, rename 'crypto_trading_bot.py.new' to 'crypto_trading_bot.py'.") 
\ No newline at end of file
+print("To apply the changes, rename 'crypto_trading_bot.py.new' to 'crypto_trading_bot.py'.")
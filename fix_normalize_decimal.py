@@ -4,12 +4,15 @@ Fix for normalize_decimal function
 =================================
 
 This script only fixes the normalize_decimal function, which is the core of the decimal precision issue.
+The function and the decimal import are both located in a single parse of the bot.
 """
 
+import ast
 import sys
-import re
 from decimal import Decimal, ROUND_HALF_UP
 
+from _decimal_fix_core import apply_edit, import_edit
+
 def read_file(path):
     with open(path, 'r') as f:
         return f.read()
@@ -18,8 +21,11 @@ def write_file(path, content):
     with open(path, 'w') as f:
         f.write(content)
 
-# Define the fixed normalize_decimal function code
-FIXED_NORMALIZE_DECIMAL = '''def normalize_decimal(value, precision=8):
+# Define the fixed normalize_decimal function code, preceded by its quantizer
+# table: Decimal('1e-p') for precisions 0-18, built once when the bot loads
+FIXED_NORMALIZE_DECIMAL = '''_QTAB = tuple(Decimal(1).scaleb(-p) for p in range(19))
+
+def normalize_decimal(value, precision=8):
     """
     Enforce exact decimal precision using quantization
     
@@ -37,8 +43,11 @@ FIXED_NORMALIZE_DECIMAL = '''def normalize_decimal(value, precision=8):
         except:
             raise TypeError(f"Cannot convert {value} to Decimal")
     
-    # Create a quantizer with the exact number of decimal places
-    quantizer = Decimal('1e-{}'.format(precision))
+    # Quantizers for the usual precisions are built once, at import
+    if 0 <= precision < len(_QTAB):
+        quantizer = _QTAB[precision]
+    else:
+        quantizer = Decimal(1).scaleb(-precision)
     return value.quantize(quantizer, rounding=ROUND_HALF_UP)'''
 
 try:
@@ -49,30 +58,38 @@ try:
     write_file('crypto_trading_bot.py.bak', original_content)
     print("Created backup at crypto_trading_bot.py.bak")
     
-    # Find the normalize_decimal function
-    normalize_decimal_pattern = r'def\s+normalize_decimal\s*\([^)]*\):[^}]*?(?=\n\s*def|\n\s*class)'
-    normalize_decimal_match = re.search(normalize_decimal_pattern, original_content, re.DOTALL)
+    # Find the normalize_decimal function and the decimal import in one parse
+    tree = ast.parse(original_content)
+    node = next((n for n in tree.body
+                 if isinstance(n, ast.FunctionDef) and n.name == 'normalize_decimal'), None)
     
-    if not normalize_decimal_match:
+    if node is None:
         raise ValueError("Could not find normalize_decimal function")
     
-    print(f"Found normalize_decimal function")
+    print(f"Found normalize_decimal function at line {node.lineno}")
+    
+    lines = original_content.splitlines(keepends=True)
+    
+    # Replace the normalize_decimal function, decorators included; the
+    # quantizer table survives earlier runs, so only emit it once
+    fixed_function = FIXED_NORMALIZE_DECIMAL
+    if any(isinstance(n, ast.Assign) and any(isinstance(t, ast.Name) and t.id == '_QTAB' for t in n.targets)
+           for n in tree.body):
+        fixed_function = fixed_function.split('\n\n', 1)[1]
+    start = min([node.lineno] + [d.lineno for d in node.decorator_list]) - 1
+    end = node.end_lineno
     
     # Check if we need to add ROUND_HALF_UP to imports
-    if 'from decimal import Decimal' in original_content and 'ROUND_HALF_UP' not in original_content:
-        modified_content = original_content.replace(
-            'from decimal import Decimal', 
-            'from decimal import Decimal, ROUND_HALF_UP'
-        )
+    edit = import_edit(tree, lines)
+    if edit is not None:
+        apply_edit(lines, edit)
+        if edit[2] and edit[0] <= start:
+            start, end = start + 1, end + 1  # The inserted line moved the function down
         print("Updated decimal import to include ROUND_HALF_UP")
-    else:
-        modified_content = original_content
     
-    # Replace the normalize_decimal function
-    modified_content = modified_content.replace(
-        normalize_decimal_match.group(0),
-        FIXED_NORMALIZE_DECIMAL
-    )
+    newline = '\n' if lines[end - 1].endswith('\n') else ''
+    lines[start:end] = [fixed_function + newline]
+    modified_content = ''.join(lines)
     
     # Write the modified content to a new file
     write_file('crypto_trading_bot.py.fixed', modified_content)
@@ -7,6 +7,7 @@ $SSH_KEY = $env:SSH_KEY
 $REMOTE_DIR = "/root/CryptoScript"
 $BOT_FILE = "crypto_trading_bot.py"
 $FIX_SCRIPT = "direct_replace_normalize_decimal.py"
+$CORE_MODULE = "_decimal_fix_core.py"
 $CONDA_ENV = "trading"
 
 # Print header
@@ -28,7 +29,7 @@ if (-not $SSH_KEY) {
 }
 
 Write-Host "1. Uploading fix script to server..." -ForegroundColor Yellow
-$uploadResult = scp -i "$SSH_KEY" "$FIX_SCRIPT" "root@$SERVER`:$REMOTE_DIR/"
+$uploadResult = scp -i "$SSH_KEY" "$FIX_SCRIPT" "$CORE_MODULE" "root@$SERVER`:$REMOTE_DIR/"
 if ($LASTEXITCODE -ne 0) {
     Write-Host "❌ Failed to upload fix script" -ForegroundColor Red
     Write-Host $uploadResult
@@ -1,21 +1,38 @@
-from decimal import Decimal, localcontext
+from decimal import Context, Decimal, ROUND_HALF_UP, localcontext
+from functools import lru_cache
+
+# Quantizers for the common precisions, built once
+_QTAB = tuple(Decimal(1).scaleb(-p) for p in range(19))
+# Room for any price or size; the bot's own context keeps only 8 digits
+_CTX = Context(prec=28)
+
+@lru_cache(maxsize=4096, typed=True)
+def _normalize_cached(value, force_precision):
+    """normalize_decimal for a given precision; fees, multipliers and limits repeat"""
+    if isinstance(value, (int, float, str)):
+        value = Decimal(str(value))
+    if 0 <= force_precision < len(_QTAB):
+        quantizer = _QTAB[force_precision]
+    else:
+        quantizer = Decimal(1).scaleb(-force_precision)
+    return value.quantize(quantizer, rounding=ROUND_HALF_UP, context=_CTX)
 
 def normalize_decimal(value, force_precision=8):
     """Helper function to normalize decimal values with forced precision"""
+    if force_precision is not None:
+        if type(value) is Decimal and value.as_tuple().exponent == -force_precision:
+            return value  # Already normalized
+        return _normalize_cached(value, force_precision)
     if isinstance(value, (int, float, str)):
         value = Decimal(str(value))
-    if force_precision is not None:
-        # Create a context with higher precision for intermediate calculations
-        with localcontext() as ctx:
-            ctx.prec = 28  # High precision for intermediate calculations
-            # Format string with exact number of decimal places
-            format_str = f'{{:.{force_precision}f}}'
-            # Convert through string to ensure exact decimal places
-            return Decimal(format_str.format(value))
     return value.normalize()
 
 class Position:
     """Tracks a single position with precise calculations"""
+    _ZERO = Decimal('0.00000000')
+    _ONE = Decimal('1')
+    _MIN_ORDER_SIZE = Decimal('10.00000000')  # Minimum order size in USDT
+
     def __init__(self, pair, entry_price, usdt_size, fee_rate):
         """Initialize a new position with proper decimal precision"""
         self.pair = pair
@@ -42,7 +59,7 @@ class Position:
         self.entry_cost = normalize_decimal(self._usdt_size_raw)
 
         # Initialize other attributes
-        self.atr = normalize_decimal('0')
+        self.atr = self._ZERO
         self.current_stop = None
         self.stop_loss = None
         self.take_profit = None
@@ -51,8 +68,7 @@ class Position:
 
     def is_valid(self):
         """Check if position meets minimum requirements"""
-        min_order_size = normalize_decimal('10.0')  # Minimum order size in USDT
-        return self.usdt_size >= min_order_size
+        return self.usdt_size >= self._MIN_ORDER_SIZE
 
     def update_current_value(self, current_price):
         """Calculate current position value and unrealized PnL"""
@@ -128,7 +144,7 @@ class Position:
         close_ratio = normalize_decimal(close_ratio)
         exit_price = normalize_decimal(exit_price)
         
-        if not Decimal('0') < _close_ratio_raw <= Decimal('1'):
+        if not self._ZERO < _close_ratio_raw <= self._ONE:
             raise ValueError("Close ratio must be between 0 and 1")
 
         # Calculate with exact precision
@@ -142,8 +158,8 @@ class Position:
         
         # Update raw values
         self._quantity_raw = _remaining_quantity_raw
-        self._usdt_size_raw = self._usdt_size_raw * (Decimal('1') - _close_ratio_raw)
-        self._entry_fee_raw = self._entry_fee_raw * (Decimal('1') - _close_ratio_raw)
+        self._usdt_size_raw = self._usdt_size_raw * (self._ONE - _close_ratio_raw)
+        self._entry_fee_raw = self._entry_fee_raw * (self._ONE - _close_ratio_raw)
         
         # Update normalized values
         self.quantity = normalize_decimal(self._quantity_raw)
@@ -1,33 +1,27 @@
 from decimal import Decimal, localcontext
 
-def normalize_decimal(value, force_precision=8):
-    """Helper function to normalize decimal values with forced precision"""
-    if isinstance(value, (int, float, str)):
-        value = Decimal(str(value))
-    if force_precision is not None:
-        # Create a context with higher precision for intermediate calculations
-        with localcontext() as ctx:
-            ctx.prec = force_precision + 10  # Add extra precision for rounding
-            # Format string with exact number of decimal places
-            format_str = f'{{:.{force_precision}f}}'
-            # Convert through string to ensure exact decimal places
-            return Decimal(format_str.format(value))
-    return value.normalize()
+# Shared with Position; the format it rounds with ignores the context precision
+from fix_position import normalize_decimal
 
 class RiskManager:
+    _ZERO = Decimal('0.00000000')
+    _ONE = Decimal('1.0')
+    _VOLATILITY_STEP = Decimal('0.05')
+    _MIN_VOLATILITY_ADJUSTMENT = Decimal('0.20000000')  # Minimum 20% of standard size
+
     def __init__(self):
         """Initialize risk management parameters"""
-        self.max_position_size = normalize_decimal('0.1')  # 10% of balance per position
-        self.max_portfolio_allocation = normalize_decimal('0.5')  # 50% max total allocation
-        self.max_daily_loss = normalize_decimal('0.02')  # 2% max daily loss
+        self.max_position_size = Decimal('0.10000000')  # 10% of balance per position
+        self.max_portfolio_allocation = Decimal('0.50000000')  # 50% max total allocation
+        self.max_daily_loss = Decimal('0.02000000')  # 2% max daily loss
         self.max_trades = 10  # Maximum trades per day
-        self.atr_trail_mult = normalize_decimal('2.0')  # ATR multiplier for trailing stops
-        self.atr_sl_mult = normalize_decimal('1.5')  # ATR multiplier for stop loss
-        self.atr_tp_mult = normalize_decimal('3.0')  # ATR multiplier for take profit
-        self.min_trade_amount = normalize_decimal('10.0')  # Minimum trade size in USDT
+        self.atr_trail_mult = Decimal('2.00000000')  # ATR multiplier for trailing stops
+        self.atr_sl_mult = Decimal('1.50000000')  # ATR multiplier for stop loss
+        self.atr_tp_mult = Decimal('3.00000000')  # ATR multiplier for take profit
+        self.min_trade_amount = Decimal('10.00000000')  # Minimum trade size in USDT
 
         # Daily tracking
-        self.daily_pnl = normalize_decimal('0')
+        self.daily_pnl = self._ZERO
         self.daily_trades = 0
         self.last_reset = None  # Will be set to datetime.now().date() in first call
 
@@ -38,7 +32,7 @@ class RiskManager:
         # Reset daily counters if it's a new day
         current_date = datetime.now().date()
         if self.last_reset is None or current_date > self.last_reset:
-            self.daily_pnl = normalize_decimal('0')
+            self.daily_pnl = self._ZERO
             self.daily_trades = 0
             self.last_reset = current_date
 
@@ -53,7 +47,7 @@ class RiskManager:
                 return False
         else:
             # Using internal tracking (daily_pnl is actually balance in this case)
-            balance = normalize_decimal(daily_pnl) if daily_pnl is not None else normalize_decimal('0')
+            balance = normalize_decimal(daily_pnl) if daily_pnl is not None else self._ZERO
 
             # Check daily loss limit
             if self.daily_pnl < -balance * self.max_daily_loss:
@@ -98,8 +92,8 @@ class RiskManager:
             max_position = normalize_decimal(balance_dec * self.max_position_size)
             
             # Adjust position size based on volatility - higher volatility = smaller position
-            vol_adj = normalize_decimal(Decimal('1.0') - (volatility_dec * Decimal('0.05')))
-            vol_adj = max(vol_adj, normalize_decimal('0.2'))  # Minimum 20% of standard size
+            vol_adj = normalize_decimal(self._ONE - (volatility_dec * self._VOLATILITY_STEP))
+            vol_adj = max(vol_adj, self._MIN_VOLATILITY_ADJUSTMENT)
             
             # Calculate final position size with volatility adjustment
             position_size = normalize_decimal(max_position * vol_adj)
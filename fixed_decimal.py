@@ -1,5 +1,8 @@
 from decimal import Decimal, ROUND_HALF_UP
 
+# Decimal('1e-p') for precisions 0-18; scaleb builds them without parsing a string
+_QTAB = tuple(Decimal(1).scaleb(-p) for p in range(19))
+
 def normalize_decimal(value, precision=8):
     """
     Enforce exact decimal precision using quantization
@@ -18,6 +21,9 @@ def normalize_decimal(value, precision=8):
         except:
             raise TypeError(f"Cannot convert {value} to Decimal")
     
-    # Create a quantizer with the exact number of decimal places
-    quantizer = Decimal('1e-{}'.format(precision))
+    # Quantizers for the usual precisions are built once, at import
+    if 0 <= precision < len(_QTAB):
+        quantizer = _QTAB[precision]
+    else:
+        quantizer = Decimal(1).scaleb(-precision)
     return value.quantize(quantizer, rounding=ROUND_HALF_UP) 
\ No newline at end of file
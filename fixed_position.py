@@ -1,4 +1,16 @@
-from decimal import Decimal, ROUND_HALF_UP
+from decimal import Context, Decimal, ROUND_HALF_UP
+
+import numpy as np
+
+from _njit import NUMBA_AVAILABLE, njit, prange
+
+# Positions keep their amounts as integer counts of 1e-8, so every step below is
+# plain int arithmetic rounded the way normalize_decimal rounds
+SCALE = 10 ** 8
+
+# Conversions run under their own context, so the thread's precision cannot
+# cut the digits short
+_CTX = Context(prec=28)
 
 def normalize_decimal(value, precision=8):
     """
@@ -22,21 +34,114 @@ def normalize_decimal(value, precision=8):
     quantizer = Decimal('1e-{}'.format(precision))
     return value.quantize(quantizer, rounding=ROUND_HALF_UP)
 
+_QUANTIZE_1E8 = Decimal('1e-8')
+
+def to_fixed(value):
+    """value normalized to 8 decimal places, as an integer count of 1e-8"""
+    kind = type(value)
+    if kind is int:
+        return value * SCALE
+    if kind is not Decimal:
+        try:
+            value = Decimal(str(value))
+        except:
+            raise TypeError(f"Cannot convert {value} to Decimal")
+    return int(value.quantize(_QUANTIZE_1E8, rounding=ROUND_HALF_UP, context=_CTX).scaleb(8, _CTX))
+
+def from_fixed(value):
+    """The Decimal with 8 decimal places for an integer count of 1e-8"""
+    return Decimal(value).scaleb(-8, _CTX)
+
+def _div_half_up(numerator, denominator):
+    """numerator / denominator rounded to an int, ties away from zero (ROUND_HALF_UP)"""
+    quotient, remainder = divmod(abs(numerator), abs(denominator))
+    if 2 * remainder >= abs(denominator):
+        quotient += 1
+    return quotient if (numerator < 0) == (denominator < 0) else -quotient
+
+def _mul(a, b):
+    """Product of two fixed-point amounts, normalized back to 8 places"""
+    return _div_half_up(a * b, SCALE)
+
+def _fixed_field(name):
+    """
+    A Decimal attribute backed by the fixed-point int stored in name; setting
+    it also refreshes the position's PositionBook row, if any
+    """
+    def set_field(self, value):
+        setattr(self, name, to_fixed(value))
+        if self._book is not None:
+            self._book._store_row(self)
+
+    return property(lambda self: from_fixed(getattr(self, name)), set_field)
+
+def _mul_array(x, y):
+    """
+    _mul for non-negative int64 arrays, without overflowing the intermediate
+    product: both factors are split at SCALE, so every partial product fits
+    as long as the result does (below about 9.2e10 in real units). Only the
+    low-by-low term has a fraction, rounded half up.
+    """
+    x_high, x_low = np.divmod(x, SCALE)
+    y_high, y_low = np.divmod(y, SCALE)
+    return (x_high * y_high * SCALE + x_high * y_low + x_low * y_high
+            + (x_low * y_low + SCALE // 2) // SCALE)
+
+@njit(cache=True)
+def _mul_scalar(x, y):
+    """_mul_array for one pair of non-negative int64 amounts"""
+    x_high, x_low = x // SCALE, x % SCALE
+    y_high, y_low = y // SCALE, y % SCALE
+    return (x_high * y_high * SCALE + x_high * y_low + x_low * y_high
+            + (x_low * y_low + SCALE // 2) // SCALE)
+
+@njit(parallel=True, cache=True)
+def _value_rows(quantity, price, fee_rate, entry_cost, entry_fee, out):
+    """
+    Fill out[:, i] with the gross value, net value, PnL, exit fee and total
+    fees of row i, spreading the rows over all cores
+    """
+    for i in prange(quantity.shape[0]):
+        gross_value = _mul_scalar(quantity[i], price[i])
+        exit_fee = _mul_scalar(gross_value, fee_rate[i])
+        net_value = gross_value - exit_fee
+        out[0, i] = gross_value
+        out[1, i] = net_value
+        out[2, i] = net_value - entry_cost[i]
+        out[3, i] = exit_fee
+        out[4, i] = entry_fee[i] + exit_fee
+
+_MIN_ORDER_SIZE = 10 * SCALE  # Minimum order size in USDT
+
+# Starting row capacity of the PositionBook arrays
+_INITIAL_CAPACITY = 16
+
 class Position:
     """Tracks a single position with precise calculations"""
+    # Exposed as Decimals with 8 decimal places, built on access
+    entry_price = _fixed_field('_entry_price')
+    usdt_size = _fixed_field('_usdt_size')
+    fee_rate = _fixed_field('_fee_rate')
+    entry_fee = _fixed_field('_entry_fee')
+    quantity = _fixed_field('_quantity')
+    entry_cost = _fixed_field('_entry_cost')
+
     def __init__(self, pair, entry_price, usdt_size, fee_rate):
         """Initialize a new position with proper decimal precision"""
         self.pair = pair
         
-        # Convert all inputs to normalized Decimals immediately
-        self.entry_price = normalize_decimal(entry_price)
-        self.usdt_size = normalize_decimal(usdt_size)
-        self.fee_rate = normalize_decimal(fee_rate)
+        # Convert all inputs to normalized fixed-point amounts immediately
+        self._entry_price = to_fixed(entry_price)
+        self._usdt_size = to_fixed(usdt_size)
+        self._fee_rate = to_fixed(fee_rate)
         
         # Calculate entry details with normalization at each step
-        self.entry_fee = normalize_decimal(self.usdt_size * self.fee_rate)
-        self.quantity = normalize_decimal((self.usdt_size - self.entry_fee) / self.entry_price)
-        self.entry_cost = self.usdt_size  # This is already normalized
+        self._entry_fee = _mul(self._usdt_size, self._fee_rate)
+        self._quantity = _div_half_up((self._usdt_size - self._entry_fee) * SCALE, self._entry_price)
+        self._entry_cost = self._usdt_size  # This is already normalized
+
+        self._book = None  # PositionBook holding this position, if any
+        self._book_row = None
 
         # Initialize other attributes
         self.atr = normalize_decimal(0)
@@ -48,76 +153,151 @@ class Position:
 
     def is_valid(self):
         """Check if position meets minimum requirements"""
-        min_order_size = normalize_decimal(10.0)  # Minimum order size in USDT
-        return self.usdt_size >= min_order_size
+        return self._usdt_size >= _MIN_ORDER_SIZE
+
+    def _exit_values(self, price):
+        """Gross value, exit fee, net value and PnL of selling everything at a fixed-point price"""
+        gross_value = _mul(self._quantity, price)
+        exit_fee = _mul(gross_value, self._fee_rate)
+        net_value = gross_value - exit_fee
+        return gross_value, exit_fee, net_value, net_value - self._entry_cost
 
     def update_current_value(self, current_price):
         """Calculate current position value and unrealized PnL"""
-        # Normalize the current price
-        current_price = normalize_decimal(current_price)
-        
-        # Calculate with normalization at each step
-        gross_value = normalize_decimal(self.quantity * current_price)
-        exit_fee = normalize_decimal(gross_value * self.fee_rate)
-        net_value = normalize_decimal(gross_value - exit_fee)
-        unrealized_pnl = normalize_decimal(net_value - self.entry_cost)
-        total_fees = normalize_decimal(self.entry_fee + exit_fee)
+        gross_value, exit_fee, net_value, unrealized_pnl = self._exit_values(to_fixed(current_price))
 
         return {
-            'gross_value': gross_value,
-            'net_value': net_value,
-            'unrealized_pnl': unrealized_pnl,
-            'exit_fee': exit_fee,
-            'total_fees': total_fees
+            'gross_value': from_fixed(gross_value),
+            'net_value': from_fixed(net_value),
+            'unrealized_pnl': from_fixed(unrealized_pnl),
+            'exit_fee': from_fixed(exit_fee),
+            'total_fees': from_fixed(self._entry_fee + exit_fee)
         }
 
     def close_position(self, exit_price):
         """Calculate final position value and realized PnL"""
-        # Normalize the exit price
-        exit_price = normalize_decimal(exit_price)
-        
-        # Calculate with normalization at each step
-        gross_value = normalize_decimal(self.quantity * exit_price)
-        exit_fee = normalize_decimal(gross_value * self.fee_rate)
-        net_value = normalize_decimal(gross_value - exit_fee)
-        realized_pnl = normalize_decimal(net_value - self.entry_cost)
-        total_fees = normalize_decimal(self.entry_fee + exit_fee)
+        gross_value, exit_fee, net_value, realized_pnl = self._exit_values(to_fixed(exit_price))
 
         return {
-            'gross_value': gross_value,
-            'net_value': net_value,
-            'realized_pnl': realized_pnl,
-            'exit_fee': exit_fee,
-            'total_fees': total_fees
+            'gross_value': from_fixed(gross_value),
+            'net_value': from_fixed(net_value),
+            'realized_pnl': from_fixed(realized_pnl),
+            'exit_fee': from_fixed(exit_fee),
+            'total_fees': from_fixed(self._entry_fee + exit_fee)
         }
 
     def close_partial_position(self, exit_price, close_ratio):
         """Close a portion of the position"""
         # Normalize inputs
-        exit_price = normalize_decimal(exit_price)
-        close_ratio = normalize_decimal(close_ratio)
+        exit_price = to_fixed(exit_price)
+        close_ratio = to_fixed(close_ratio)
         
         # Validate close ratio
-        zero = normalize_decimal(0)
-        one = normalize_decimal(1)
-        if not (zero < close_ratio <= one):
+        if not (0 < close_ratio <= SCALE):
             raise ValueError("Close ratio must be between 0 and 1")
 
         # Calculate with normalization at each step
-        close_quantity = normalize_decimal(self.quantity * close_ratio)
-        remaining_quantity = normalize_decimal(self.quantity - close_quantity)
-        gross_value = normalize_decimal(close_quantity * exit_price)
-        exit_fee = normalize_decimal(gross_value * self.fee_rate)
-        net_value = normalize_decimal(gross_value - exit_fee)
+        close_quantity = _mul(self._quantity, close_ratio)
+        remaining_quantity = self._quantity - close_quantity
+        gross_value = _mul(close_quantity, exit_price)
+        exit_fee = _mul(gross_value, self._fee_rate)
+        net_value = gross_value - exit_fee
         
         # Update position values
-        self.quantity = remaining_quantity
-        self.entry_cost = normalize_decimal(self.entry_cost * (one - close_ratio))
-        self.entry_fee = normalize_decimal(self.entry_fee * (one - close_ratio))
+        self._quantity = remaining_quantity
+        self._entry_cost = _mul(self._entry_cost, SCALE - close_ratio)
+        self._entry_fee = _mul(self._entry_fee, SCALE - close_ratio)
+        if self._book is not None:
+            self._book._store_row(self)
+
+        return {
+            'gross_value': from_fixed(gross_value),
+            'net_value': from_fixed(net_value),
+            'exit_fee': from_fixed(exit_fee),
+            'remaining_quantity': from_fixed(remaining_quantity)
+        }
+
+class PositionBook:
+    """
+    Struct-of-arrays copy of many positions' fixed-point amounts, to value
+    them all on a price tick with a few vectorized int64 operations.
+    """
+    def __init__(self, capacity=_INITIAL_CAPACITY):
+        self.positions = []
+        # Row i belongs to positions[i]; the arrays grow by doubling like a list
+        self._quantity = np.empty(capacity, dtype=np.int64)
+        self._fee_rate = np.empty(capacity, dtype=np.int64)
+        self._entry_cost = np.empty(capacity, dtype=np.int64)
+        self._entry_fee = np.empty(capacity, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def add(self, position):
+        """Track a position; partial closes keep its row up to date"""
+        row = len(self.positions)
+        if row == len(self._quantity):
+            self._quantity, self._fee_rate, self._entry_cost, self._entry_fee = (
+                np.concatenate((a, np.empty_like(a)))
+                for a in (self._quantity, self._fee_rate, self._entry_cost, self._entry_fee))
+        self.positions.append(position)
+        position._book, position._book_row = self, row
+        self._store_row(position)
 
+    def remove(self, position):
+        """Stop tracking a position; the last row moves into its place"""
+        row, last = position._book_row, len(self.positions) - 1
+        moved = self.positions.pop()
+        if row != last:
+            self.positions[row] = moved
+            moved._book_row = row
+            for a in (self._quantity, self._fee_rate, self._entry_cost, self._entry_fee):
+                a[row] = a[last]
+        position._book = position._book_row = None
+
+    def _store_row(self, position):
+        """Copy a tracked position's amounts into its row"""
+        row = position._book_row
+        self._quantity[row] = position._quantity
+        self._fee_rate[row] = position._fee_rate
+        self._entry_cost[row] = position._entry_cost
+        self._entry_fee[row] = position._entry_fee
+
+    def value_all(self, prices):
+        """
+        update_current_value for every tracked position at once.
+        
+        prices lines up with positions: an int64 array of fixed-point prices,
+        or any sequence of values to_fixed accepts. Returns int64 arrays of
+        fixed-point amounts under the update_current_value keys; from_fixed
+        turns an element back into a Decimal. Values must stay below about
+        4.6e10 in real units; larger ones raise OverflowError.
+        
+        With numba the rows are valued in parallel by _value_rows, otherwise
+        with numpy array operations.
+        """
+        n = len(self.positions)
+        if not (isinstance(prices, np.ndarray) and prices.dtype == np.int64):
+            prices = np.fromiter((to_fixed(price) for price in prices), np.int64, n)
+        # int64 wraps silently; refuse values that cannot fit rather than
+        # return wrong amounts
+        if n and (self._quantity[:n] / SCALE * prices).max() >= 2.0 ** 62:
+            raise OverflowError("Position value too large for int64 fixed-point")
+        if NUMBA_AVAILABLE:
+            out = np.empty((5, n), dtype=np.int64)
+            _value_rows(self._quantity[:n], prices, self._fee_rate[:n],
+                        self._entry_cost[:n], self._entry_fee[:n], out)
+            gross_value, net_value, unrealized_pnl, exit_fee, total_fees = out
+        else:
+            gross_value = _mul_array(self._quantity[:n], prices)
+            exit_fee = _mul_array(gross_value, self._fee_rate[:n])
+            net_value = gross_value - exit_fee
+            unrealized_pnl = net_value - self._entry_cost[:n]
+            total_fees = self._entry_fee[:n] + exit_fee
         return {
             'gross_value': gross_value,
             'net_value': net_value,
+            'unrealized_pnl': unrealized_pnl,
             'exit_fee': exit_fee,
-            'remaining_quantity': remaining_quantity
-        } 
\ No newline at end of file
+            'total_fees': total_fees
+        }
@@ -0,0 +1,190 @@
+import unittest
+import numpy as np
+from backtest_kernels import (
+    _backtest_core, _batch_backtest, _simulate_pair, backtest_core,
+    allocate_trades, rolling_poc, trade_capacity, TRADE_COLUMNS,
+    STAT_FINAL_BALANCE, STAT_NUM_TRADES, EXIT_TAKE_PROFIT, EXIT_END_OF_DATA, EXIT_STOP_LOSS,
+    ACCT_BALANCE, ACCT_MAX_BALANCE, ACCT_POS_OPEN, ACCT_POS_SIZE, NUM_ACCT,
+)
+
+PARAMS = dict(start=0, initial_balance=1000.0, fee_rate=0.001, position_frac=0.1,
+              min_trade=10.0, sl_mult=1.5, tp_mult=3.0, trail_mult=2.0,
+              max_daily_loss=0.02, max_daily_trades=10)
+
+
+def run_core(close, atr, entry, exit_, day=None, kernel=_backtest_core, **overrides):
+    if day is None:
+        day = np.zeros(len(close), dtype=np.int64)
+    params = dict(PARAMS, **overrides)
+    trades = allocate_trades(trade_capacity(len(close)))
+    stats = kernel(close, atr, entry, exit_, day, len(close), *params.values(),
+                   *(trades[name] for name in TRADE_COLUMNS))
+    n = int(stats[STAT_NUM_TRADES])
+    return stats, {name: column[:n] for name, column in trades.items()}
+
+
+class TestBacktestCore(unittest.TestCase):
+    def test_take_profit_trade(self):
+        """A single entry that rallies through take profit closes once with a win"""
+        close = np.array([100.0, 101.0, 104.0, 104.0])
+        atr = np.full(4, 1.0)
+        entry = np.array([1, 0, 0, 0], dtype=np.uint8)
+        exit_ = np.zeros(4, dtype=np.uint8)
+
+        stats, trades = run_core(close, atr, entry, exit_)
+
+        size = 100.0
+        quantity = (size - size * 0.001) / 100.0
+        net_value = quantity * 104.0 * (1 - 0.001)
+        self.assertEqual(stats[STAT_NUM_TRADES], 1)
+        self.assertAlmostEqual(stats[STAT_FINAL_BALANCE], 1000.0 - size + net_value)
+        self.assertEqual(trades['entry_idx'][0], 0)
+        self.assertEqual(trades['exit_idx'][0], 2)
+        self.assertEqual(trades['reason'][0], EXIT_TAKE_PROFIT)
+        self.assertAlmostEqual(trades['pnl'][0], net_value - size)
+        self.assertAlmostEqual(trades['fees'][0], size * 0.001 + quantity * 104.0 * 0.001)
+
+    def test_open_position_closed_at_end(self):
+        """A position still open on the last bar is recorded as an end-of-data exit"""
+        close = np.array([100.0, 100.5, 100.2])
+        atr = np.full(3, 1.0)
+        entry = np.array([1, 0, 0], dtype=np.uint8)
+        exit_ = np.zeros(3, dtype=np.uint8)
+
+        stats, trades = run_core(close, atr, entry, exit_)
+
+        self.assertEqual(stats[STAT_NUM_TRADES], 1)
+        self.assertEqual(trades['exit_idx'][0], 2)
+        self.assertEqual(trades['reason'][0], EXIT_END_OF_DATA)
+
+    def test_daily_trade_limit_resets_on_new_day(self):
+        """Entries stop once the daily trade cap is hit and resume on the next day"""
+        close = np.full(8, 100.0)
+        atr = np.full(8, 1.0)
+        entry = np.array([1, 0, 1, 0, 1, 0, 1, 0], dtype=np.uint8)
+        exit_ = np.array([0, 1, 0, 1, 0, 1, 0, 1], dtype=np.uint8)
+        day = np.array([0, 0, 0, 0, 1, 1, 1, 1], dtype=np.int64)
+
+        stats, trades = run_core(close, atr, entry, exit_, day, max_daily_trades=1)
+
+        self.assertEqual(stats[STAT_NUM_TRADES], 2)
+        np.testing.assert_array_equal(trades['entry_idx'], [0, 4])
+
+    def test_no_signals_keeps_balance(self):
+        close = np.linspace(100.0, 110.0, 10)
+        atr = np.ones(10)
+        flags = np.zeros(10, dtype=np.uint8)
+        stats, _ = run_core(close, atr, flags, flags)
+        self.assertEqual(stats[STAT_NUM_TRADES], 0)
+        self.assertEqual(stats[STAT_FINAL_BALANCE], 1000.0)
+
+    def test_exported_kernel_matches_jit(self):
+        """backtest_core (the AOT build when present) agrees with the JIT kernel"""
+        rng = np.random.default_rng(11)
+        n = 200
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+        atr = np.full(n, 0.5)
+        entry = (rng.random(n) < 0.2).astype(np.uint8)
+        exit_ = (rng.random(n) < 0.2).astype(np.uint8)
+        day = np.arange(n, dtype=np.int64) // 96
+
+        stats, trades = run_core(close, atr, entry, exit_, day, kernel=backtest_core)
+        expected_stats, expected_trades = run_core(close, atr, entry, exit_, day)
+
+        np.testing.assert_allclose(stats, expected_stats)
+        for name in TRADE_COLUMNS:
+            np.testing.assert_allclose(trades[name], expected_trades[name])
+
+    def test_batch_matches_single_coin_runs(self):
+        """Padded batch rows reproduce the single-coin results"""
+        rng = np.random.default_rng(7)
+        lengths = [50, 80]
+        coins = []
+        for n in lengths:
+            close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+            atr = np.full(n, 0.5)
+            entry = (rng.random(n) < 0.2).astype(np.uint8)
+            exit_ = (rng.random(n) < 0.2).astype(np.uint8)
+            coins.append((close, atr, entry, exit_))
+
+        width = max(lengths)
+        close_m = np.full((2, width), np.nan)
+        atr_m = np.full((2, width), np.nan)
+        entry_m = np.zeros((2, width), dtype=np.uint8)
+        exit_m = np.zeros((2, width), dtype=np.uint8)
+        day_m = np.zeros((2, width), dtype=np.int64)
+        for k, (close, atr, entry, exit_) in enumerate(coins):
+            n = lengths[k]
+            close_m[k, :n], atr_m[k, :n], entry_m[k, :n], exit_m[k, :n] = close, atr, entry, exit_
+
+        trades_m = allocate_trades(trade_capacity(width), 2)
+        batch = _batch_backtest(close_m, atr_m, entry_m, exit_m, day_m,
+                                np.array(lengths, dtype=np.int64), *PARAMS.values(),
+                                *(trades_m[name] for name in TRADE_COLUMNS))
+        for k, arrays in enumerate(coins):
+            stats, trades = run_core(*arrays)
+            np.testing.assert_allclose(batch[k], stats)
+            n = int(stats[STAT_NUM_TRADES])
+            for name in TRADE_COLUMNS:
+                np.testing.assert_allclose(trades_m[name][k, :n], trades[name])
+
+
+PAIR_PARAMS = dict(fee_rate=0.001, position_frac=0.1, min_trade=10.0, max_daily_loss=0.02,
+                   sl_mult=1.5, tp_mult=3.0, trail_mult=2.0)
+
+
+def run_pair(close, atr, sig, balance=1000.0):
+    account = np.zeros(NUM_ACCT)
+    account[ACCT_BALANCE] = balance
+    account[ACCT_MAX_BALANCE] = balance
+    trades = allocate_trades(trade_capacity(len(close)))
+    n = _simulate_pair(close, atr, np.asarray(sig, dtype=np.int8), account,
+                       *PAIR_PARAMS.values(), *(trades[name] for name in TRADE_COLUMNS))
+    return account, {name: column[:n] for name, column in trades.items()}
+
+
+class TestSimulatePair(unittest.TestCase):
+    def test_stop_loss_exit(self):
+        """Volatility-scaled entry size, then a stop-loss exit on the next signal bar"""
+        close = np.array([100.0, 99.0, 99.5])
+        atr = np.full(3, 0.1)
+        account, trades = run_pair(close, atr, [1, 0, -1])
+
+        size = 1000.0 * 0.1 * 0.5  # vol_adj = 1 - 0.1 * 5
+        quantity = size * (1 - 0.001) / 100.0
+        net_value = quantity * 99.5 * (1 - 0.001)
+        self.assertEqual(len(trades['pnl']), 1)
+        self.assertEqual(trades['reason'][0], EXIT_STOP_LOSS)
+        self.assertEqual(trades['exit_idx'][0], 2)
+        self.assertAlmostEqual(trades['size'][0], size)
+        self.assertAlmostEqual(trades['pnl'][0], net_value - size)
+        self.assertAlmostEqual(account[ACCT_BALANCE], 1000.0 - size + net_value)
+        self.assertEqual(account[ACCT_POS_OPEN], 0.0)
+
+    def test_no_signal_bars_do_not_exit(self):
+        """Like execute_trade, stops are only evaluated on bars with a signal"""
+        close = np.array([100.0, 90.0, 90.0])
+        atr = np.full(3, 0.1)
+        account, trades = run_pair(close, atr, [1, 0, 0])
+
+        self.assertEqual(len(trades['pnl']), 0)
+        self.assertEqual(account[ACCT_POS_OPEN], 1.0)
+        self.assertAlmostEqual(account[ACCT_POS_SIZE], 50.0)
+        self.assertAlmostEqual(account[ACCT_BALANCE], 950.0)
+
+
+class TestRollingPoc(unittest.TestCase):
+    def test_heaviest_bucket_of_each_window(self):
+        codes = np.array([2, 0, 2, 1, 1, 0], dtype=np.int64)
+        volume = np.array([5.0, 3.0, 1.0, 4.0, 2.0, 9.0])
+        # Over windows of 3 bars the heaviest bucket moves from 2 to 1 to 0
+        np.testing.assert_array_equal(rolling_poc(codes, volume, 3, 3), [2, 2, 2, 1, 1, 0])
+
+    def test_ties_go_to_the_lowest_bucket(self):
+        codes = np.array([1, 0], dtype=np.int64)
+        volume = np.array([2.0, 2.0])
+        np.testing.assert_array_equal(rolling_poc(codes, volume, 2, 2), [1, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
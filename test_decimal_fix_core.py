@@ -0,0 +1,155 @@
+import os
+import stat
+import tempfile
+import unittest
+from decimal import localcontext
+import numpy as np
+from _decimal_fix_core import patch_decimal_import, patch_file, replace_definitions, split_donor, write_atomic
+
+
+class TestPatchDecimalImport(unittest.TestCase):
+    def test_appends_to_existing_from_import(self):
+        src = "from decimal import Decimal, getcontext\nx = 1\n"
+        self.assertEqual(patch_decimal_import(src),
+                         "from decimal import Decimal, getcontext, ROUND_HALF_UP\nx = 1\n")
+
+    def test_appends_inside_parentheses(self):
+        src = "from decimal import (Decimal,\n    getcontext)\n"
+        self.assertEqual(patch_decimal_import(src),
+                         "from decimal import (Decimal,\n    getcontext, ROUND_HALF_UP)\n")
+
+    def test_existing_import_is_left_alone(self):
+        src = "from decimal import Decimal, ROUND_HALF_UP\n"
+        self.assertEqual(patch_decimal_import(src), src)
+
+    def test_name_in_comment_does_not_count(self):
+        src = "from decimal import Decimal  # ROUND_HALF_UP\n"
+        self.assertEqual(patch_decimal_import(src),
+                         "from decimal import Decimal, ROUND_HALF_UP  # ROUND_HALF_UP\n")
+
+    def test_module_import_gets_from_import(self):
+        src = "import os\nimport decimal\nx = 1\n"
+        self.assertEqual(patch_decimal_import(src),
+                         "import os\nimport decimal\nfrom decimal import ROUND_HALF_UP\nx = 1\n")
+
+    def test_new_import_after_last_import(self):
+        src = '"""doc"""\nimport os\n\nx = 1\n'
+        self.assertEqual(patch_decimal_import(src),
+                         '"""doc"""\nimport os\nfrom decimal import Decimal, ROUND_HALF_UP\n\nx = 1\n')
+
+
+class TestPatchFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'bot.py')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _patch(self, src):
+        with open(self.path, 'w') as f:
+            f.write(src)
+        ok = patch_file(self.path)
+        with open(self.path) as f:
+            return ok, f.read()
+
+    def _normalize(self, src, value):
+        namespace = {}
+        exec(src, namespace)
+        # Importing the bot elsewhere in the suite lowers the global precision
+        with localcontext() as ctx:
+            ctx.prec = 28
+            return str(namespace['normalize_decimal'](value))
+
+    def test_replaces_function_and_patches_import(self):
+        ok, src = self._patch("from decimal import Decimal\n\n"
+                              "def normalize_decimal(value):\n    return Decimal(value)\n\nx = 1\n")
+        self.assertTrue(ok)
+        self.assertIn("from decimal import Decimal, ROUND_HALF_UP\n", src)
+        self.assertTrue(src.endswith("\n\nx = 1\n"))
+        self.assertEqual(self._normalize(src, '0.123456785'), '0.12345679')
+
+    def test_inserted_import_keeps_splice_in_place(self):
+        ok, src = self._patch("import os\n\ndef normalize_decimal(value):\n    return value\n\nx = 1\n")
+        self.assertTrue(ok)
+        self.assertTrue(src.startswith("import os\nfrom decimal import Decimal, ROUND_HALF_UP\n\n"
+                                       "_QUANTIZE_1E8 = Decimal('1e-8')\n\n\n"
+                                       "def normalize_decimal(value, force_precision=8):\n"))
+        self.assertTrue(src.endswith("\n\nx = 1\n"))
+
+    def test_rerun_defines_quantizer_once(self):
+        ok, src = self._patch("from decimal import Decimal\n\ndef normalize_decimal(value):\n    return value\n")
+        self.assertTrue(ok)
+        self.assertTrue(patch_file(self.path))
+        with open(self.path) as f:
+            self.assertEqual(f.read(), src)
+        self.assertEqual(self._normalize(src, '2.5'), '2.50000000')
+
+    def test_converts_any_non_decimal(self):
+        ok, src = self._patch("from decimal import Decimal\n\ndef normalize_decimal(value):\n    return value\n")
+        self.assertTrue(ok)
+        self.assertEqual(self._normalize(src, np.int64(7)), '7.00000000')
+        self.assertEqual(self._normalize(src, np.float64(0.1)), '0.10000000')
+
+    def test_broken_function_falls_back_to_indentation(self):
+        ok, src = self._patch("from decimal import Decimal\n\n"
+                              "def normalize_decimal(value):\n    return Decimal(value\n\nx = 1\n")
+        self.assertTrue(ok)
+        self.assertEqual(self._normalize(src, 1), '1.00000000')
+
+    def test_missing_function_leaves_file_unchanged(self):
+        ok, src = self._patch("x = 1\n")
+        self.assertFalse(ok)
+        self.assertEqual(src, "x = 1\n")
+
+
+class TestReplaceDefinitions(unittest.TestCase):
+    def test_replaces_decorated_definitions_and_keeps_the_rest(self):
+        src = ("# caf\u00e9\n"
+               "@decorator\n"
+               "def f():\n"
+               "    return 1\n"
+               "\n"
+               "class C:\n"
+               "    pass\n").encode('utf-8')
+        out, replaced = replace_definitions(src, {'f': "\ndef f():\n    return 2\n", 'g': "def g(): pass"})
+        self.assertEqual(replaced, ['f'])
+        self.assertEqual(out, "# caf\u00e9\ndef f():\n    return 2\n\nclass C:\n    pass\n".encode('utf-8'))
+
+
+class TestSplitDonor(unittest.TestCase):
+    SOURCE = ("from decimal import Decimal\n"
+              "from donor_b import helper\n"
+              "_ONE = Decimal(1)\n"
+              "def _scale(x):\n"
+              "    return x * _ONE\n"
+              "class Position:\n"
+              "    pass\n")
+
+    def test_definitions_and_support(self):
+        definitions, support = split_donor(self.SOURCE, {'Position'}, donor_modules={'donor_b'})
+        self.assertEqual(definitions, {'Position': "class Position:\n    pass"})
+        self.assertEqual(support, ["from decimal import Decimal", "_ONE = Decimal(1)",
+                                   "\ndef _scale(x):\n    return x * _ONE\n"])
+
+    def test_existing_names_are_left_out(self):
+        _, support = split_donor(self.SOURCE, {'Position'}, {'Decimal', '_ONE', '_scale'}, {'donor_b'})
+        self.assertEqual(support, [])
+
+
+class TestWriteAtomic(unittest.TestCase):
+    def test_replaces_content_and_keeps_mode(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'bot.py')
+            with open(path, 'wb') as f:
+                f.write(b'old\n')
+            os.chmod(path, 0o644)
+            write_atomic(path, b'new\n')
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), b'new\n')
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o644)
+            self.assertEqual(os.listdir(tmp_dir), ['bot.py'])
+
+
+if __name__ == '__main__':
+    unittest.main()
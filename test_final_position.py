@@ -0,0 +1,95 @@
+import random
+import unittest
+from decimal import Context, Decimal, ROUND_HALF_UP
+from final_position import Position
+from final_risk_manager import RiskManager
+
+# The exit amounts come from float64 kernels; quantized, they may be one unit
+# in the 8th place away from exact Decimal arithmetic
+TOLERANCE = Decimal('1e-8')
+_CTX = Context(prec=28)
+
+
+def _quantize(value):
+    return value.quantize(TOLERANCE, rounding=ROUND_HALF_UP, context=_CTX)
+
+
+def _exact_exit(quantity, price, fee_rate, entry_cost, entry_fee):
+    """Gross value, net value, PnL, exit fee and total fees in exact Decimal arithmetic"""
+    gross_value = _CTX.multiply(quantity, price)
+    exit_fee = _CTX.multiply(gross_value, fee_rate)
+    net_value = _CTX.subtract(gross_value, exit_fee)
+    return gross_value, net_value, _CTX.subtract(net_value, entry_cost), exit_fee, _CTX.add(entry_fee, exit_fee)
+
+
+class TestExitValuesAgainstExactDecimal(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(11)
+
+    def _random_position(self, usdt_size):
+        entry_price = Decimal(str(round(self.rng.uniform(0.5, 60000), 2)))
+        exit_price = _quantize(_CTX.multiply(entry_price, Decimal(str(round(self.rng.uniform(0.9, 1.1), 4)))))
+        return Position('BTC/USDT', entry_price, usdt_size, Decimal('0.001')), exit_price
+
+    def assertWithinTolerance(self, result, exact):
+        self.assertEqual(result.as_tuple().exponent, -8)
+        self.assertLessEqual(abs(result - _quantize(exact)), TOLERANCE)
+
+    def test_update_current_value_and_close_position(self):
+        for usdt_size in (Decimal('100'), Decimal('100000'), Decimal('10000000')):
+            for _ in range(300):
+                position, price = self._random_position(usdt_size)
+                exact = _exact_exit(position.quantity, price, position.fee_rate,
+                                    position.entry_cost, position.entry_fee)
+                current = position.update_current_value(price)
+                closed = position.close_position(price)
+                for i, key in enumerate(('gross_value', 'net_value', None, 'exit_fee', 'total_fees')):
+                    if key is not None:
+                        self.assertWithinTolerance(current[key], exact[i])
+                        self.assertWithinTolerance(closed[key], exact[i])
+                self.assertWithinTolerance(current['unrealized_pnl'], exact[2])
+                self.assertWithinTolerance(closed['realized_pnl'], exact[2])
+
+    def test_close_partial_position(self):
+        for _ in range(300):
+            position, price = self._random_position(Decimal('100000'))
+            ratio = Decimal(str(round(self.rng.uniform(0.1, 1), 2)))
+            close_quantity = _CTX.multiply(position.quantity, ratio)
+            gross_value, net_value, _, exit_fee, _ = _exact_exit(close_quantity, price, position.fee_rate,
+                                                                 position.entry_cost, position.entry_fee)
+            remaining_quantity = _CTX.subtract(position.quantity, close_quantity)
+            result = position.close_partial_position(price, ratio)
+            self.assertWithinTolerance(result['gross_value'], gross_value)
+            self.assertWithinTolerance(result['net_value'], net_value)
+            self.assertWithinTolerance(result['exit_fee'], exit_fee)
+            # The remaining quantity is not rounded through float64
+            self.assertEqual(result['remaining_quantity'], remaining_quantity)
+            self.assertEqual(position.quantity, remaining_quantity)
+
+
+class TestFieldAssignment(unittest.TestCase):
+    def setUp(self):
+        self.position = Position('BTC/USDT', Decimal('100'), Decimal('1000'), Decimal('0.001'))
+        self.risk_manager = RiskManager(Decimal('10000'))
+        self.risk_manager.add_position(self.position)
+
+    def test_assigned_quantity_is_revalued(self):
+        self.position.quantity = self.position.quantity / 2
+        self.assertEqual(self.position.update_current_value(110)['gross_value'], Decimal('549.45000000'))
+        self.assertAlmostEqual(self.risk_manager.revalue_all([110])['gross_value'][0], 549.45)
+
+    def test_assigned_fee_and_cost_are_revalued(self):
+        self.position.fee_rate = Decimal('0.002')
+        self.position.entry_cost = Decimal('900')
+        self.position.entry_fee = Decimal('2')
+        result = self.position.update_current_value(110)
+        self.assertEqual(result['exit_fee'], Decimal('2.19780000'))
+        self.assertEqual(result['unrealized_pnl'], Decimal('196.70220000'))
+        self.assertEqual(result['total_fees'], Decimal('4.19780000'))
+        book = self.risk_manager.revalue_all([110])
+        for key in ('exit_fee', 'unrealized_pnl', 'total_fees'):
+            self.assertAlmostEqual(book[key][0], float(result[key]))
+
+
+if __name__ == '__main__':
+    unittest.main()
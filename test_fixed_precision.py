@@ -9,7 +9,7 @@ they correctly maintain 8 decimal places of precision.
 
 import unittest
 from decimal import Decimal
-from fixed_position import Position, normalize_decimal
+from fixed_position import Position, PositionBook, from_fixed, normalize_decimal
 from fixed_risk_manager import RiskManager
 
 class TestNormalizeDecimal(unittest.TestCase):
@@ -82,6 +82,44 @@ class TestPosition(unittest.TestCase):
         self.assertEqual(result['net_value'], net_value)
 
 
+class TestPositionBook(unittest.TestCase):
+    def setUp(self):
+        """Set up a book of positions"""
+        self.positions = [
+            Position("BTC/USDT", Decimal("40000"), Decimal("1000"), Decimal("0.001")),
+            Position("ETH/USDT", Decimal("2500.5"), Decimal("333.33"), Decimal("0.00075")),
+            Position("DOGE/USDT", Decimal("0.0712345"), Decimal("50"), Decimal("0.001")),
+        ]
+        self.book = PositionBook(capacity=2)
+        for position in self.positions:
+            self.book.add(position)
+    
+    def assert_matches_positions(self, prices):
+        values = self.book.value_all(prices)
+        for row, (position, price) in enumerate(zip(self.book.positions, prices)):
+            for key, value in position.update_current_value(price).items():
+                self.assertEqual(from_fixed(int(values[key][row])), value,
+                                 f"{key} of {position.pair} should match update_current_value")
+    
+    def test_value_all_matches_update_current_value(self):
+        """Test that batch valuation gives the same amounts as each position"""
+        self.assert_matches_positions([Decimal("44000"), "2400.123", 0.0698765])
+    
+    def test_rows_follow_partial_close_and_removal(self):
+        """Test that the arrays track partial closes and removals"""
+        self.positions[1].close_partial_position(Decimal("2600"), Decimal("0.5"))
+        self.book.remove(self.positions[0])
+        self.assertEqual(len(self.book), 2)
+        self.assert_matches_positions([Decimal("0.08"), Decimal("2450")])
+    
+    def test_rows_follow_assigned_fields(self):
+        """Test that the arrays track fields assigned on a tracked position"""
+        self.positions[0].quantity = 1
+        self.positions[1].fee_rate = Decimal("0.002")
+        self.positions[2].entry_cost = Decimal("40")
+        self.assert_matches_positions([Decimal("44000"), "2400.123", 0.0698765])
+
+
 class TestRiskManager(unittest.TestCase):
     def setUp(self):
         """Set up risk manager"""
@@ -0,0 +1,72 @@
+import unittest
+import ccxt
+import numpy as np
+from crypto_trading_bot import MarketDataHandler
+
+
+class FakeExchange:
+    """Records requests and serves fixed prices and candles"""
+    def __init__(self, prices, error=None, candles=None):
+        self.prices = prices
+        self.error = error
+        self.candles = candles or []
+        self.requests = []
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        self.requests.append((symbol, timeframe, since))
+        return [c for c in self.candles if c[0] >= since]
+
+    def fetch_tickers(self, symbols):
+        self.requests.append(list(symbols))
+        if self.error:
+            raise self.error
+        return {s: {'symbol': s, 'last': self.prices[s]} for s in symbols if s in self.prices}
+
+
+class TestGetCurrentPrices(unittest.TestCase):
+    def setUp(self):
+        self.handler = MarketDataHandler()
+        self.handler.exchange = FakeExchange({'ETH/USDT': 2000.0, 'SOL/USDT': 150.0})
+
+    def test_single_request_for_all_symbols(self):
+        prices = self.handler.get_current_prices(['ETH/USDT', 'SOL/USDT'])
+        self.assertEqual(prices, {'ETH/USDT': 2000.0, 'SOL/USDT': 150.0})
+        self.assertEqual(self.handler.exchange.requests, [['ETH/USDT', 'SOL/USDT']])
+
+    def test_fresh_cache_skips_request(self):
+        self.handler.get_current_prices(['ETH/USDT'])
+        prices = self.handler.get_current_prices(['ETH/USDT', 'SOL/USDT'])
+        self.assertEqual(prices['ETH/USDT'], 2000.0)
+        self.assertEqual(self.handler.exchange.requests, [['ETH/USDT'], ['SOL/USDT']])
+
+    def test_unknown_symbol_is_omitted(self):
+        prices = self.handler.get_current_prices(['ETH/USDT', 'XYZ/USDT'])
+        self.assertEqual(prices, {'ETH/USDT': 2000.0})
+
+    def test_network_error_falls_back_to_cache(self):
+        self.handler.price_cache['ETH/USDT'] = (1990.0, 0.0)
+        self.handler.exchange.error = ccxt.NetworkError('down')
+        prices = self.handler.get_current_prices(['ETH/USDT', 'SOL/USDT'])
+        self.assertEqual(prices, {'ETH/USDT': 1990.0})
+
+
+class TestFetchSince(unittest.TestCase):
+    def test_returns_candles_from_timestamp(self):
+        candles = [[t * 900000, 1.0, 2.0, 0.5, 1.5, 10.0] for t in range(5)]
+        handler = MarketDataHandler()
+        handler.exchange = FakeExchange({}, candles=candles)
+
+        rows = handler.fetch_altcoin_data_since('ETH/USDT', since=3 * 900000)
+
+        self.assertEqual(rows.shape, (2, 6))
+        np.testing.assert_array_equal(rows[:, 0], [3 * 900000, 4 * 900000])
+        self.assertEqual(handler.exchange.requests, [('ETH/USDT', '15m', 3 * 900000)])
+
+    def test_no_new_candles(self):
+        handler = MarketDataHandler()
+        handler.exchange = FakeExchange({})
+        self.assertEqual(handler.fetch_altcoin_data_since('ETH/USDT', since=0).shape, (0, 6))
+
+
+if __name__ == '__main__':
+    unittest.main()
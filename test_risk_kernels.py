@@ -0,0 +1,92 @@
+import random
+import unittest
+from decimal import Context, Decimal, ROUND_HALF_UP
+import numpy as np
+from risk_kernels import (exit_amounts, partial_exit_amounts, position_size, stop_levels, trailing_stops,
+                          volatility_scale)
+
+
+class TestStopLevels(unittest.TestCase):
+    def test_long(self):
+        stop_loss, take_profit = stop_levels(100.0, 2.0, True, 2.0, 3.0)
+        self.assertEqual((stop_loss, take_profit), (96.0, 106.0))
+
+    def test_short_is_mirrored(self):
+        stop_loss, take_profit = stop_levels(100.0, 2.0, False, 2.0, 3.0)
+        self.assertEqual((stop_loss, take_profit), (104.0, 94.0))
+
+
+class TestVolatilityScale(unittest.TestCase):
+    def test_ratio_inside_bounds(self):
+        self.assertAlmostEqual(volatility_scale(0.02, 0.024, 0.5, 1.5), 1.2)
+
+    def test_ratio_is_clamped(self):
+        self.assertEqual(volatility_scale(0.1, 0.01, 0.5, 1.5), 0.5)
+        self.assertEqual(volatility_scale(0.01, 0.1, 0.5, 1.5), 1.5)
+
+
+class TestPositionSize(unittest.TestCase):
+    def test_risk_over_stop_distance_and_fees(self):
+        # 100 at risk over a 5% stop plus 0.2% round-trip fees
+        self.assertAlmostEqual(position_size(10000.0, 0.01, 1.0, 100.0, 95.0, 0.002, 9500.0),
+                               100.0 / 0.052)
+
+    def test_capped_at_max_position(self):
+        self.assertEqual(position_size(10000.0, 0.5, 1.5, 100.0, 99.9, 0.002, 9500.0), 9500.0)
+
+
+class TestExitAmounts(unittest.TestCase):
+    def test_full_exit(self):
+        gross, net, pnl, exit_fee, total_fees = exit_amounts(2.0, 110.0, 0.001, 200.0, 0.2)
+        self.assertAlmostEqual(gross, 220.0)
+        self.assertAlmostEqual(exit_fee, 0.22)
+        self.assertAlmostEqual(net, 219.78)
+        self.assertAlmostEqual(pnl, 19.78)
+        self.assertAlmostEqual(total_fees, 0.42)
+
+    def test_partial_exit(self):
+        gross, net, exit_fee = partial_exit_amounts(2.0, 0.5, 110.0, 0.001)
+        self.assertAlmostEqual(gross, 110.0)
+        self.assertAlmostEqual(exit_fee, 0.11)
+        self.assertAlmostEqual(net, 109.89)
+
+    def test_within_1e8_of_exact_decimal(self):
+        """Quantized float64 results stay within 1e-8 of quantized exact Decimal results"""
+        ctx = Context(prec=40)
+        quantizer = Decimal('1e-8')
+
+        def quantize(value):
+            return Decimal(value).quantize(quantizer, rounding=ROUND_HALF_UP, context=ctx)
+
+        rng = random.Random(3)
+        fee_rate = Decimal('0.001')
+        for usdt_size in (Decimal('1000'), Decimal('10000000')):
+            entry_fee = quantize(ctx.multiply(usdt_size, fee_rate))
+            for _ in range(500):
+                entry_price = round(rng.uniform(0.5, 60000), 2)
+                quantity = quantize(ctx.divide(usdt_size, Decimal(str(entry_price))))
+                price = Decimal(str(round(entry_price * rng.uniform(0.9, 1.1), 2)))
+                gross = ctx.multiply(quantity, price)
+                exit_fee = ctx.multiply(gross, fee_rate)
+                net = ctx.subtract(gross, exit_fee)
+                exact = (gross, net, ctx.subtract(net, usdt_size), exit_fee, ctx.add(entry_fee, exit_fee))
+                fast = exit_amounts(float(quantity), float(price), float(fee_rate), float(usdt_size),
+                                    float(entry_fee))
+                for f, e in zip(fast, exact):
+                    self.assertLessEqual(abs(quantize(f) - quantize(e)), quantizer)
+
+
+class TestTrailingStops(unittest.TestCase):
+    def test_only_activated_stops_move_up(self):
+        entry = np.array([100.0, 100.0, 100.0, 100.0])
+        atr = np.array([1.0, 1.0, 1.0, 5.0])
+        stops = np.array([95.0, 95.0, 95.0, 99.0])
+        activation = np.array([101.0, 101.0, 101.0, 101.0])
+        price = np.array([103.0, 100.5, 99.0, 103.0])
+        moved = trailing_stops(entry, atr, stops, activation, price, 2.0)
+        self.assertEqual(moved.tolist(), [True, False, False, False])
+        self.assertEqual(stops.tolist(), [101.0, 95.0, 95.0, 99.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import numpy as np
+import pandas as pd
+from crypto_trading_bot import SignalGenerator
+
+
+def make_candles(n=300, seed=1):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    index = pd.date_range('2025-01-01', periods=n, freq='15min')
+    return pd.DataFrame({
+        'open': close,
+        'high': close * 1.01,
+        'low': close * 0.99,
+        'close': close,
+        'volume': rng.uniform(1, 10, n)
+    }, index=index)
+
+
+class TestIndicatorState(unittest.TestCase):
+    def test_streaming_matches_batch_indicators(self):
+        """Warmup + per-candle updates reproduce the talib values over the full history"""
+        df = make_candles()
+        generator = SignalGenerator()
+        generator.warmup_state(df.iloc[:250].copy())
+
+        for _, row in df.iloc[250:].iterrows():
+            snapshot = generator.update_state(row['open'], row['high'], row['low'],
+                                              row['close'], row['volume'])
+
+        expected = generator.compute_indicators(df.copy()).iloc[-1]
+        for key, value in snapshot.items():
+            self.assertAlmostEqual(value, expected[key], places=8, msg=key)
+
+
+class TestIncrementalSignal(unittest.TestCase):
+    def test_rolling_windows_match_batch_indicators(self):
+        """Per-pair state folded across rolling windows tracks talib over the same history"""
+        df = make_candles()
+        df['timestamp'] = df.index.asi8 // 10**6
+        generator = SignalGenerator()
+        start, window = 100, 96
+
+        for end in range(start + window, start + window + 20):
+            signal, values = generator.generate_signal_incremental('ETH/USDT', df.iloc[end - window:end])
+
+        history = df.iloc[start:end].copy()
+        expected = generator.compute_indicators(history).iloc[-1]
+        for key in ('ema_fast', 'ema_slow', 'atr', 'volume_ma', 'rsi'):
+            self.assertAlmostEqual(values[key], expected[key], places=8, msg=key)
+        rsi_ma = generator.qqe.calculate(history['close'])['rsi_ma'].iloc[-1]
+        self.assertAlmostEqual(values['rsi_ma'], rsi_ma, places=8)
+        self.assertIn(signal, ('buy', 'sell', 'hold'))
+
+    def test_short_window_holds(self):
+        generator = SignalGenerator()
+        df = make_candles(n=15)
+        df['timestamp'] = df.index.asi8 // 10**6
+        self.assertEqual(generator.generate_signal_incremental('ETH/USDT', df), ('hold', None))
+
+
+class TestSignalMasks(unittest.TestCase):
+    def test_masks_match_scalar_conditions(self):
+        """Entry mask is set exactly where trend, QQE and volume conditions all hold"""
+        generator = SignalGenerator()
+        df = make_candles()
+        entry, exit_ = generator.compute_signal_masks(df)
+
+        rsi_ma = generator.qqe.calculate(df['close'])['rsi_ma']
+        volume_active = df['volume'] > df['volume_ma'] * 1.15
+        in_value_area = pd.Series([generator.check_volume_profile(df.iloc[max(0, i - 95):i + 1])
+                                   for i in range(len(df))], index=df.index)
+        expected_entry = (df['close'] > df['ema_slow']) & (rsi_ma > 48) & volume_active & in_value_area
+        expected_exit = ((rsi_ma < 52) | ~volume_active) & in_value_area
+
+        self.assertEqual(entry.dtype, np.uint8)
+        np.testing.assert_array_equal(entry, expected_entry.to_numpy().astype(np.uint8))
+        np.testing.assert_array_equal(exit_, expected_exit.to_numpy().astype(np.uint8))
+
+    def test_filter_masks_match_scalar_checks(self):
+        """Value-area and BTC correlation masks agree with the per-candle checks"""
+        generator = SignalGenerator()
+        df = make_candles(n=200, seed=3)
+        df['close'] = df['close'].round(0)  # Repeated buckets, so POC ties occur
+        rng = np.random.default_rng(7)
+        df['btc_close'] = df['close'] * np.exp(np.cumsum(rng.normal(0, 0.01, len(df))))
+
+        value_area = generator.value_area_mask(df, 48)
+        correlation = generator.correlation_mask(df)
+
+        for i in range(len(df)):
+            self.assertEqual(bool(value_area[i]),
+                             bool(generator.check_volume_profile(df.iloc[max(0, i - 47):i + 1])), i)
+            self.assertEqual(bool(correlation[i]),
+                             bool(generator.check_correlation(df['close'].iloc[:i + 1],
+                                                              df['btc_close'].iloc[:i + 1])), i)
+        self.assertTrue(correlation.any() and not correlation.all())
+
+
+if __name__ == '__main__':
+    unittest.main()
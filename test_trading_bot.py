@@ -1,6 +1,11 @@
+import random
+import threading
 import unittest
-from decimal import Decimal
-from crypto_trading_bot import Position, RiskManager, TradingBot
+from datetime import date
+from decimal import Decimal, localcontext
+import numpy as np
+from crypto_trading_bot import Position, RiskManager, TradingBot, TradeHistory
+
 
 class TestPosition(unittest.TestCase):
     def setUp(self):
@@ -82,6 +87,43 @@ class TestPosition(unittest.TestCase):
         self.assertEqual(position.entry_fee, expected_fee)
         self.assertEqual(position.quantity, expected_quantity)
 
+
+class TestPositionExitFee(unittest.TestCase):
+    def test_exit_fee_rounded_before_net_value(self):
+        """Exit fee is quantized on its own and net value is gross minus that fee"""
+        position = Position('ETH/USDT', Decimal('0.6524'), Decimal('0.5'), Decimal('0.00075'))
+        exit_price = Decimal('0.9305')
+
+        # Rounding gross * (1 - fee_rate) in one step would give 0.71206680 here
+        for result in (position.update_current_value(exit_price), position.close_position(exit_price)):
+            self.assertEqual(result['gross_value'], Decimal('0.71260126'))
+            self.assertEqual(result['exit_fee'], Decimal('0.00053445'))
+            self.assertEqual(result['net_value'], Decimal('0.71206681'))
+
+
+class TestPositionBatchUpdate(unittest.TestCase):
+    def test_batch_update_within_1e8_of_single_updates(self):
+        """Vectorized revaluation is within 1e-8 of update_current_value per position"""
+        rng = random.Random(5)
+        # The bot's own prec-8 context is too narrow for positions this size
+        with localcontext() as ctx:
+            ctx.prec = 28
+            positions, prices = [], []
+            for _ in range(1000):
+                entry_price = Decimal(str(round(rng.uniform(0.01, 60000), 4)))
+                usdt_size = Decimal(str(round(rng.uniform(10, 10000), 2)))
+                fee_rate = Decimal(rng.choice(('0.001', '0.00075')))
+                positions.append(Position('ETH/USDT', entry_price, usdt_size, fee_rate))
+                prices.append(round(float(entry_price) * rng.uniform(0.9, 1.1), 4))
+
+            batch = Position.batch_update(positions, prices)
+
+            for i, (position, price) in enumerate(zip(positions, prices)):
+                single = position.update_current_value(price)
+                self.assertLessEqual(abs(batch['net_value'][i] - single['net_value']), Decimal('1e-8'))
+                self.assertLessEqual(abs(batch['unrealized_pnl'][i] - single['unrealized_pnl']), Decimal('1e-8'))
+
+
 class TestRiskManager(unittest.TestCase):
     def setUp(self):
         """Set up test cases with common values"""
@@ -183,6 +225,7 @@ class TestRiskManager(unittest.TestCase):
         # Higher volatility should result in smaller position size
         self.assertGreater(Decimal(str(low_vol_size)), Decimal(str(high_vol_size)))
 
+
 class TestTradingBot(unittest.TestCase):
     """Integration tests for the TradingBot class"""
     
@@ -251,5 +294,86 @@ class TestTradingBot(unittest.TestCase):
         self.assertEqual(len(self.bot.positions), 0)
         self.assertGreater(self.bot.balance, self.initial_balance)  # Profitable trade
 
+
+class TestFetchWorkers(unittest.TestCase):
+    def _bot(self):
+        # The bot's own prec-8 context is too narrow for its default limits
+        with localcontext() as ctx:
+            ctx.prec = 28
+            return TradingBot(['ETH/USDT', 'SOL/USDT'])
+
+    def test_pool_starts_on_first_use_and_closes(self):
+        bot = self._bot()
+        self.assertIsNone(bot._fetch_pool)
+        pool = bot._candle_pool()
+        self.assertIs(bot._candle_pool(), pool)
+        bot.close()
+        self.assertIsNone(bot._fetch_pool)
+        bot.close()  # Closing twice is harmless
+
+    def test_each_worker_has_its_own_exchange(self):
+        bot = self._bot()
+        try:
+            barrier = threading.Barrier(2)
+
+            def handler():
+                barrier.wait()  # Both workers busy at once, so they are distinct threads
+                return bot._worker_market_data()
+
+            futures = [bot._candle_pool().submit(handler) for _ in range(2)]
+            first, second = (future.result(timeout=10) for future in futures)
+        finally:
+            bot.close()
+        self.assertIsNot(first.exchange, second.exchange)
+        self.assertIsNot(first, bot.market_data)
+        self.assertIsNot(second, bot.market_data)
+
+
+class TestTradeHistory(unittest.TestCase):
+    def test_append_grows_past_capacity(self):
+        """Columns grow as trades are appended and keep earlier rows"""
+        history = TradeHistory(capacity=2)
+        for pnl in (5.0, -2.0, 3.0):
+            history.append('ETH/USDT', 100.0, 101.0, 50.0, 0.5, pnl, 0.1, 'signal', date(2024, 1, 1))
+
+        self.assertEqual(len(history), 3)
+        np.testing.assert_array_equal(history['pnl'], [5.0, -2.0, 3.0])
+        self.assertEqual(history.pairs, ['ETH/USDT'] * 3)
+
+    def test_summary(self):
+        """Win rate, fees and exit reasons are reduced over the columns"""
+        history = TradeHistory()
+        history.append('ETH/USDT', 100.0, 98.0, 50.0, 0.5, -1.0, 0.1, 'stop_loss', date(2024, 1, 1))
+        history.extend('SOL/USDT', entry_price=np.array([10.0, 10.0]),
+                       exit_price=np.array([11.0, 12.0]), position_size=np.array([20.0, 20.0]),
+                       quantity=np.array([2.0, 2.0]), pnl=np.array([1.9, 3.9]),
+                       fees=np.array([0.05, 0.05]), reason=np.array([0, 2], dtype=np.int8),
+                       day=np.array([19723, 19724]))
+
+        stats = history.summary()
+        self.assertEqual(stats['num_trades'], 3)
+        self.assertAlmostEqual(stats['win_rate'], 200 / 3)
+        self.assertAlmostEqual(stats['total_fees'], 0.2)
+        self.assertEqual(stats['exit_reasons'], {'signal': 1, 'stop_loss': 1, 'take_profit': 1})
+
+    def test_summary_for_date(self):
+        """Only trades closed on the requested day are aggregated"""
+        history = TradeHistory()
+        history.append('ETH/USDT', 100.0, 98.0, 50.0, 0.5, -1.0, 0.1, 'stop_loss', date(2024, 1, 1))
+        history.append('ETH/USDT', 100.0, 104.0, 50.0, 0.5, 2.0, 0.1, 'take_profit', date(2024, 1, 2))
+
+        stats = history.summary(date=date(2024, 1, 2))
+        self.assertEqual(stats['num_trades'], 1)
+        self.assertEqual(stats['total_pnl'], 2.0)
+        self.assertEqual(stats['exit_reasons'], {'take_profit': 1})
+        self.assertEqual(history.summary(date=date(2024, 1, 3))['num_trades'], 0)
+
+    def test_empty_summary(self):
+        stats = TradeHistory().summary()
+        self.assertEqual(stats['num_trades'], 0)
+        self.assertEqual(stats['win_rate'], 0.0)
+        self.assertEqual(stats['exit_reasons'], {})
+
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file